@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de chatterbox_server.py (batch y replicas con un modelo simulado, sin pesos ni GPU)
+
+Uso:
+    python chatterbox_bench.py batch [--jobs 8] [--chunks 6] [--voices 2] [--replicas 2]
+                                     [--batch-sizes 1 2 4 8] [--work 2000]
+    python chatterbox_bench.py replicas [--jobs 8] [--chunks 4] [--replicas 1 2 4] [--work 2000]
+    python chatterbox_bench.py fast [--modes full int8 compile int8+compile] [--repeats 3] [--starts 2]
+
+En `batch` y `replicas` el modelo simulado consume CPU de verdad (work
+iteraciones de Python por carácter) y solo tiene generate(), como
+ChatterboxMultilingualTTS: los lotes recorren el mismo camino que en el
+servidor (_next_batch, _worker, ProcessReplica). `batch` compara tamaños de
+lote con un número fijo de réplicas; `replicas`, cuántas réplicas con lotes de
+un chunk. Cada corrida va en un proceso aparte.
+
+`fast` usa el modelo real en CPU: por cada modo mide el arranque (el primero
+crea los artefactos en caché, los siguientes los reusan), el factor de tiempo
+real (segundos de generación / segundos de audio) y compara el audio con el del
+modelo completo: duración, volumen y distancia entre espectros promedio.
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import subprocess
+import threading
+from typing import Any, Dict, List
+
+import numpy as np
+
+import chatterbox_server as server
+
+BENCH_DIR = os.path.join(os.getcwd(), "chatterbox_bench")
+
+# Frases de ~80 caracteres: tres forman un chunk de ~250
+BENCH_PHRASES = [
+    "Hace mucho tiempo, en un pueblo rodeado de montañas, vivía una familia humilde.",
+    "Cada mañana el padre salía temprano a trabajar en los campos de maíz del valle.",
+    "La madre preparaba el desayuno mientras los niños se alistaban para la escuela.",
+    "Un día llegó un viajero desconocido que traía noticias de tierras muy lejanas.",
+    "Nadie imaginaba que aquella visita cambiaría para siempre la vida del pueblo.",
+    "Las historias del viajero hablaban de ciudades enormes y de mares infinitos.",
+]
+
+
+def _log(message: str) -> None:
+    print(f"[Bench] {message}", file=sys.stderr, flush=True)
+
+
+def write_report(name: str, report: Dict[str, Any]) -> str:
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+class StubConditionals:
+    """Imita chatterbox.mtl_tts.Conditionals (save/load/to)"""
+
+    def __init__(self, voice: str):
+        self.voice = voice
+
+    def to(self, device):
+        return self
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.voice)
+
+    @classmethod
+    def load(cls, path, map_location=None):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(f.read())
+
+
+class CpuStubModel:
+    """Imita la interfaz de ChatterboxMultilingualTTS ocupando la CPU en generate()"""
+    sr = 24000
+
+    def __init__(self, work: int):
+        self.work = work
+        self.calls = 0
+        self.conds = StubConditionals("builtin")  # from_pretrained trae unas condiciones por defecto
+
+    def prepare_conditionals(self, wav_fpath, exaggeration=0.5):
+        self.conds = StubConditionals(wav_fpath)
+
+    def generate(self, text, language_id=None, audio_prompt_path=None, **kwargs):
+        self.calls += 1
+        acc = 0
+        for i in range(self.work * len(text)):
+            acc += i * i % 7
+        return server.torch.from_numpy(np.zeros((1, int(self.sr * 0.06 * len(text))), dtype=np.float32))
+
+
+class CpuStubLoader:
+    """Carga CpuStubModel dentro de cada réplica (tiene que poder enviarse al proceso hijo)"""
+
+    def __init__(self, work: int):
+        self.work = work
+
+    def __call__(self):
+        return CpuStubModel(self.work)
+
+
+def _submit_bench_jobs(count: int, text: str, out_dir: str, voices: List[str], prefix: str) -> list:
+    return [server._submit({
+        "text": text,
+        "output": os.path.join(out_dir, f"{prefix}_{i}.wav"),
+        "language": "es",
+        "audio_prompt": voices[i % len(voices)],
+        "exaggeration": 0.5,
+        "cfg_weight": 0.5,
+        "temperature": 0.8,
+        "seed": None,
+        "use_cache": False,
+    }) for i in range(count)]
+
+
+def run_replicas(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Una corrida con N réplicas en procesos (se ejecuta en un proceso aparte)"""
+    text = " ".join(BENCH_PHRASES[i % len(BENCH_PHRASES)] for i in range(config["chunks"] * 3))
+    server.MAX_QUEUE = max(server.MAX_QUEUE, config["jobs"])
+    server.BATCH_SIZE = config.get("batch_size", 1)
+    with tempfile.TemporaryDirectory() as out_dir:
+        server.CACHE_DIR = os.path.join(out_dir, "cache")
+        server._phrases = server.PhraseCache(os.path.join(server.CACHE_DIR, "phrases"), 0)
+        voices = []
+        for v in range(config.get("voices", 1)):
+            voices.append(os.path.join(out_dir, f"voz_{v}.wav"))
+            with open(voices[-1], "wb") as f:
+                f.write(os.urandom(64))
+
+        start = time.perf_counter()
+        replicas = server._start_replicas(config["replicas"], config["threads"], CpuStubLoader(config["work"]))
+        startup = time.perf_counter() - start
+        server._replicas.extend(replicas)
+        for replica in replicas:
+            threading.Thread(target=server._worker, args=(replica,), daemon=True).start()
+
+        start = time.perf_counter()
+        jobs = _submit_bench_jobs(config["jobs"], text, out_dir, voices, "r")
+        for job in jobs:
+            job.done.wait()
+        total = time.perf_counter() - start
+        for replica in replicas:
+            replica.conn.send(None)
+            replica.process.join(5)
+
+    latencies = sorted(job.finished_at - job.enqueued_at for job in jobs)
+    first_audio = sorted(job.first_audio_at - job.enqueued_at for job in jobs if job.first_audio_at)
+    chunks = sum(job.chunks for job in jobs)
+    return {
+        "replicas": len(replicas),
+        "batch_size": server.BATCH_SIZE,
+        "cores": [replica.cores for replica in replicas],
+        "threads_per_replica": replicas[0].threads,
+        "startup_time": round(startup, 3),
+        "chunks": chunks,
+        "total_time": round(total, 3),
+        "chunks_per_sec": round(chunks / total, 2),
+        "latency_mean": round(sum(latencies) / len(latencies), 3),
+        "latency_max": round(latencies[-1], 3),
+        "first_audio_mean": round(sum(first_audio) / len(first_audio), 3) if first_audio else None,
+        "batches": sum(replica.batches for replica in replicas),
+        "batches_per_replica": [replica.batches for replica in replicas],
+        "errors": [job.error for job in jobs if job.status != "done"],
+    }
+
+
+def _run_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "run-replicas", json.dumps(config)],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"corrida {config} falló:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def bench_batch(args: argparse.Namespace) -> Dict[str, Any]:
+    """Lotes de 1 chunk vs lotes más grandes, con las mismas réplicas y la misma carga"""
+    results = []
+    for batch_size in [1] + [b for b in args.batch_sizes if b > 1]:
+        config = {"replicas": args.replicas, "threads": args.threads, "jobs": args.jobs, "chunks": args.chunks,
+                  "voices": args.voices, "work": args.work, "batch_size": batch_size}
+        results.append(_run_config(config))
+        _log(f"batch={batch_size}: {results[-1]['chunks_per_sec']} chunks/s, "
+             f"latencia media {results[-1]['latency_mean']}s, primer audio {results[-1]['first_audio_mean']}s, "
+             f"lotes por réplica {results[-1]['batches_per_replica']}")
+
+    base = results[0]["chunks_per_sec"] if results else 0
+    for result in results:
+        result["speedup"] = round(result["chunks_per_sec"] / base, 2) if base else None
+    return {
+        "benchmark": "batch",
+        "jobs": args.jobs,
+        "chunks_per_job": args.chunks,
+        "voices": args.voices,
+        "replicas": args.replicas,
+        "stub": {"work": args.work},
+        "results": results,
+    }
+
+
+def bench_replicas(args: argparse.Namespace) -> Dict[str, Any]:
+    """Rendimiento con 1..N réplicas en procesos, misma carga en cada corrida"""
+    results = []
+    for count in args.replicas:
+        config = {"replicas": count, "threads": args.threads, "jobs": args.jobs,
+                  "chunks": args.chunks, "work": args.work}
+        results.append(_run_config(config))
+        _log(f"réplicas={count}: {results[-1]['chunks_per_sec']} chunks/s")
+
+    base = results[0]["chunks_per_sec"] if results else 0
+    for result in results:
+        result["speedup"] = round(result["chunks_per_sec"] / base, 2) if base else None
+        result["efficiency"] = round(result["speedup"] / result["replicas"], 2) if base else None
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        available = os.cpu_count()
+    return {
+        "benchmark": "replicas",
+        "cpus": available,
+        "jobs": args.jobs,
+        "chunks_per_job": args.chunks,
+        "stub": {"work": args.work},
+        "results": results,
+    }
+
+
+def run_fast(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Un arranque del modelo real en un modo (se ejecuta en un proceso aparte)"""
+    mode = "" if config["mode"] == "full" else config["mode"]
+    start = time.perf_counter()
+    server._load("cpu", mode)
+    startup = time.perf_counter() - start
+    model = server._model
+    rtfs = []
+    wav = None
+    for _ in range(config["repeats"]):
+        server.torch.manual_seed(config["seed"])
+        start = time.perf_counter()
+        wav = server._to_numpy(model.generate(config["text"], language_id="es"))
+        rtfs.append((time.perf_counter() - start) / (len(wav) / model.sr))
+    np.save(config["output"], wav)
+    return {
+        "mode": config["mode"],
+        "startup_time": round(startup, 2),
+        "fast": server._load_info.get("fast"),
+        "audio_seconds": round(len(wav) / model.sr, 2),
+        "rtf": [round(r, 3) for r in rtfs],
+        "rtf_mean": round(sum(rtfs) / len(rtfs), 3),
+        "sr": model.sr,
+    }
+
+
+def _mean_spectrum_db(wav: np.ndarray, frame: int = 1024) -> np.ndarray:
+    frames = len(wav) // frame
+    if frames == 0:
+        return np.zeros(frame // 2 + 1)
+    power = np.abs(np.fft.rfft(wav[:frames * frame].reshape(frames, frame) * np.hanning(frame), axis=1)) ** 2
+    return 10 * np.log10(power.mean(axis=0) + 1e-10)
+
+
+def audio_quality(wav: np.ndarray, reference: np.ndarray) -> Dict[str, Any]:
+    """Chequeo básico frente al audio del modelo completo (no reemplaza escucharlo)"""
+    rms = float(np.sqrt(np.mean(wav ** 2))) if len(wav) else 0.0
+    ref_rms = float(np.sqrt(np.mean(reference ** 2))) if len(reference) else 0.0
+    duration_ratio = len(wav) / len(reference) if len(reference) else 0.0
+    rms_ratio = rms / ref_rms if ref_rms else 0.0
+    spectral_distance = float(np.mean(np.abs(_mean_spectrum_db(wav) - _mean_spectrum_db(reference))))
+    finite = bool(np.isfinite(wav).all())
+    return {
+        "finite": finite,
+        "peak": round(float(np.abs(wav).max()) if len(wav) else 0.0, 3),
+        "duration_ratio": round(duration_ratio, 3),
+        "rms_ratio": round(rms_ratio, 3),
+        "spectral_distance_db": round(spectral_distance, 2),
+        "ok": finite and 0.7 <= duration_ratio <= 1.4 and 0.5 <= rms_ratio <= 2.0 and spectral_distance < 6.0,
+    }
+
+
+def bench_fast(args: argparse.Namespace) -> Dict[str, Any]:
+    """Modelo completo vs int8 / torch.compile en CPU: arranque, RTF y calidad"""
+    text = " ".join(BENCH_PHRASES[:3])
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        waves = {}
+        for mode in args.modes:
+            starts = []
+            for n in range(args.starts):
+                config = {"mode": mode, "text": text, "seed": args.seed, "repeats": args.repeats,
+                          "output": os.path.join(out_dir, f"{mode}_{n}.npy")}
+                proc = subprocess.run([sys.executable, os.path.abspath(__file__), "run-fast", json.dumps(config)],
+                                      capture_output=True, text=True)
+                if proc.returncode != 0:
+                    raise RuntimeError(f"modo {mode} falló:\n{proc.stderr}")
+                starts.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+                waves[mode] = np.load(config["output"])
+                _log(f"{mode} arranque {n + 1}: {starts[-1]['startup_time']}s, RTF {starts[-1]['rtf_mean']}")
+            result = dict(starts[-1])
+            result["startup_times"] = [s["startup_time"] for s in starts]
+            result["rtf_mean"] = round(sum(s["rtf_mean"] for s in starts) / len(starts), 3)
+            results.append(result)
+
+        reference = waves.get("full")
+        for result in results:
+            if reference is not None and result["mode"] != "full":
+                result["quality"] = audio_quality(waves[result["mode"]], reference)
+
+    base = next((r["rtf_mean"] for r in results if r["mode"] == "full"), None)
+    for result in results:
+        result["speedup"] = round(base / result["rtf_mean"], 2) if base and result["rtf_mean"] else None
+    return {
+        "benchmark": "fast",
+        "text_chars": len(text),
+        "seed": args.seed,
+        "results": results,
+    }
+
+
+def main():
+    # Uso interno de bench_replicas: una corrida por proceso
+    if len(sys.argv) == 3 and sys.argv[1] == "run-replicas":
+        print(json.dumps(run_replicas(json.loads(sys.argv[2]))))
+        return
+    if len(sys.argv) == 3 and sys.argv[1] == "run-fast":
+        print(json.dumps(run_fast(json.loads(sys.argv[2]))))
+        return
+
+
+    ap = argparse.ArgumentParser(description="Benchmarks de chatterbox_server.py")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    batch = sub.add_parser("batch", help="Tamaños de lote sobre réplicas en procesos con un modelo simulado")
+    batch.add_argument("--jobs", type=int, default=8)
+    batch.add_argument("--chunks", type=int, default=6, help="Chunks de ~250 caracteres por trabajo")
+    batch.add_argument("--voices", type=int, default=2, help="Voces distintas repartidas entre los trabajos")
+    batch.add_argument("--replicas", type=int, default=2)
+    batch.add_argument("--threads", type=int, default=None, help="Hilos de torch por réplica (por defecto sus núcleos)")
+    batch.add_argument("--batch-sizes", type=int, nargs="+", default=[2, 4, 8])
+    batch.add_argument("--work", type=int, default=2000, help="Iteraciones de CPU por carácter en el modelo simulado")
+
+    replicas = sub.add_parser("replicas", help="Rendimiento según el número de réplicas en procesos")
+    replicas.add_argument("--jobs", type=int, default=8)
+    replicas.add_argument("--chunks", type=int, default=4, help="Chunks de ~250 caracteres por trabajo")
+    replicas.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4])
+    replicas.add_argument("--threads", type=int, default=None, help="Hilos de torch por réplica (por defecto sus núcleos)")
+    replicas.add_argument("--work", type=int, default=2000, help="Iteraciones de CPU por carácter en el modelo simulado")
+
+    fast = sub.add_parser("fast", help="Modelo real en CPU: completo vs int8 / torch.compile")
+    fast.add_argument("--modes", nargs="+", default=["full", "int8", "compile", "int8+compile"],
+                      choices=["full", "int8", "compile", "int8+compile"])
+    fast.add_argument("--repeats", type=int, default=3, help="Generaciones por arranque")
+    fast.add_argument("--starts", type=int, default=2, help="Arranques por modo (el primero crea la caché)")
+    fast.add_argument("--seed", type=int, default=1234)
+
+    args = ap.parse_args()
+    if args.command == "batch":
+        report = bench_batch(args)
+    elif args.command == "replicas":
+        report = bench_replicas(args)
+    elif args.command == "fast":
+        report = bench_fast(args)
+    path = write_report(f"{args.command}_report.json", report)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    _log(f"Reporte guardado en {path}")
+
+
+if __name__ == "__main__":
+    main()
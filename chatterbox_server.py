@@ -2,8 +2,34 @@
 """
 Chatterbox Multilingual TTS HTTP server.
 Puerto por defecto: 7171
+
+Las peticiones HTTP se atienden en hilos; las generaciones pasan por una cola
+acotada que consume un worker por réplica del modelo. Por defecto hay una sola
+réplica en este proceso; con --replicas N (o CHATTERBOX_REPLICAS) se arrancan N
+procesos en CPU, cada uno fijado a su bloque de núcleos y con sus propios hilos
+de torch, y los lotes de chunks se reparten a la réplica que quede libre.
+Con --fast (o CHATTERBOX_FAST) el modelo en CPU se cuantiza a int8 y/o se compila
+con torch.compile; los artefactos quedan en CHATTERBOX_CACHE_DIR/fast.
+/health y /status responden siempre al instante, aunque haya una generación en curso.
+
+GET /metrics expone contadores e histogramas en formato Prometheus (o JSON con
+?format=json); cada resultado trae además sus tiempos por etapa (timings).
+Junto a cada salida queda <output>.timings.json con inicio/fin de cada chunk (y
+con "word_timings": true, de cada palabra estimado por energía) en el mismo
+formato de segmentos que WhisperLocal.transcribe_audio.
+
+API de trabajos:
+    POST   /jobs          mismo cuerpo que /generate; responde 202 con job_id
+    GET    /jobs/<id>     estado, progreso por chunk (i de N, elapsed, eta) y resultado
+    DELETE /jobs/<id>     cancela (en cola: no llega a correr; en curso: se corta entre lotes)
+POST /generate sigue disponible y espera al resultado en la misma conexión; con
+"stream": true responde PCM 16 bits en HTTP chunked a medida que se genera.
+
+El audio de cada trabajo se escribe chunk a chunk en <output>.part y se renombra
+a output al terminar: la memoria no crece con la longitud de la sección.
 """
-import sys, os, json, threading, argparse
+import sys, os, json, time, queue, tempfile, threading, argparse
+from collections import OrderedDict
 
 # Forzar UTF-8 en stdout/stderr para evitar UnicodeEncodeError en Windows (CP1252)
 if hasattr(sys.stdout, 'reconfigure'):
@@ -11,7 +37,7 @@ if hasattr(sys.stdout, 'reconfigure'):
 if hasattr(sys.stderr, 'reconfigure'):
     sys.stderr.reconfigure(encoding='utf-8', errors='replace')
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
 # Prioridad: paquete instalado (pip install chatterbox-tts), luego repo local
 _REPO_SRC = r'C:\chatterbox\repo\src'
@@ -47,19 +73,193 @@ LANGUAGE_AUDIO = {
 }
 
 _model = None
+_dev   = None
 _lock  = threading.Lock()
 
+# Réplicas del modelo en procesos aparte (0 = un solo modelo en este proceso)
+REPLICAS = int(os.environ.get('CHATTERBOX_REPLICAS', '0'))
+_replicas = []
+
+# Modo rápido en CPU: '' (precisión completa), 'int8', 'compile' o 'int8+compile'
+FAST_MODE = os.environ.get('CHATTERBOX_FAST', '')
+FAST_MODES = ('', 'int8', 'compile', 'int8+compile')
+QUANT_TARGETS = ('t3', 's3gen.flow')            # submódulos con capas Linear grandes
+COMPILE_TARGETS = ('t3.tfmr', 's3gen.mel2wav')  # transformer de T3 y vocoder
+_load_info = {}
+
+# Cola de trabajos delante del modelo (solo los que esperan; los que corren no cuentan)
+MAX_QUEUE = int(os.environ.get('CHATTERBOX_MAX_QUEUE', '16'))
+# Tope de chunks por lote (mismo trabajo o misma voz). Los chunks de un lote se generan uno tras
+# otro en la réplica; lo que hay para una voz se reparte entre las réplicas libres (ver _next_batch)
+BATCH_SIZE = int(os.environ.get('CHATTERBOX_BATCH_SIZE', '1'))
+# Segundos que un trabajo con otra voz puede quedar postergado por los que se suman al lote
+BATCH_MAX_DEFER = float(os.environ.get('CHATTERBOX_BATCH_MAX_DEFER', '30'))
+_state_lock = threading.Lock()
+_work_ready = threading.Condition(_state_lock)
+_pending = OrderedDict()  # id -> Job en cola, en orden de llegada
+_active = []              # Jobs en curso (chunks repartidos en lotes)
+_idle_workers = 0         # _worker esperando lote en _next_batch
+_cond_key = None          # (hash de la voz, idioma, exaggeration) cargado ahora en m.conds ('default' = la del modelo)
+_default_conds = None     # Condicionamiento incluido en el modelo, para las peticiones sin referencia
+
+# Condicionamientos de voz ya calculados: LRU en memoria + copia en disco (Conditionals.save)
+CACHE_DIR = os.environ.get('CHATTERBOX_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatterbox_cache'))
+COND_CACHE_SIZE = int(os.environ.get('CHATTERBOX_COND_CACHE', '8'))
+_conds = OrderedDict()    # (hash, idioma, exaggeration) -> Conditionals
+_file_hashes = {}         # (ruta, mtime, tamaño) -> sha256
+_file_lock = threading.Lock()      # _file_hashes (varios _worker a la vez)
+_download_lock = threading.Lock()  # descargas de audio de referencia
+
+# Caché de audio por chunk (texto normalizado + voz + parámetros), con tope de tamaño en disco
+PHRASE_CACHE_MAX_MB = float(os.environ.get('CHATTERBOX_PHRASE_CACHE_MB', '1024'))
+_stats = {'phrase_hits': 0, 'phrase_misses': 0, 'phrase_time_saved': 0.0, 'cond_memory': 0, 'cond_disk': 0, 'cond_miss': 0, 'batches': 0, 'batched_chunks': 0, 'processed': 0, 'failed': 0, 'cancelled': 0, 'rejected': 0, 'started': 0, 'total_wait': 0.0, 'max_wait': 0.0, 'last_wait': 0.0}
+_next_id = 0
+
+
+class Histogram:
+    """Histograma acumulado al estilo Prometheus (límites en segundos)"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': round(self.sum, 3),
+                'buckets': {f'{b:g}': c for b, c in zip(self.buckets, self.counts)}}
+
+    def prometheus(self, name, help_text):
+        lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        lines += [f'{name}_bucket{{le="{b:g}"}} {c}' for b, c in zip(self.buckets, self.counts)]
+        lines += [f'{name}_bucket{{le="+Inf"}} {self.count}', f'{name}_sum {self.sum:.6f}', f'{name}_count {self.count}']
+        return lines
+
+
+# Métricas para /metrics (se actualizan con _state_lock)
+STAGES = ('split', 'conditioning', 'generate', 'concatenate', 'save')
+_metrics = {
+    'requests': {},  # (método, ruta, código) -> peticiones
+    'queue_wait': Histogram((0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600)),
+    'chunk_generate': Histogram((0.5, 1, 2, 5, 10, 20, 30, 60, 120)),
+    'job_duration': Histogram((1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)),
+    'audio_seconds': 0.0,            # audio entregado, incluida la caché de frases
+    'generated_audio_seconds': 0.0,  # solo el que pasó por el modelo
+    'generate_seconds': 0.0,
+    'stage_seconds': {stage: 0.0 for stage in STAGES},
+}
+
+# Trabajos conocidos (en cola, en curso y los últimos terminados) para GET /jobs/<id>
+JOB_HISTORY = int(os.environ.get('CHATTERBOX_JOB_HISTORY', '200'))
+_all_jobs = OrderedDict()
+
+
+class Job:
+    """Trabajo de síntesis encolado; quien lo envió espera a done o consulta su estado"""
+    def __init__(self, params):
+        global _next_id
+        with _state_lock:
+            _next_id += 1
+            self.id = str(_next_id)
+        self.params = params
+        self.done = threading.Event()
+        self.cancel_requested = threading.Event()
+        self.status = 'queued'  # queued, running, done, failed, cancelled
+        self.result = None
+        self.error = None
+        self.enqueued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.chunk = 0          # chunks terminados
+        self.chunks = 0
+        self.chars_done = 0
+        self.chars_total = 0
+        self.texts = []         # chunks de texto
+        self.wavs = {}          # índice de chunk -> audio aún no escrito
+        self.written = 0        # chunks ya escritos en la salida (en orden)
+        self.writer = None      # AudioWriter abierto al llegar el primer chunk
+        self.lock = threading.Lock()  # escritura de la salida (varias réplicas pueden entregar chunks)
+        self.in_flight = 0      # chunks repartidos a una réplica y aún sin entregar
+        self.first_audio_at = None
+        self.samples = 0        # muestras ya escritas (silencios incluidos)
+        self.segments = []      # tiempos por chunk para el sidecar
+        self.stream = queue.Queue() if params.get('stream') else None  # PCM para la respuesta HTTP
+        self.next_chunk = 0     # siguiente chunk a repartir en un lote
+        self.conditioning = None  # origen del condicionamiento de voz (ver _apply_conditionals)
+        self.phrase_hits = 0
+        self.phrase_time_saved = 0.0
+        self.timings = {stage: 0.0 for stage in STAGES}  # segundos por etapa
+
+    @property
+    def cond_key(self):
+        """Trabajos con la misma clave comparten condicionamiento y pueden ir en el mismo lote"""
+        p = self.params
+        return (p['language'], p['audio_prompt'], p['exaggeration'], p['cfg_weight'], p['temperature'], p['seed'])
+
+    def phrase_stats(self):
+        return {
+            'hits': self.phrase_hits,
+            'misses': self.chunk - self.phrase_hits,
+            'hit_ratio': round(self.phrase_hits / self.chunk, 3) if self.chunk else 0.0,
+            'time_saved': round(self.phrase_time_saved, 3),
+        }
+
+    @property
+    def wait_time(self):
+        return (self.started_at or self.finished_at or time.time()) - self.enqueued_at
+
+    def progress(self):
+        """Progreso por chunk; eta estimada por caracteres ya sintetizados"""
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        eta = None
+        if self.status == 'running' and self.chars_done:
+            eta = round(elapsed / self.chars_done * (self.chars_total - self.chars_done), 1)
+        return {
+            'chunk': self.chunk,
+            'chunks': self.chunks,
+            'percent': round(100.0 * self.chars_done / self.chars_total, 1) if self.chars_total else 0.0,
+            'elapsed': round(elapsed, 1),
+            'eta': eta,
+        }
+
+    def to_dict(self):
+        info = {
+            'job_id': self.id,
+            'status': self.status,
+            'queue_wait': round(self.wait_time, 3),
+            'progress': self.progress(),
+        }
+        if self.conditioning: info['conditioning'] = self.conditioning
+        if self.started_at: info['timings'] = {k: round(v, 3) for k, v in self.timings.items()}
+        if self.chunk: info['phrase_cache'] = self.phrase_stats()
+        if self.result: info['result'] = self.result
+        if self.error: info['error'] = self.error
+        return info
+
 def _device():
     if torch.cuda.is_available(): return 'cuda'
     if getattr(getattr(torch, 'backends', None), 'mps', None) and torch.backends.mps.is_available(): return 'mps'
     return 'cpu'
 
-def _load():
-    global _model
+def _load(device=None, fast=None):
+    global _model, _dev, _cond_key
     from chatterbox.mtl_tts import ChatterboxMultilingualTTS
-    dev = _device()
+    dev = _dev = device or _device()
+    fast = FAST_MODE if fast is None else fast
     print(f'[Chatterbox] Cargando modelo multilingue en {dev}...', flush=True)
+    start = time.time()
     _model = ChatterboxMultilingualTTS.from_pretrained(device=dev)
+    _cond_key = None  # el próximo _apply_conditionals toma las condiciones de este modelo como las por defecto
+    _load_info.update(device=dev, load_time=round(time.time() - start, 2))
+    if fast:
+        _optimize(_model, fast, dev)
     print('[Chatterbox] Modelo listo OK', flush=True)
 
 def _get():
@@ -67,34 +267,1006 @@ def _get():
     return _model
 
 
+def _submodule(m, path):
+    for name in path.split('.'):
+        m = getattr(m, name, None)
+        if m is None: return None
+    return m
+
+
+def _set_submodule(m, path, module):
+    parent, _, name = path.rpartition('.')
+    setattr(_submodule(m, parent) if parent else m, name, module)
+
+
+def _fast_dir():
+    """Artefactos del modo rápido; dependen de la versión de torch y de chatterbox"""
+    try:
+        from importlib.metadata import version
+        tts_version = version('chatterbox-tts')
+    except Exception:
+        tts_version = 'unknown'
+    return os.path.join(CACHE_DIR, 'fast', f'torch-{torch.__version__}_chatterbox-{tts_version}'.replace('+', '_'))
+
+
+def _optimize(m, mode, dev):
+    """Cuantiza a int8 (dinámico, capas Linear) y/o compila los submódulos pesados.
+
+    Los submódulos cuantizados se guardan enteros en disco y se reusan en los
+    arranques siguientes; la compilación usa la caché de inductor en el mismo
+    directorio. Al final se genera una frase corta para que la compilación y la
+    primera asignación de memoria no caigan en la primera petición."""
+    if mode not in FAST_MODES:
+        raise ValueError(f'modo rápido desconocido: {mode} (opciones: {", ".join(f for f in FAST_MODES if f)})')
+    if dev != 'cpu':
+        print(f'[Chatterbox] El modo rápido {mode} es solo para CPU; en {dev} se usa el modelo completo', flush=True)
+        return
+    directory = _fast_dir()
+    os.makedirs(directory, exist_ok=True)
+    start = time.time()
+    info = {'mode': mode, 'quantized': [], 'compiled': [], 'artifacts': 'none'}
+
+    if 'int8' in mode:
+        for path in QUANT_TARGETS:
+            module = _submodule(m, path)
+            if module is None: continue
+            artifact = os.path.join(directory, f'{path}.int8.pt')
+            if os.path.exists(artifact):
+                quantized = torch.load(artifact, map_location='cpu', weights_only=False)
+                info['artifacts'] = 'loaded'
+            else:
+                quantized = torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+                tmp = f'{artifact}.{os.getpid()}.tmp'
+                torch.save(quantized, tmp)
+                os.replace(tmp, artifact)
+                info['artifacts'] = 'saved'
+            _set_submodule(m, path, quantized)
+            info['quantized'].append(path)
+
+    if 'compile' in mode and hasattr(torch, 'compile'):
+        os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR', os.path.join(directory, 'inductor'))
+        os.environ.setdefault('TORCHINDUCTOR_FX_GRAPH_CACHE', '1')
+        for path in COMPILE_TARGETS:
+            module = _submodule(m, path)
+            if module is None: continue
+            module.forward = torch.compile(module.forward, dynamic=True)
+            info['compiled'].append(path)
+
+    info['optimize_time'] = round(time.time() - start, 2)
+    start = time.time()
+    try:
+        m.generate('Hola, esto es una prueba.', language_id='es')
+    except Exception as e:  # sin warmup igual se atiende; la primera petición pagará la compilación
+        print(f'[Chatterbox] Warmup falló: {e}', flush=True)
+    info['warmup_time'] = round(time.time() - start, 2)
+    _load_info['fast'] = info
+    print(f'[Chatterbox] Modo rápido {mode}: int8={info["quantized"]} compile={info["compiled"]} '
+          f'(artefactos: {info["artifacts"]}, {info["optimize_time"]}s + warmup {info["warmup_time"]}s)', flush=True)
+
+
+def _split_chunks(text):
+    """Parte el texto en chunks de ~250 caracteres por oraciones"""
+    # Split into ~250-char chunks to bypass the ~15s per-call limit
+    sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
+    if not sentences:
+        sentences = [text]
+
+    chunks = []
+    cur = ''
+    for s in sentences:
+        if len(cur) + len(s) + 1 <= 250:
+            cur = (cur + ' ' + s).strip()
+        else:
+            if cur:
+                chunks.append(cur)
+            cur = s
+    if cur:
+        chunks.append(cur)
+
+    # Ensure every chunk ends with terminal punctuation so the model
+    # produces a closed prosodic contour (avoids cut-off-sounding audio)
+    return [
+        c if c and c[-1] in '.!?…' else c + '.'
+        for c in chunks if c
+    ]
+
+
+def _reference_clip(prompt):
+    """Ruta local del audio de referencia; las URLs de LANGUAGE_AUDIO se descargan una vez"""
+    if not prompt or not prompt.startswith(('http://', 'https://')):
+        return prompt
+    import urllib.request
+    local = os.path.join(CACHE_DIR, 'reference', os.path.basename(prompt))
+    if os.path.isfile(local):
+        return local
+    with _download_lock:  # un solo hilo descarga; los demás encuentran el archivo al entrar
+        if os.path.isfile(local):
+            return local
+        os.makedirs(os.path.dirname(local), exist_ok=True)
+        print(f'[Chatterbox] Descargando audio de referencia {prompt}', flush=True)
+        # Temporal único: las réplicas en otros procesos pueden estar bajando la misma URL
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(local), suffix='.tmp')
+        os.close(fd)
+        try:
+            urllib.request.urlretrieve(prompt, tmp)
+            os.replace(tmp, local)
+        except Exception as e:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise RuntimeError(f'No se pudo descargar el audio de referencia {prompt}: {e}')
+    return local
+
+
+def _file_hash(path):
+    import hashlib
+    st = os.stat(path)
+    memo = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _file_lock:
+        cached = _file_hashes.get(memo)
+    if cached:
+        return cached
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    with _file_lock:
+        _file_hashes[memo] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+def _apply_conditionals(m, prompt, language, exaggeration):
+    """Deja en m.conds el condicionamiento de la voz.
+
+    Se busca por (hash del contenido del audio, idioma, exaggeration): primero en
+    el LRU en memoria, luego en CACHE_DIR/conds y solo si no está se calcula con
+    m.prepare_conditionals. Sin referencia se vuelve a la voz incluida en el modelo
+    (la que tenía m.conds antes del primer cambio), no a la última que se cargó.
+    Devuelve {'cache': 'loaded'|'memory'|'disk'|'miss', 'time'}."""
+    global _cond_key, _default_conds
+    start = time.time()
+    if _cond_key is None:
+        _default_conds, _cond_key = m.conds, 'default'
+    if not prompt:
+        if _cond_key != 'default':
+            m.conds, _cond_key = _default_conds, 'default'
+        return {'cache': 'loaded', 'time': 0.0}
+    local = _reference_clip(prompt)
+    key = (_file_hash(local), language, float(exaggeration))
+    if key == _cond_key:
+        return {'cache': 'loaded', 'time': 0.0}
+
+    path = os.path.join(CACHE_DIR, 'conds', f'{key[0][:32]}_{language}_{key[2]:g}.pt')
+    if key in _conds:
+        _conds.move_to_end(key)
+        m.conds, source = _conds[key], 'memory'
+    elif os.path.isfile(path):
+        cls = type(m.conds) if m.conds is not None else __import__('chatterbox.mtl_tts', fromlist=['Conditionals']).Conditionals
+        m.conds, source = cls.load(path, map_location=_dev or 'cpu').to(_dev or 'cpu'), 'disk'
+    else:
+        m.prepare_conditionals(local, exaggeration=exaggeration)
+        source = 'miss'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.tmp.pt'  # otras réplicas pueden leer el mismo archivo
+            m.conds.save(tmp)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f'[Chatterbox] No se pudo guardar el condicionamiento: {e}', flush=True)
+    _conds[key] = m.conds
+    while len(_conds) > COND_CACHE_SIZE:
+        _conds.popitem(last=False)
+    _cond_key = key
+    return {'cache': source, 'time': round(time.time() - start, 3)}
+
+
+class PhraseCache:
+    """Audio ya generado por chunk, direccionado por contenido.
+
+    Cada entrada es un .npz con el audio y lo que costó generarlo; el mtime marca
+    el último uso y se expulsan las más antiguas al superar max_mb."""
+
+    def __init__(self, cache_dir, max_mb):
+        self.cache_dir = cache_dir
+        self.max_mb = max_mb
+        self._size = None  # bytes en disco, calculado al primer put
+        self._lock = threading.Lock()  # _size y la expulsión, compartidos por los workers
+
+    @staticmethod
+    def make_key(text, voice_hash, params):
+        import hashlib
+        material = json.dumps([
+            ' '.join(text.split()), params['language'], voice_hash,
+            params['exaggeration'], params['cfg_weight'], params['temperature'], params['seed'],
+        ])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def get(self, key):
+        """(audio, segundos que costó generarlo) o None"""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                wav, gen_time = data['wav'], float(data['time'])
+            os.utime(path, None)  # Marcar como usado recientemente (LRU)
+            return wav, gen_time
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, wav, gen_time):
+        if self.max_mb <= 0:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        # Nombre temporal único por hilo y proceso: dos workers pueden guardar la misma frase
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.tmp.npz', delete=False) as f:
+            np.savez(f, wav=np.asarray(wav, dtype=np.float32), time=np.float64(gen_time))
+            tmp = f.name
+        try:
+            os.replace(tmp, path)
+            size = os.path.getsize(path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += size
+            if self._size > self.max_mb * 1024 * 1024:
+                self._prune()
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npz') or '.tmp' in name:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def prune(self):
+        """Expulsa las entradas menos usadas hasta quedar bajo max_mb"""
+        with self._lock:
+            self._prune()
+
+    def _prune(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_mb * 1024 * 1024:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._size = total
+
+    def stats(self):
+        return {
+            'size_mb': round((self._size or 0) / 1024 / 1024, 2),
+            'max_mb': self.max_mb,
+        }
+
+
+_phrases = PhraseCache(os.path.join(CACHE_DIR, 'phrases'), PHRASE_CACHE_MAX_MB)
+
+
+def _voice_hash(prompt):
+    """Hash del contenido del audio de referencia ('default' sin referencia)"""
+    return _file_hash(_reference_clip(prompt)) if prompt else 'default'
+
+
+def _to_numpy(w):
+    return w.squeeze(0).cpu().numpy() if hasattr(w, 'squeeze') else np.array(w)
+
+
+def _generate_batch(m, key, texts):
+    """Genera varios chunks con el mismo condicionamiento (ya cargado en m.conds).
+
+    ChatterboxMultilingualTTS.generate sintetiza un texto por llamada (T3 usa las dos
+    filas del lote para CFG), así que los chunks van uno tras otro; el lote ahorra
+    el condicionamiento y el viaje a la réplica, el paralelismo lo ponen las réplicas."""
+    language, audio_prompt, exaggeration, cfg_weight, temperature, seed = key
+    kwargs = dict(language_id=language, exaggeration=exaggeration, cfg_weight=cfg_weight, temperature=temperature)
+    wavs = []
+    for text in texts:
+        if seed is not None: torch.manual_seed(seed)  # misma semilla por chunk: el audio solo depende del texto
+        wavs.append(_to_numpy(m.generate(text, audio_prompt_path=None, **kwargs)))
+    return wavs
+
+
+def _start(job):
+    """Pasa un trabajo de la cola a activo. Requiere _state_lock"""
+    del _pending[job.id]
+    job.status = 'running'
+    job.started_at = time.time()
+    job.texts = _split_chunks(job.params['text'])
+    job.timings['split'] = time.time() - job.started_at
+    job.chunks = len(job.texts)
+    job.chars_total = sum(len(c) for c in job.texts)
+    wait = job.wait_time
+    _stats['started'] += 1
+    _stats['total_wait'] += wait
+    _stats['max_wait'] = max(_stats['max_wait'], wait)
+    _stats['last_wait'] = wait
+    _metrics['queue_wait'].observe(wait)
+    _active.append(job)
+    print(f'[Chatterbox] Trabajo {job.id}: lang={job.params["language"]} prompt={job.params["audio_prompt"]} chunks={job.chunks}', flush=True)
+
+
+def _finish(job, status, error=None):
+    """Cierra un trabajo activo. Requiere _state_lock"""
+    if job in _active:
+        _active.remove(job)
+    job.status = status
+    job.error = error
+    job.finished_at = time.time()
+    job.wavs = {}
+    with job.lock:
+        if job.writer is not None:  # fallido o cancelado a medias: descartar el .part
+            job.writer.abort()
+            job.writer = None
+    if job.stream is not None:
+        job.stream.put(None)
+    _stats[{'done': 'processed'}.get(status, status)] += 1
+    if status == 'done':
+        _metrics['job_duration'].observe(job.finished_at - job.started_at)
+        for stage, seconds in job.timings.items():
+            _metrics['stage_seconds'][stage] += seconds
+    job.done.set()
+
+
+def _next_batch():
+    """Espera trabajo y arma el siguiente lote: [(job, índice de chunk), ...].
+
+    El trabajo activo más antiguo con chunks sin repartir fija la clave de
+    condicionamiento; el lote se completa con sus chunks y con los de otros
+    trabajos (activos o en cola) que compartan clave. Los trabajos con otra voz
+    esperan a que se vacíe el grupo, salvo que lleven más de BATCH_MAX_DEFER
+    segundos en cola: entonces ya no se adelantan trabajos que llegaron después.
+    Con varias réplicas, cada una pide su lote aquí: los chunks pendientes de la
+    clave se reparten entre las réplicas libres (hasta BATCH_SIZE por lote) para
+    que se generen a la vez en lugar de en fila en una sola."""
+    global _idle_workers
+    with _work_ready:
+        _idle_workers += 1
+        while True:
+            for job in [j for j in _active if j.cancel_requested.is_set() and not j.in_flight]:
+                print(f'[Chatterbox] Trabajo {job.id} cancelado en el chunk {job.chunk + 1}/{job.chunks}', flush=True)
+                _finish(job, 'cancelled', 'cancelado')
+            open_jobs = [j for j in _active if j.next_chunk < j.chunks and not j.cancel_requested.is_set()]
+            if open_jobs:
+                _idle_workers -= 1
+                break
+            if _pending:
+                _start(next(iter(_pending.values())))
+                continue
+            _work_ready.wait()
+
+        key = open_jobs[0].cond_key
+        batch_size = max(1, BATCH_SIZE)
+        for job in list(_pending.values()):
+            if sum(j.chunks - j.next_chunk for j in _active if j.cond_key == key) >= batch_size:
+                break
+            if job.cond_key == key:
+                _start(job)
+            elif job.wait_time > BATCH_MAX_DEFER:
+                break
+
+        # Repartir lo pendiente de la clave entre esta réplica y las que siguen esperando
+        remaining = sum(j.chunks - j.next_chunk for j in _active if j.cond_key == key and not j.cancel_requested.is_set())
+        batch_size = min(batch_size, -(-remaining // (_idle_workers + 1)))
+        batch = []
+        for job in _active:
+            if job.cond_key != key or job.cancel_requested.is_set():
+                continue
+            while job.next_chunk < job.chunks and len(batch) < batch_size:
+                batch.append((job, job.next_chunk))
+                job.next_chunk += 1
+                job.in_flight += 1
+        if _pending or any(j.next_chunk < j.chunks for j in _active):
+            _work_ready.notify()  # queda trabajo para otra réplica libre
+        return key, batch
+
+
+def _pcm16(audio):
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+
+class AudioWriter:
+    """Escribe el audio de un trabajo a medida que llegan los chunks.
+
+    Se escribe en <output>.part y se renombra al cerrar, así un archivo con el
+    nombre final siempre está completo. WAV/FLAC van con soundfile (corrige la
+    cabecera al cerrar); sin soundfile, WAV con el módulo wave. Otros formatos
+    se acumulan y se guardan al final con ta.save."""
+
+    def __init__(self, output, sr):
+        self.output = output
+        self.sr = sr
+        self.part = output + '.part'
+        self.ext = os.path.splitext(output)[1].lower()
+        out_dir = os.path.dirname(output)
+        if out_dir: os.makedirs(out_dir, exist_ok=True)
+        self._sf = self._wave = self._buffer = None
+        if self.ext in ('.wav', '.flac'):
+            try:
+                import soundfile as sf
+                self._sf = sf.SoundFile(self.part, 'w', samplerate=sr, channels=1, format=self.ext[1:].upper(),
+                                        subtype='FLOAT' if self.ext == '.wav' else 'PCM_24')
+            except ImportError:
+                pass
+        if self._sf is None and self.ext == '.wav':
+            import wave
+            self._wave = wave.open(self.part, 'wb')
+            self._wave.setnchannels(1)
+            self._wave.setsampwidth(2)
+            self._wave.setframerate(sr)
+        elif self._sf is None:
+            self._buffer = []
+
+    def write(self, audio):
+        if self._sf is not None: self._sf.write(audio)
+        elif self._wave is not None: self._wave.writeframes(_pcm16(audio))
+        else: self._buffer.append(audio)
+
+    def close(self):
+        if self._sf is not None: self._sf.close()
+        elif self._wave is not None: self._wave.close()
+        else: ta.save(self.part, torch.from_numpy(np.concatenate(self._buffer)).unsqueeze(0), self.sr, format=self.ext[1:])
+        os.replace(self.part, self.output)
+
+    def abort(self):
+        try:
+            if self._sf is not None: self._sf.close()
+            elif self._wave is not None: self._wave.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self.part)
+        except OSError:
+            pass
+
+
+def _deliver(job, i, wav, sr, saved=None, gen_time=0.0):
+    """Recibe el chunk i y escribe (con 0.3 s de silencio entre chunks) los que ya están en orden.
+    saved: segundos ahorrados si el chunk salió de la caché de frases; gen_time: lo que tardó el modelo.
+    Devuelve el resultado del trabajo si con este chunk quedó completo."""
+    with job.lock:
+        if job.done.is_set():
+            return None  # cancelado o fallido mientras se generaba
+        job.chunk += 1
+        job.chars_done += len(job.texts[i])
+        job.timings['generate'] += gen_time
+        if saved is not None:
+            job.phrase_hits += 1
+            job.phrase_time_saved += saved
+        job.wavs[i] = wav
+        start = time.time()
+        _write_ready(job, sr)
+        job.timings['concatenate'] += time.time() - start
+        return _save(job) if job.chunk == job.chunks else None
+
+
+def _write_ready(job, sr):
+    while job.written in job.wavs:
+        audio = job.wavs.pop(job.written)
+        if job.writer is None:
+            job.writer = AudioWriter(job.params['output'], sr)
+            job.first_audio_at = time.time()
+        pieces = [np.zeros(int(sr * 0.3), dtype=np.float32), audio] if job.written else [audio]
+        for piece in pieces:
+            job.writer.write(piece)
+            job.samples += len(piece)
+            if job.stream is not None:
+                job.stream.put(_pcm16(piece))
+        if job.params.get('sidecar'):
+            job.segments.append(_chunk_segment(job.texts[job.written], audio, sr, (job.samples - len(audio)) / sr,
+                                               job.params.get('word_timings')))
+        job.written += 1
+
+
+SILENCE_RATIO = 0.05  # energía por debajo de este tanto del máximo del chunk = silencio
+WORD_SNAP = 0.15      # segundos alrededor del reparto proporcional donde buscar la pausa entre palabras
+
+
+def _frame_energy(audio, sr, hop=0.01):
+    """RMS en ventanas de hop segundos. Devuelve (energía, muestras por ventana)"""
+    size = max(1, int(sr * hop))
+    frames = len(audio) // size
+    if frames == 0:
+        return np.zeros(0, dtype=np.float32), size
+    return np.sqrt(np.mean(np.square(audio[:frames * size].reshape(frames, size)), axis=1)), size
+
+
+def _estimate_words(words, energy, first, last, threshold):
+    """(inicio, fin) en ventanas de cada palabra dentro del tramo con voz [first, last).
+
+    Reparte el tramo en proporción a los caracteres de cada palabra, mueve cada
+    frontera a la ventana en silencio más cercana (la pausa entre palabras; si no
+    hay, al mínimo de energía) y recorta el silencio que quede en cada palabra."""
+    weights = np.array([len(w) for w in words], dtype=np.float64)
+    bounds = (first + (last - first) * np.concatenate([[0.0], np.cumsum(weights) / weights.sum()])).astype(np.int64)
+    radius = int(WORD_SNAP / 0.01)
+    for k in range(1, len(words)):
+        lo = max(bounds[k - 1] + 1, bounds[k] - radius)
+        hi = min(last - 1, bounds[k] + radius)
+        if lo >= hi:
+            continue
+        silent = np.flatnonzero(energy[lo:hi + 1] <= threshold)
+        if len(silent):
+            bounds[k] = lo + silent[np.argmin(np.abs(lo + silent - bounds[k]))]
+        else:
+            bounds[k] = lo + int(np.argmin(energy[lo:hi + 1]))
+    spans = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        voiced = np.flatnonzero(energy[a:b] > threshold)
+        spans.append((a + voiced[0], a + voiced[-1] + 1) if len(voiced) else (a, b))
+    return spans
+
+
+def _chunk_segment(text, audio, sr, offset, word_timings=False):
+    """Segmento {start, end, text} del chunk (el esquema de WhisperLocal.transcribe_audio),
+    recortando el silencio de los bordes; con word_timings añade words estimadas"""
+    energy, size = _frame_energy(audio, sr)
+    threshold = energy.max() * SILENCE_RATIO if len(energy) else 0.0
+    voiced = np.flatnonzero(energy > threshold)
+    first, last = (int(voiced[0]), int(voiced[-1]) + 1) if len(voiced) else (0, len(energy))
+    to_time = lambda frame: round(offset + int(frame) * size / sr, 3)
+    segment = {'start': to_time(first), 'end': to_time(last) if len(energy) else round(offset + len(audio) / sr, 3),
+               'text': text}
+    words = text.split()
+    if word_timings and words and last > first:
+        spans = _estimate_words(words, energy, first, last, threshold)
+        segment['words'] = [{'start': to_time(a), 'end': to_time(b), 'word': w} for (a, b), w in zip(spans, words)]
+    return segment
+
+
+def _sidecar_path(output):
+    return output + '.timings.json'  # foo.wav -> foo.wav.timings.json
+
+
+def _write_sidecar(job, sr):
+    """Tiempos del audio en el formato de transcribe_audio para no pasar Whisper después"""
+    path = _sidecar_path(job.params['output'])
+    data = {
+        'success': True,
+        'transcript': ' '.join(seg['text'] for seg in job.segments),
+        'language': job.params['language'],
+        'language_probability': 1.0,
+        'duration': round(job.samples / sr, 3),
+        'model_info': {'source': 'chatterbox', 'word_timings': 'energy' if job.params.get('word_timings') else None},
+        'segments': job.segments,
+    }
+    tmp = path + '.part'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
+
+
+def _save(job):
+    """Cierra la salida del trabajo una vez escritos todos sus chunks"""
+    start = time.time()
+    sr = job.writer.sr
+    job.writer.close()
+    job.writer = None
+    sidecar = _write_sidecar(job, sr) if job.params.get('sidecar') else None
+    job.timings['save'] = time.time() - start
+    # Sin conditioning: todos los chunks salieron de la caché y no hizo falta la voz
+    return {'success': True, 'output': job.params['output'], 'chunks': job.chunks,
+            'time_to_first_audio': round(job.first_audio_at - job.started_at, 3),
+            'conditioning': job.conditioning or {'cache': 'unused', 'time': 0.0},
+            'phrase_cache': job.phrase_stats(),
+            'sidecar': sidecar,
+            'timings': {k: round(v, 3) for k, v in job.timings.items()}}
+
+
+def _peak_rss():
+    """Pico de memoria residente de este proceso en bytes (None si no se puede medir)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # Linux lo da en KiB
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset
+        except Exception:
+            return None
+
+
+def _pin(cores, threads):
+    """Fija el proceso a unos núcleos y ajusta los hilos de torch"""
+    try:
+        os.sched_setaffinity(0, cores)
+    except AttributeError:  # Windows / macOS
+        try:
+            import psutil
+            psutil.Process().cpu_affinity(list(cores))
+        except Exception:
+            pass
+    except OSError:
+        pass
+    torch.set_num_threads(max(1, threads))
+
+
+def _replica_main(conn, cores, threads, loader=None, fast=''):
+    """Proceso de una réplica: carga su propio modelo y atiende lotes por el pipe"""
+    _pin(cores, threads)
+    start = time.time()
+    if loader:
+        m = loader()
+    else:
+        _load('cpu', fast)  # las réplicas se reparten la CPU; una GPU se aprovecha mejor con lotes
+        m = _model
+    conn.send(('ready', m.sr, os.getpid(), round(time.time() - start, 2)))
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        key, texts = msg
+        try:
+            language, audio_prompt, exaggeration = key[:3]
+            conditioning = _apply_conditionals(m, audio_prompt, language, exaggeration)
+            conn.send(('ok', _generate_batch(m, key, texts), conditioning, _peak_rss()))
+        except Exception as e:
+            conn.send(('error', str(e), None, _peak_rss()))
+
+
+class LocalReplica:
+    """El modelo de este proceso (modo por defecto)"""
+
+    def __init__(self):
+        self.index = 0
+        self.cores = None
+        self.pid = os.getpid()
+        self.sr = _get().sr
+        self.load_time = _load_info.get('load_time')
+        self.peak_rss = None  # el de este proceso; se mide en /metrics
+        self.busy = False
+        self.batches = 0
+
+    def run(self, key, texts):
+        """Genera un lote. Devuelve (audios, origen del condicionamiento)"""
+        with _lock:
+            m = _get()
+            language, audio_prompt, exaggeration = key[:3]
+            conditioning = _apply_conditionals(m, audio_prompt, language, exaggeration)
+            return _generate_batch(m, key, texts), conditioning
+
+    def info(self):
+        return {'index': self.index, 'pid': self.pid, 'cores': self.cores, 'busy': self.busy, 'batches': self.batches}
+
+
+class ProcessReplica(LocalReplica):
+    """Modelo en un proceso hijo fijado a `cores`, con `threads` hilos de torch"""
+
+    def __init__(self, index, cores, threads, loader=None):
+        self.index = index
+        self.cores = list(cores)
+        self.threads = threads
+        self.loader = loader
+        self.peak_rss = None
+        self.busy = False
+        self.batches = 0
+        self._spawn()
+
+    def _spawn(self):
+        import multiprocessing as mp
+        self.conn, child = mp.Pipe()
+        self.process = mp.Process(target=_replica_main, args=(child, self.cores, self.threads, self.loader, FAST_MODE),
+                                  name=f'chatterbox-replica-{self.index}', daemon=True)
+        self.process.start()
+        _, self.sr, self.pid, self.load_time = self.conn.recv()
+        print(f'[Chatterbox] Réplica {self.index} lista (pid {self.pid}, núcleos {self.cores}, {self.threads} hilos)', flush=True)
+
+    def run(self, key, texts):
+        try:
+            self.conn.send((key, texts))
+            status, payload, conditioning, self.peak_rss = self.conn.recv()
+        except (EOFError, OSError) as e:
+            print(f'[Chatterbox] Réplica {self.index} caída ({e}), reiniciando...', flush=True)
+            self.process.kill()
+            self._spawn()
+            raise RuntimeError(f'la réplica {self.index} se cayó durante la generación')
+        if status == 'error':
+            raise RuntimeError(payload)
+        return payload, conditioning
+
+
+def _start_replicas(count, threads=None, loader=None):
+    """Arranca `count` réplicas repartiendo los núcleos disponibles en bloques contiguos"""
+    try:
+        cores = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = list(range(os.cpu_count() or 1))
+    if count > len(cores):  # más réplicas que núcleos: comparten núcleo de a una
+        groups = [[cores[i % len(cores)]] for i in range(count)]
+    else:
+        per = len(cores) // count
+        groups = [cores[i * per:(i + 1) * per] for i in range(count)]
+    return [ProcessReplica(i, group, threads or len(group), loader) for i, group in enumerate(groups)]
+
+
+def _worker(replica):
+    """Reparte lotes de chunks a una réplica del modelo, de uno en uno"""
+    while True:
+        key, batch = _next_batch()
+        jobs = list(OrderedDict.fromkeys(job for job, _ in batch))
+        todo = []
+        saved = 0.0
+        finished = {}
+        samples = {}  # (job, chunk) -> muestras de audio
+        gen_time = 0.0
+        conditioning = None
+        try:
+            voice = _voice_hash(key[1])
+
+            # Chunks ya generados antes con el mismo texto y parámetros
+            for job, i in batch:
+                phrase_key = PhraseCache.make_key(job.texts[i], voice, job.params)
+                cached = _phrases.get(phrase_key) if job.params['use_cache'] else None
+                if cached is None:
+                    todo.append((job, i, phrase_key))
+                    continue
+                saved += cached[1]
+                samples[job.id, i] = len(cached[0])
+                finished[job.id] = _deliver(job, i, cached[0], replica.sr, saved=cached[1])
+
+            if todo:
+                for job, i, _ in todo:
+                    print(f'[Chatterbox] Trabajo {job.id} chunk {i+1}/{job.chunks}: {job.texts[i][:60]}', flush=True)
+                replica.busy = True
+                gen_start = time.time()
+                try:
+                    wavs, conditioning = replica.run(key, [job.texts[i] for job, i, _ in todo])
+                finally:
+                    replica.busy = False
+                # El tiempo del condicionamiento va a su etapa, no a la de generación
+                gen_time = max(0.0, time.time() - gen_start - conditioning['time']) / len(todo)
+                first = conditioning
+                for job in jobs:
+                    if job.conditioning is None:
+                        job.conditioning = first
+                        with job.lock:
+                            job.timings['conditioning'] += first['time']
+                        first = {'cache': 'loaded', 'time': 0.0}  # el resto del lote ya lo encuentra cargado
+                for (job, i, phrase_key), w in zip(todo, wavs):
+                    samples[job.id, i] = len(w)
+                    finished[job.id] = _deliver(job, i, w, replica.sr, gen_time=gen_time)
+                    try:
+                        _phrases.put(phrase_key, w, gen_time)
+                    except OSError as e:
+                        print(f'[Chatterbox] No se pudo guardar el chunk en caché: {e}', flush=True)
+        except Exception as e:
+            print(f'[Chatterbox] Error: {e}', flush=True)
+            with _state_lock:
+                for job, _ in batch:
+                    job.in_flight -= 1
+                for job in jobs:
+                    if not job.done.is_set():
+                        _finish(job, 'failed', str(e))
+                _work_ready.notify()
+            continue
+        with _work_ready:
+            for job, _ in batch:
+                job.in_flight -= 1
+            if todo:
+                replica.batches += 1
+                _stats['batches'] += 1
+                _stats['batched_chunks'] += len(todo)
+            if conditioning and conditioning['cache'] != 'loaded':
+                _stats[f"cond_{conditioning['cache']}"] += 1
+            _stats['phrase_hits'] += len(batch) - len(todo)
+            _stats['phrase_misses'] += len(todo)
+            _stats['phrase_time_saved'] += saved
+            _metrics['audio_seconds'] += sum(samples.values()) / replica.sr
+            for job, i, _ in todo:
+                _metrics['chunk_generate'].observe(gen_time)
+                _metrics['generate_seconds'] += gen_time
+                _metrics['generated_audio_seconds'] += samples[job.id, i] / replica.sr
+            for job in jobs:
+                if finished.get(job.id):
+                    job.result = finished[job.id]
+                    _finish(job, 'done')
+            _work_ready.notify()  # un cancelado puede haber quedado sin chunks en vuelo
+
+
+def _submit(params):
+    """Encola un trabajo; devuelve None si la cola está llena"""
+    job = Job(params)
+    with _work_ready:
+        if len(_pending) >= MAX_QUEUE:
+            _stats['rejected'] += 1
+            return None
+        _pending[job.id] = job
+        _all_jobs[job.id] = job
+        # Olvidar los trabajos terminados más antiguos
+        while len(_all_jobs) > JOB_HISTORY:
+            oldest = next((k for k, j in _all_jobs.items() if j.done.is_set()), None)
+            if oldest is None: break
+            del _all_jobs[oldest]
+        _work_ready.notify()
+    return job
+
+
+def _cancel(job):
+    """Pide cancelar un trabajo. En cola se descarta ya; en curso, al acabar el lote actual"""
+    job.cancel_requested.set()
+    with _state_lock:
+        if job.status == 'queued':
+            _pending.pop(job.id, None)
+            job.status = 'cancelled'
+            job.error = 'cancelado'
+            job.finished_at = time.time()
+            _stats['cancelled'] += 1
+            if job.stream is not None:
+                job.stream.put(None)
+            job.done.set()
+        else:
+            _work_ready.notify_all()  # sin chunks en vuelo, una réplica libre lo cierra ya
+
+
+def _status():
+    with _state_lock:
+        return {
+            'model_loaded': bool(_replicas),
+            'replicas': [r.info() for r in _replicas],
+            'device': _dev,
+            'fast_mode': FAST_MODE or None,
+            'model': _load_info,
+            'busy': bool(_active),
+            'running_jobs': [{
+                'id': job.id,
+                'running_for': round(time.time() - job.started_at, 2),
+                'waited': round(job.wait_time, 2),
+                'chunk': job.chunk,
+                'chunks': job.chunks,
+            } for job in _active],
+            'queue_depth': len(_pending),
+            'max_queue': MAX_QUEUE,
+            'batch_size': BATCH_SIZE,
+            'phrase_cache': {
+                'hits': _stats['phrase_hits'],
+                'misses': _stats['phrase_misses'],
+                'hit_ratio': round(_stats['phrase_hits'] / (_stats['phrase_hits'] + _stats['phrase_misses']), 3)
+                             if _stats['phrase_hits'] + _stats['phrase_misses'] else 0.0,
+                'time_saved': round(_stats['phrase_time_saved'], 2),
+                **_phrases.stats(),
+            },
+            'conditioning_cache': {
+                'entries': len(_conds),
+                'memory_hits': _stats['cond_memory'],
+                'disk_hits': _stats['cond_disk'],
+                'misses': _stats['cond_miss'],
+            },
+            'avg_batch': round(_stats['batched_chunks'] / _stats['batches'], 2) if _stats['batches'] else 0.0,
+            'oldest_wait': round(max((j.wait_time for j in _pending.values()), default=0.0), 2),
+            'processed': _stats['processed'],
+            'failed': _stats['failed'],
+            'cancelled': _stats['cancelled'],
+            'rejected': _stats['rejected'],
+            'avg_wait': round(_stats['total_wait'] / _stats['started'], 2) if _stats['started'] else 0.0,
+            'max_wait': round(_stats['max_wait'], 2),
+            'last_wait': round(_stats['last_wait'], 2),
+        }
+
+
+ROUTES = {'/health', '/status', '/metrics', '/generate', '/jobs', '/jobs/{id}', '/jobs/{id}/cancel'}
+
+
+def _route(path):
+    """Ruta sin query ni id de trabajo, para no abrir una serie de métricas por trabajo.
+    Cualquier ruta desconocida cuenta como 'other' (un escáner no crea series nuevas)"""
+    parts = path.split('?')[0].strip('/').split('/')
+    if parts[0] == 'jobs' and len(parts) > 1:
+        parts[1] = '{id}'
+    route = '/' + '/'.join(parts)
+    return route if route in ROUTES else 'other'
+
+
+def _metrics_snapshot():
+    """Métricas en JSON (GET /metrics?format=json)"""
+    with _state_lock:
+        m = _metrics
+        return {
+            'requests': [{'method': k[0], 'path': k[1], 'code': k[2], 'count': n} for k, n in sorted(m['requests'].items())],
+            'jobs': {status: _stats[key] for status, key in
+                     (('done', 'processed'), ('failed', 'failed'), ('cancelled', 'cancelled'), ('rejected', 'rejected'))},
+            'queue_depth': len(_pending),
+            'running_jobs': len(_active),
+            'queue_wait': m['queue_wait'].to_dict(),
+            'chunk_generate': m['chunk_generate'].to_dict(),
+            'job_duration': m['job_duration'].to_dict(),
+            'audio_seconds': round(m['audio_seconds'], 3),
+            'generated_audio_seconds': round(m['generated_audio_seconds'], 3),
+            'generate_seconds': round(m['generate_seconds'], 3),
+            'real_time_factor': round(m['generate_seconds'] / m['generated_audio_seconds'], 3)
+                                if m['generated_audio_seconds'] else None,
+            'stage_seconds': {k: round(v, 3) for k, v in m['stage_seconds'].items()},
+            'model_load_seconds': {str(r.index): r.load_time for r in _replicas},
+            'peak_rss_bytes': {'server': _peak_rss(),
+                               **{f'replica_{r.index}': r.peak_rss for r in _replicas if isinstance(r, ProcessReplica)}},
+        }
+
+
+def _metrics_prometheus():
+    """Métricas en formato de texto de Prometheus (GET /metrics)"""
+    snap = _metrics_snapshot()
+    lines = ['# HELP chatterbox_requests_total Peticiones HTTP atendidas', '# TYPE chatterbox_requests_total counter']
+    lines += [f'chatterbox_requests_total{{method="{r["method"]}",path="{r["path"]}",code="{r["code"]}"}} {r["count"]}'
+              for r in snap['requests']]
+    lines += ['# HELP chatterbox_jobs_total Trabajos terminados por estado', '# TYPE chatterbox_jobs_total counter']
+    lines += [f'chatterbox_jobs_total{{status="{k}"}} {v}' for k, v in snap['jobs'].items()]
+    for name, help_text in (('queue_depth', 'Trabajos en cola'), ('running_jobs', 'Trabajos en curso')):
+        lines += [f'# HELP chatterbox_{name} {help_text}', f'# TYPE chatterbox_{name} gauge', f'chatterbox_{name} {snap[name]}']
+    with _state_lock:
+        lines += _metrics['queue_wait'].prometheus('chatterbox_queue_wait_seconds', 'Espera en cola hasta empezar')
+        lines += _metrics['chunk_generate'].prometheus('chatterbox_chunk_generate_seconds', 'Generación de un chunk en el modelo')
+        lines += _metrics['job_duration'].prometheus('chatterbox_job_duration_seconds', 'Duración de los trabajos completados')
+    for name, help_text in (('audio_seconds', 'Audio entregado, incluida la caché de frases'),
+                            ('generated_audio_seconds', 'Audio generado por el modelo'),
+                            ('generate_seconds', 'Tiempo de generación del modelo')):
+        lines += [f'# HELP chatterbox_{name}_total {help_text}', f'# TYPE chatterbox_{name}_total counter',
+                  f'chatterbox_{name}_total {snap[name]}']
+    if snap['real_time_factor'] is not None:
+        lines += ['# HELP chatterbox_real_time_factor Segundos de generación por segundo de audio',
+                  '# TYPE chatterbox_real_time_factor gauge', f'chatterbox_real_time_factor {snap["real_time_factor"]}']
+    lines += ['# HELP chatterbox_stage_seconds_total Tiempo por etapa en trabajos completados',
+              '# TYPE chatterbox_stage_seconds_total counter']
+    lines += [f'chatterbox_stage_seconds_total{{stage="{k}"}} {v}' for k, v in snap['stage_seconds'].items()]
+    lines += ['# HELP chatterbox_model_load_seconds Carga del modelo por réplica', '# TYPE chatterbox_model_load_seconds gauge']
+    lines += [f'chatterbox_model_load_seconds{{replica="{k}"}} {v}' for k, v in snap['model_load_seconds'].items() if v is not None]
+    lines += ['# HELP chatterbox_peak_rss_bytes Pico de memoria residente por proceso', '# TYPE chatterbox_peak_rss_bytes gauge']
+    lines += [f'chatterbox_peak_rss_bytes{{process="{k}"}} {v}' for k, v in snap['peak_rss_bytes'].items() if v is not None]
+    return '\n'.join(lines) + '\n'
+
+
 class Handler(BaseHTTPRequestHandler):
     def log_message(self, *_): pass
 
-    def _json(self, code, obj):
+    def log_request(self, code='-', size='-'):
+        """Lo llama send_response: cuenta la petición para /metrics"""
+        key = (self.command, _route(self.path), str(getattr(code, 'value', code)))
+        with _state_lock:
+            _metrics['requests'][key] = _metrics['requests'].get(key, 0) + 1
+
+    def _json(self, code, obj, headers=None):
         body = json.dumps(obj).encode()
         self.send_response(code)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
         self.end_headers()
         self.wfile.write(body)
 
-    def do_GET(self):
-        if self.path == '/health':
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(b'OK')
-        else:
-            self.send_response(404); self.end_headers()
-
-    def do_POST(self):
-        if self.path != '/generate':
-            self.send_response(404); self.end_headers(); return
+    def _job(self):
+        """Trabajo de /jobs/<id>[/...] o None (ya respondido 404)"""
+        parts = self.path.strip('/').split('/')
+        with _state_lock:
+            job = _all_jobs.get(parts[1]) if len(parts) > 1 else None
+        if job is None:
+            self._json(404, {'error': 'trabajo no encontrado'})
+        return job
 
+    def _read_params(self):
+        """Valida el cuerpo de /generate o /jobs. Devuelve params o None (ya respondido 400)"""
         try:
             body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
         except Exception as e:
-            self._json(400, {'error': f'JSON invalido: {e}'}); return
+            self._json(400, {'error': f'JSON invalido: {e}'}); return None
 
         text         = body.get('text', '').strip()
         output       = body.get('output', '').strip()
@@ -103,77 +1275,147 @@ class Handler(BaseHTTPRequestHandler):
         exaggeration = float(body.get('exaggeration', 0.5))
         cfg_weight   = float(body.get('cfg_weight', 0.5))
         temperature  = float(body.get('temperature', 0.8))
+        seed         = body.get('seed')                 # fija el muestreo por chunk
+        use_cache    = body.get('use_cache', True)      # False: regenerar aunque el chunk esté en caché
+        stream       = body.get('stream', False)        # /generate: devolver PCM a medida que se genera
+        sidecar      = body.get('sidecar', True)        # <output>.timings.json con tiempos por chunk
+        word_timings = body.get('word_timings', False)  # y por palabra, estimados con la energía del audio
 
-        if not text:   self._json(400, {'error': 'text requerido'}); return
-        if not output: self._json(400, {'error': 'output requerido'}); return
+        if not text:   self._json(400, {'error': 'text requerido'}); return None
+        if not output: self._json(400, {'error': 'output requerido'}); return None
 
         # Si el usuario no eligió voz propia, usar el audio de referencia del idioma
         audio_prompt = voice if (voice and os.path.isfile(voice)) else LANGUAGE_AUDIO.get(language)
 
+        return {
+            'text': text,
+            'output': output,
+            'language': language,
+            'audio_prompt': audio_prompt,
+            'exaggeration': exaggeration,
+            'cfg_weight': cfg_weight,
+            'temperature': temperature,
+            'seed': int(seed) if seed is not None else None,
+            'use_cache': bool(use_cache),
+            'stream': bool(stream) and self.path == '/generate',
+            'sidecar': bool(sidecar),
+            'word_timings': bool(word_timings),
+        }
+
+    def _enqueue(self):
+        params = self._read_params()
+        if params is None: return None
+        job = _submit(params)
+        if job is None:
+            self._json(503, {'error': 'cola llena', **_status()}, {'Retry-After': '5'})
+        return job
+
+    def _stream(self, job):
+        """Responde con PCM 16 bits mono en HTTP chunked a medida que se escriben los chunks.
+        El estado final se consulta en GET /jobs/<X-Job-Id>; si el cliente corta, se cancela."""
+        self.protocol_version = 'HTTP/1.1'
+        self.send_response(200)
+        self.send_header('Content-Type', f'audio/L16; rate={_replicas[0].sr}; channels=1')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('X-Job-Id', job.id)
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
         try:
-            with _lock:
-                m = _get()
-
-                # Split into ~250-char chunks to bypass the ~15s per-call limit
-                sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
-                if not sentences:
-                    sentences = [text]
-
-                chunks = []
-                cur = ''
-                for s in sentences:
-                    if len(cur) + len(s) + 1 <= 250:
-                        cur = (cur + ' ' + s).strip()
-                    else:
-                        if cur:
-                            chunks.append(cur)
-                        cur = s
-                if cur:
-                    chunks.append(cur)
-
-                # Ensure every chunk ends with terminal punctuation so the model
-                # produces a closed prosodic contour (avoids cut-off-sounding audio)
-                chunks = [
-                    c if c and c[-1] in '.!?…' else c + '.'
-                    for c in chunks if c
-                ]
-
-                print(f'[Chatterbox] lang={language} prompt={audio_prompt} chunks={len(chunks)}', flush=True)
-                silence = np.zeros(int(m.sr * 0.3), dtype=np.float32)
-                wavs = []
-                current_prompt = audio_prompt  # solo en el primer chunk
-                for i, chunk in enumerate(chunks):
-                    print(f'[Chatterbox] Chunk {i+1}/{len(chunks)}: {chunk[:60]}', flush=True)
-                    w = m.generate(
-                        chunk,
-                        language_id=language,
-                        audio_prompt_path=current_prompt,
-                        exaggeration=exaggeration,
-                        cfg_weight=cfg_weight,
-                        temperature=temperature,
-                    )
-                    wavs.append(w.squeeze(0).cpu().numpy() if hasattr(w, 'squeeze') else np.array(w))
-                    if i < len(chunks) - 1:
-                        wavs.append(silence)
-                    current_prompt = None  # chunks siguientes reusan las condiciones ya cargadas
-
-                full = np.concatenate(wavs)
-                tensor = torch.from_numpy(full).unsqueeze(0)
-                out_dir = os.path.dirname(output)
-                if out_dir: os.makedirs(out_dir, exist_ok=True)
-                ta.save(output, tensor, m.sr)
-            self._json(200, {'success': True, 'output': output})
-        except Exception as e:
-            print(f'[Chatterbox] Error: {e}', flush=True)
-            self._json(500, {'error': str(e)})
+            while True:
+                data = job.stream.get()
+                if data is None: break
+                self.wfile.write(f'{len(data):X}\r\n'.encode() + data + b'\r\n')
+                self.wfile.flush()
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            print(f'[Chatterbox] Cliente desconectado, cancelando trabajo {job.id}', flush=True)
+            _cancel(job)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.end_headers()
+            self.wfile.write(b'OK')
+        elif self.path == '/status':
+            self._json(200, _status())
+        elif _route(self.path) == '/metrics':
+            if 'format=json' in self.path or 'application/json' in self.headers.get('Accept', ''):
+                self._json(200, _metrics_snapshot()); return
+            body = _metrics_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path.startswith('/jobs/'):
+            job = self._job()
+            if job: self._json(200, job.to_dict())
+        else:
+            self.send_response(404); self.end_headers()
+
+    def do_DELETE(self):
+        if not self.path.startswith('/jobs/'):
+            self.send_response(404); self.end_headers(); return
+        job = self._job()
+        if job:
+            _cancel(job)
+            self._json(200, job.to_dict())
+
+    def do_POST(self):
+        if self.path == '/jobs':
+            job = self._enqueue()
+            if job: self._json(202, job.to_dict())
+            return
+        if self.path.startswith('/jobs/') and self.path.endswith('/cancel'):
+            self.do_DELETE(); return
+        if self.path != '/generate':
+            self.send_response(404); self.end_headers(); return
+
+        job = self._enqueue()
+        if job is None: return
+        if job.stream is not None:
+            self._stream(job); return
+
+        job.done.wait()
+        timings = {
+            'queue_wait': round(job.wait_time, 3),
+            'generation_time': round(job.finished_at - job.started_at, 3) if job.started_at else 0.0,
+        }
+        if job.error:
+            self._json(500, {'error': job.error, **timings})
+        else:
+            self._json(200, {**job.result, **timings})
 
 
 if __name__ == '__main__':
     ap = argparse.ArgumentParser()
     ap.add_argument('--port', type=int, default=7171)
+    ap.add_argument('--max-queue', type=int, default=MAX_QUEUE, help='Trabajos en espera antes de responder 503')
+    ap.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Chunks por lote de generación')
+    ap.add_argument('--replicas', type=int, default=REPLICAS, help='Réplicas del modelo en procesos aparte, cada una en sus núcleos (0 = una en este proceso)')
+    ap.add_argument('--threads-per-replica', type=int, default=None, help='Hilos de torch por réplica (por defecto sus núcleos)')
+    ap.add_argument('--fast', choices=FAST_MODES, default=FAST_MODE, help='Modo rápido en CPU: int8 dinámico y/o torch.compile, con warmup')
+    ap.add_argument('--prefetch', action='store_true', help='Descargar ya todos los audios de referencia de LANGUAGE_AUDIO')
     args = ap.parse_args()
-    _load()
-    srv = HTTPServer(('127.0.0.1', args.port), Handler)
+    MAX_QUEUE = args.max_queue
+    BATCH_SIZE = args.batch_size
+    FAST_MODE = args.fast
+    if args.prefetch:
+        for url in LANGUAGE_AUDIO.values():
+            try: _reference_clip(url)
+            except Exception as e: print(f'[Chatterbox] No se pudo descargar {url}: {e}', flush=True)
+    if args.replicas > 0:
+        _dev = 'cpu'
+        _replicas.extend(_start_replicas(args.replicas, args.threads_per_replica))
+    else:
+        _load()
+        _replicas.append(LocalReplica())
+    for replica in _replicas:
+        threading.Thread(target=_worker, args=(replica,), name=f'chatterbox-worker-{replica.index}', daemon=True).start()
+    srv = ThreadingHTTPServer(('127.0.0.1', args.port), Handler)
+    srv.daemon_threads = True
     print(f'[Chatterbox] Servidor en http://127.0.0.1:{args.port}', flush=True)
     try: srv.serve_forever()
     except KeyboardInterrupt: print('[Chatterbox] Detenido.')
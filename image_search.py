@@ -1,86 +1,395 @@
 ﻿"""Download images using DuckDuckGo search (ddgs).
 Usage: echo JSON | python image_search.py
 Input JSON via stdin: {"query": "...", "max_num": 5, "output_dir": "..."}
+
+Batch mode: python image_search.py --batch [--terms 4] [--workers 8] [--global 16] [--per-host 2]
+Reads jobs from stdin, either a JSON list or one JSON object per line (NDJSON,
+processed as lines arrive), each {"id": ..., "query": ..., "max_num": ...,
+"output_dir": ...}. Up to --terms jobs run at once and one result line
+{"id", "query", "downloaded", "files"} (or with "error") is written per job as
+soon as it finishes. The process exits when stdin is closed and all jobs are done.
+
+Candidates are downloaded concurrently (DOWNLOAD_WORKERS threads, at most
+PER_HOST_LIMIT requests at a time to the same host) over keep-alive
+connections reused from a ConnectionPool. As soon as max_num images are saved
+the remaining candidates are skipped and in-flight requests are aborted.
 """
 import sys
 import os
 import json
-import urllib.request
+import socket
+import argparse
+import threading
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 
-def main():
-    data = json.loads(sys.stdin.read())
-    query = data['query']
-    max_num = int(data['max_num'])
-    output_dir = data['output_dir']
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+MIN_IMAGE_BYTES = 1024  # smaller responses are error pages, not images
 
-    os.makedirs(output_dir, exist_ok=True)
+DOWNLOAD_WORKERS = 8
+PER_HOST_LIMIT = 2
+# Batch mode: terms searched/downloaded at once and downloads in flight overall
+TERM_WORKERS = 4
+GLOBAL_DOWNLOADS = 16
+MAX_IDLE_PER_HOST = 2
+TIMEOUT = 10
+MAX_REDIRECTS = 5
 
-    # Count existing image files before download
-    img_exts = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
-    before = set(f for f in os.listdir(output_dir) if os.path.splitext(f)[1].lower() in img_exts)
 
-    # Search for images using DuckDuckGo
+class Cancelled(Exception):
+    """Raised in download threads once enough images were saved"""
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections shared by the download threads.
+
+    Idle connections are kept per (scheme, host, port) and reused by the next
+    request to the same host. Requests can carry a cancel Event: abort(cancel)
+    sets it and shuts down the sockets of its requests still in flight so their
+    threads return right away; close() does the same for every request.
+    """
+
+    def __init__(self, timeout=TIMEOUT, max_idle=MAX_IDLE_PER_HOST):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.opened = 0
+        self.reused = 0
+        self.closed = False
+        self._idle = {}
+        self._active = {}  # connection -> cancel Event of its request
+        self._lock = threading.Lock()
+
+    def _cancelled(self, cancel):
+        return self.closed or (cancel is not None and cancel.is_set())
+
+    def _acquire(self, key, cancel):
+        with self._lock:
+            if self._cancelled(cancel):
+                raise Cancelled()
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                self.reused += 1
+                reused = True
+            else:
+                scheme, host, port = key
+                cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+                conn = cls(host, port, timeout=self.timeout)
+                self.opened += 1
+                reused = False
+            self._active[conn] = cancel
+        return conn, reused
+
+    def _release(self, key, conn, keep):
+        with self._lock:
+            self._active.pop(conn, None)
+            idle = self._idle.setdefault(key, [])
+            if keep and not self.closed and len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _request(self, key, path, cancel):
+        conn, reused = self._acquire(key, cancel)
+        keep = False
+        try:
+            conn.request('GET', path, headers={'User-Agent': USER_AGENT})
+            resp = conn.getresponse()
+            body = resp.read()
+            keep = not resp.will_close
+            return resp.status, resp.getheader('Location'), body
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            if self._cancelled(cancel):
+                raise Cancelled()
+            if not reused:
+                raise
+        except OSError:
+            if self._cancelled(cancel):
+                raise Cancelled()
+            raise
+        finally:
+            self._release(key, conn, keep)
+        # The server dropped an idle connection: retry once on a fresh one
+        return self._request(key, path, cancel)
+
+    def get(self, url, cancel=None):
+        """Body of a 200 response for url, following redirects"""
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            if parts.scheme not in ('http', 'https') or not parts.hostname:
+                raise ValueError(f"unsupported URL: {url[:80]}")
+            path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+            path = urllib.parse.quote(path, safe="/?&=%:;@!$'()*+,~")  # non-ASCII characters in the URL
+            status, location, body = self._request((parts.scheme, parts.hostname, parts.port), path, cancel)
+            if status in (301, 302, 303, 307, 308) and location:
+                url = urllib.parse.urljoin(url, location)
+                continue
+            if status != 200:
+                raise OSError(f"HTTP {status}")
+            return body
+        raise OSError("too many redirects")
+
+    def abort(self, cancel):
+        with self._lock:
+            cancel.set()
+            active = [conn for conn, owner in self._active.items() if owner is cancel]
+        self._shutdown(active)
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            active = list(self._active)
+            idle = [conn for conns in self._idle.values() for conn in conns]
+            self._idle.clear()
+        self._shutdown(active)
+        for conn in idle:
+            conn.close()
+
+    @staticmethod
+    def _shutdown(conns):
+        for conn in conns:
+            try:
+                if conn.sock:
+                    conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class DownloadLimits:
+    """In-flight download slots: at most `total` overall and `per_host` per host.
+
+    One instance can be shared by several download_images() calls (batch mode)
+    so the limits hold across terms; its condition also guards their state.
+    """
+
+    def __init__(self, total=None, per_host=PER_HOST_LIMIT):
+        self.total = total
+        self.per_host = per_host
+        self.count = 0
+        self.active = {}
+        self.cond = threading.Condition()
+
+    def try_acquire(self, host):
+        """Take a slot for host if one is free (call with cond held)"""
+        if (self.total and self.count >= self.total) or self.active.get(host, 0) >= self.per_host:
+            return False
+        self.count += 1
+        self.active[host] = self.active.get(host, 0) + 1
+        return True
+
+    def release(self, host):
+        """Give back a slot taken by try_acquire (call with cond held)"""
+        self.count -= 1
+        self.active[host] -= 1
+        if not self.active[host]:
+            del self.active[host]
+        self.cond.notify_all()
+
+
+def image_ext(url):
+    """Determine extension from URL"""
+    for e in ['.png', '.gif', '.webp', '.jpeg', '.bmp']:
+        if e in url.lower():
+            return e
+    return '.jpg'
+
+
+def _host(url):
+    """host[:port] used for the per-host limit"""
+    try:
+        return urllib.parse.urlsplit(url).netloc.lower()
+    except ValueError:
+        return None
+
+
+def search_images(query, max_num):
+    """Candidate results from DuckDuckGo (extra ones in case some fail to download)"""
     from ddgs import DDGS
 
     try:
-        results = DDGS().images(
+        return DDGS().images(
             query,
             region="us-en",
             safesearch="on",
-            max_results=max_num * 3,  # fetch extra in case some fail to download
+            max_results=max_num * 3,
         )
-    except Exception as e:
-        results = []
+    except Exception:
+        return []
 
-    # Download images
+
+def download_images(results, query, max_num, output_dir, workers=DOWNLOAD_WORKERS,
+                    per_host=PER_HOST_LIMIT, pool=None, limits=None):
+    """Download up to max_num images from the search results into output_dir.
+
+    Candidates are taken in result order, skipping those whose host already has
+    per_host requests in flight (or, with a shared DownloadLimits, no free slot).
+    Files are named <term>_<n><ext> with n counting up from the first free
+    number, in the order the downloads finish. Returns the saved file names.
+    """
+    os.makedirs(output_dir, exist_ok=True)
     safe_term = "".join(c if c.isalnum() or c in ' -_' else '' for c in query).strip()[:30]
-    downloaded = 0
-    idx = 1
+    urls = [item.get('image', '') for item in results]
+    pending = [(url, _host(url)) for url in urls if url]
+    own_pool = pool is None
+    pool = pool or ConnectionPool()
+    cancel = threading.Event()
+    limits = limits or DownloadLimits(per_host=per_host)
+    saved = []
+    state = {'idx': 1, 'done': max_num <= 0, 'writing': 0}
+    cond = limits.cond
 
-    for item in results:
-        if downloaded >= max_num:
-            break
+    def reserve(url):
+        """Claim the next free <term>_<n><ext> by creating it empty (call with cond held)"""
+        ext = image_ext(url)
+        while True:
+            filepath = os.path.join(output_dir, f"{safe_term}_{state['idx']}{ext}")
+            state['idx'] += 1
+            try:
+                open(filepath, 'xb').close()  # skip if exists
+                return filepath
+            except FileExistsError:
+                continue
 
-        img_url = item.get('image', '')
-        if not img_url:
-            continue
+    def take():
+        with cond:
+            while not state['done'] and pending:
+                for i, (url, host) in enumerate(pending):
+                    if limits.try_acquire(host):
+                        del pending[i]
+                        return url, host
+                cond.wait()
+            return None
 
-        # Determine extension from URL
-        ext = '.jpg'
-        for e in ['.png', '.gif', '.webp', '.jpeg', '.bmp']:
-            if e in img_url.lower():
-                ext = e
-                break
+    def worker():
+        while True:
+            job = take()
+            if job is None:
+                return
+            url, host = job
+            try:
+                img_data = pool.get(url, cancel)
+            except Exception:
+                img_data = None
+            filepath = None
+            with cond:
+                limits.release(host)
+                # Verify it's actually image data (at least 1KB)
+                if (img_data and len(img_data) > MIN_IMAGE_BYTES and not state['done']
+                        and len(saved) + state['writing'] < max_num):
+                    try:
+                        filepath = reserve(url)
+                        state['writing'] += 1
+                    except OSError:
+                        pass
+            if filepath is None:
+                continue
+            # The write happens outside the lock: in batch mode cond is shared by every term
+            try:
+                with open(filepath, 'wb') as f:
+                    f.write(img_data)
+                ok = True
+            except OSError:
+                ok = False
+                try:
+                    os.remove(filepath)
+                except OSError:
+                    pass
+            with cond:
+                state['writing'] -= 1
+                if ok:
+                    saved.append(os.path.basename(filepath))
+                if len(saved) >= max_num:
+                    state['done'] = True
+                    pool.abort(cancel)  # drop the requests still in flight
+                cond.notify_all()
 
-        filename = f"{safe_term}_{idx}{ext}"
-        filepath = os.path.join(output_dir, filename)
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(workers, len(pending)))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if own_pool:
+        pool.close()
+    return saved
 
-        # Skip if exists
-        while os.path.exists(filepath):
-            idx += 1
-            filename = f"{safe_term}_{idx}{ext}"
-            filepath = os.path.join(output_dir, filename)
 
-        try:
-            req = urllib.request.Request(img_url, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            })
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                img_data = resp.read()
-                # Verify it's actually image data (at least 1KB)
-                if len(img_data) > 1024:
-                    with open(filepath, 'wb') as f:
-                        f.write(img_data)
-                    downloaded += 1
-                    idx += 1
-        except Exception:
+def iter_jobs(stream):
+    """Jobs from a JSON list or from NDJSON lines (yielded as they arrive)"""
+    for line in stream:
+        line = line.strip()
+        if not line:
             continue
+        if line.startswith('['):
+            try:
+                jobs = json.loads(line + stream.read())
+            except ValueError:
+                jobs = [{'error': "invalid job list"}]
+            yield from jobs
+            return
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield {'error': f"invalid job line: {line[:80]}"}
 
-    # Report downloaded files
-    after = set(f for f in os.listdir(output_dir) if os.path.splitext(f)[1].lower() in img_exts)
-    new_files = sorted(after - before)
 
-    print(json.dumps({"downloaded": len(new_files), "files": new_files}))
+def run_batch(stream, out, term_workers=TERM_WORKERS, workers=DOWNLOAD_WORKERS,
+              total=GLOBAL_DOWNLOADS, per_host=PER_HOST_LIMIT):
+    """Serve many search jobs in one process, writing a result line per job"""
+    pool = ConnectionPool()
+    limits = DownloadLimits(total, per_host)
+    write_lock = threading.Lock()
+
+    def run(job):
+        result = {'id': job.get('id'), 'query': job.get('query')}
+        try:
+            if 'error' in job:
+                raise ValueError(job['error'])
+            query = job['query']
+            max_num = int(job['max_num'])
+            results = search_images(query, max_num)
+            files = download_images(results, query, max_num, job['output_dir'], workers, pool=pool, limits=limits)
+            result.update(downloaded=len(files), files=sorted(files))
+        except Exception as e:
+            result.update(downloaded=0, files=[], error=str(e) or type(e).__name__)
+        with write_lock:
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+
+    with ThreadPoolExecutor(max_workers=term_workers) as executor:
+        for job in iter_jobs(stream):
+            executor.submit(run, job if isinstance(job, dict) else {'error': 'job must be an object'})
+    pool.close()
+
+
+def main():
+    if len(sys.argv) > 1:
+        ap = argparse.ArgumentParser(description="Download images for many search terms in one process")
+        ap.add_argument('--batch', action='store_true', required=True)
+        ap.add_argument('--terms', type=int, default=TERM_WORKERS, help="Jobs running at once")
+        ap.add_argument('--workers', type=int, default=DOWNLOAD_WORKERS, help="Downloads in flight per job")
+        ap.add_argument('--global', dest='total', type=int, default=GLOBAL_DOWNLOADS,
+                        help="Downloads in flight overall")
+        ap.add_argument('--per-host', type=int, default=PER_HOST_LIMIT)
+        args = ap.parse_args()
+        run_batch(sys.stdin, sys.stdout, args.terms, args.workers, args.total, args.per_host)
+        return
+
+    data = json.loads(sys.stdin.read())
+    query = data['query']
+    max_num = int(data['max_num'])
+    output_dir = data['output_dir']
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Search for images using DuckDuckGo
+    results = search_images(query, max_num)
+
+    # Download images
+    new_files = download_images(results, query, max_num, output_dir)
+
+    # Report downloaded files
+    print(json.dumps({"downloaded": len(new_files), "files": sorted(new_files)}))
 
 if __name__ == '__main__':
     main()
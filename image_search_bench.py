@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de image_search.py contra servidores HTTP locales (sin DuckDuckGo ni red)
+
+Uso:
+    python image_search_bench.py download [--terms 5] [--max-num 5] [--hosts 6]
+                                          [--latency 0.3] [--slow-latency 3] [--fail-rate 0.15]
+                                          [--workers 8] [--per-host 2]
+
+Cada host simulado es un ThreadingHTTPServer en 127.0.0.1 (un puerto por host)
+con keep-alive (HTTP/1.1). Por término se generan max_num * 3 candidatos, como
+los que devuelve DDGS().images(), repartidos entre los hosts: cada respuesta
+tarda `latency` (±50 %), el primer host es lento (`slow-latency`) y `fail-rate`
+de los candidatos devuelve 404 o una página de menos de 1 KB.
+
+Modos:
+    legacy  el bucle anterior: urlopen secuencial, una conexión nueva por imagen
+    pooled  image_search.download_images (hilos, límite por host, keep-alive)
+
+Por modo se mide el tiempo por término, las imágenes guardadas, las conexiones
+TCP que aceptaron los servidores, las peticiones servidas y las que se cortaron
+a medias al cancelar cuando ya había max_num imágenes.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import urllib.parse
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict, List
+
+import image_search
+
+BENCH_DIR = os.path.join(os.getcwd(), "image_search_bench")
+
+
+def _log(message: str) -> None:
+    print(f"[Bench] {message}", file=sys.stderr, flush=True)
+
+
+def write_report(name: str, report: Dict[str, Any]) -> str:
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+class StandInHost:
+    """Servidor de imágenes simulado: /img?d=<segundos>&status=<código>&size=<bytes>"""
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = 0
+        self.aborted = 0
+        self._lock = threading.Lock()
+        host = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with host._lock:
+                    host.connections += 1
+
+            def do_GET(self):
+                params = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+                with host._lock:
+                    host.requests += 1
+                time.sleep(float(params.get("d", 0)))
+                body = os.urandom(int(params.get("size", 20000)))
+                try:
+                    self.send_response(int(params.get("status", 200)))
+                    self.send_header("Content-Type", "image/jpeg")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    with host._lock:
+                        host.aborted += 1
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, name: str, delay: float, status: int = 200, size: int = 20000) -> str:
+        query = urllib.parse.urlencode({"d": round(delay, 3), "status": status, "size": size})
+        return f"http://127.0.0.1:{self.port}/{name}.jpg?{query}"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_results(hosts: List[StandInHost], term: int, count: int, latency: float, slow_latency: float,
+                 fail_rate: float, rng: random.Random) -> List[Dict[str, str]]:
+    """Candidatos con el formato de DDGS().images()"""
+    results = []
+    for n in range(count):
+        index = rng.randrange(len(hosts))
+        delay = slow_latency if index == 0 else latency * rng.uniform(0.5, 1.5)
+        failure = rng.random() < fail_rate
+        status, size = (404, 300) if failure and rng.random() < 0.5 else (200, 300 if failure else 20000)
+        results.append({"image": hosts[index].url(f"t{term}_{n}", delay, status, size)})
+    return results
+
+
+def _legacy_download(results: List[Dict[str, str]], query: str, max_num: int, output_dir: str) -> List[str]:
+    """El bucle anterior de main(): una imagen a la vez con urlopen(timeout=10)"""
+    safe_term = "".join(c if c.isalnum() or c in ' -_' else '' for c in query).strip()[:30]
+    saved = []
+    idx = 1
+    for item in results:
+        if len(saved) >= max_num:
+            break
+        img_url = item.get('image', '')
+        filepath = os.path.join(output_dir, f"{safe_term}_{idx}{image_search.image_ext(img_url)}")
+        try:
+            req = urllib.request.Request(img_url, headers={'User-Agent': image_search.USER_AGENT})
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                img_data = resp.read()
+                if len(img_data) > image_search.MIN_IMAGE_BYTES:
+                    with open(filepath, 'wb') as f:
+                        f.write(img_data)
+                    saved.append(os.path.basename(filepath))
+                    idx += 1
+        except Exception:
+            continue
+    return saved
+
+
+def bench_download(args: argparse.Namespace) -> Dict[str, Any]:
+    hosts = [StandInHost() for _ in range(args.hosts)]
+    rng = random.Random(args.seed)
+    plans = [make_results(hosts, t, args.max_num * 3, args.latency, args.slow_latency, args.fail_rate, rng)
+             for t in range(args.terms)]
+    results = []
+    try:
+        for mode in args.modes:
+            before = [(h.connections, h.requests, h.aborted) for h in hosts]
+            times = []
+            saved = 0
+            pool = image_search.ConnectionPool() if mode == "pooled" else None
+            for term, candidates in enumerate(plans):
+                out = tempfile.mkdtemp(prefix="imgbench_")
+                start = time.perf_counter()
+                if mode == "legacy":
+                    files = _legacy_download(candidates, f"term {term}", args.max_num, out)
+                else:
+                    files = image_search.download_images(candidates, f"term {term}", args.max_num, out,
+                                                         args.workers, args.per_host, pool)
+                times.append(time.perf_counter() - start)
+                saved += len(files)
+                shutil.rmtree(out, ignore_errors=True)
+            if pool:
+                pool.close()
+            time.sleep(0.2)  # que los servidores terminen de contar las peticiones cortadas
+            after = [(h.connections, h.requests, h.aborted) for h in hosts]
+            delta = [sum(a[i] - b[i] for a, b in zip(after, before)) for i in range(3)]
+            result = {
+                "mode": mode,
+                "total_time": round(sum(times), 3),
+                "term_time_mean": round(sum(times) / len(times), 3),
+                "term_time_max": round(max(times), 3),
+                "saved": saved,
+                "connections": delta[0],
+                "requests": delta[1],
+                "aborted": delta[2],
+            }
+            results.append(result)
+            _log(f"{mode}: {result['total_time']} s para {args.terms} términos, {saved} imágenes, "
+                 f"{delta[0]} conexiones / {delta[1]} peticiones ({delta[2]} cortadas)")
+    finally:
+        for host in hosts:
+            host.stop()
+
+    legacy = next((r for r in results if r["mode"] == "legacy"), None)
+    pooled = next((r for r in results if r["mode"] == "pooled"), None)
+    speedup = round(legacy["total_time"] / pooled["total_time"], 2) if legacy and pooled else None
+    if speedup:
+        _log(f"Aceleración: x{speedup}")
+    return {
+        "benchmark": "download",
+        "params": {k: v for k, v in vars(args).items() if k != "command"},
+        "results": results,
+        "speedup": speedup,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks de image_search.py")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    dl = sub.add_parser("download", help="Descarga secuencial vs concurrente contra hosts simulados")
+    dl.add_argument("--terms", type=int, default=5)
+    dl.add_argument("--max-num", type=int, default=5)
+    dl.add_argument("--hosts", type=int, default=6)
+    dl.add_argument("--latency", type=float, default=0.3, help="Segundos por respuesta (±50 %%)")
+    dl.add_argument("--slow-latency", type=float, default=3, help="Segundos por respuesta del host lento")
+    dl.add_argument("--fail-rate", type=float, default=0.15)
+    dl.add_argument("--workers", type=int, default=image_search.DOWNLOAD_WORKERS)
+    dl.add_argument("--per-host", type=int, default=image_search.PER_HOST_LIMIT)
+    dl.add_argument("--modes", nargs="+", default=["legacy", "pooled"], choices=["legacy", "pooled"])
+    dl.add_argument("--seed", type=int, default=0)
+
+    args = ap.parse_args()
+    if args.command == "download":
+        report = bench_download(args)
+    path = write_report(f"{args.command}_report.json", report)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    _log(f"Reporte guardado en {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -800,7 +800,6 @@ const CHATTERBOX_SCRIPT = path.join(__dirname, 'chatterbox_server.py');
 const CHATTERBOX_VOICES_DIR = path.join(__dirname, 'chatterbox_voices');
 let chatterboxProcess = null;
 let chatterboxStarted = false;
-let _chatterboxGenerating = false; // true while model is actively generating audio
 let _chatterboxStartPromise = null; // serializes concurrent startChatterbox() calls
 const _bgAudioInProgress = new Set(); // 'projectKey:section' keys currently being generated by background queue
 const QWEN_PATH = 'C:\\QWEN\\Qwen3-TTS';
@@ -1744,8 +1743,6 @@ async function startChatterbox() {
 async function _doStartChatterbox() {
   try {
     if (chatterboxStarted) {
-      // If actively generating audio, it's busy — not dead. Skip health check restart.
-      if (_chatterboxGenerating) { return true; }
       // If process is still alive (hasn't exited), trust it rather than restarting on a slow health check
       if (chatterboxProcess && chatterboxProcess.exitCode === null) { return true; }
       try {
@@ -1952,20 +1949,45 @@ function expandNumbersForTTS(text, lang) {
 async function generateChatterboxAudio(text, outputPath, voicePath, exaggeration = 0.5, cfgWeight = 0.5, language = 'es', temperature = 0.8) {
   const body = { text, output: outputPath, exaggeration, cfg_weight: cfgWeight, language, temperature };
   if (voicePath && fs.existsSync(voicePath)) body.voice = voicePath;
-  _chatterboxGenerating = true;
-  try {
-    const resp = await fetch(`${CHATTERBOX_URL}/generate`, {
+  // Envía el trabajo a la cola del servidor (POST /jobs) y consulta su estado
+  // sin mantener la conexión abierta. Con la cola llena responde 503 + Retry-After.
+  let job;
+  for (;;) {
+    const resp = await fetch(`${CHATTERBOX_URL}/jobs`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify(body),
-      signal: AbortSignal.timeout(3600000) // 60 min max (long sections on CPU can take >5 min)
+      signal: AbortSignal.timeout(30000)
     });
-    const data = await resp.json();
-    if (!resp.ok || !data.success) throw new Error(data.error || 'Chatterbox falló');
-    return data;
-  } finally {
-    _chatterboxGenerating = false;
+    job = await resp.json();
+    if (resp.status === 503) {
+      const retryAfter = parseInt(resp.headers.get('retry-after') || '5', 10);
+      console.log(`⏳ Cola de Chatterbox llena (${job.queue_depth}/${job.max_queue}), reintentando en ${retryAfter}s...`);
+      await new Promise(r => setTimeout(r, retryAfter * 1000));
+      continue;
+    }
+    if (!resp.ok) throw new Error(job.error || 'Chatterbox falló');
+    break;
   }
+
+  const deadline = Date.now() + 3600000; // 60 min max (long sections on CPU can take >5 min)
+  let lastChunk = -1;
+  while (Date.now() < deadline) {
+    await new Promise(r => setTimeout(r, 1000));
+    const resp = await fetch(`${CHATTERBOX_URL}/jobs/${job.job_id}`, { signal: AbortSignal.timeout(10000) });
+    const data = await resp.json();
+    if (!resp.ok) throw new Error(data.error || 'Chatterbox falló');
+    if (data.status === 'done') return { ...data.result, queue_wait: data.queue_wait, generation_time: data.progress.elapsed };
+    if (data.status === 'failed' || data.status === 'cancelled') throw new Error(data.error || 'Chatterbox falló');
+    const p = data.progress;
+    if (data.status === 'running' && p.chunk !== lastChunk && p.chunks > 1) {
+      lastChunk = p.chunk;
+      console.log(`🎙️ Chatterbox ${p.chunk}/${p.chunks} chunks (${p.percent}%, ${p.elapsed}s${p.eta != null ? `, ~${p.eta}s restantes` : ''})`);
+    }
+  }
+  // Que el servidor no siga generando un audio que nadie va a recoger
+  await fetch(`${CHATTERBOX_URL}/jobs/${job.job_id}`, { method: 'DELETE', signal: AbortSignal.timeout(10000) }).catch(() => {});
+  throw new Error('Timeout: Chatterbox no terminó después de 60 minutos');
 }
 
 app.use(cors());
@@ -21618,6 +21640,20 @@ except Exception as e:
  * Returns array of segments with start, end, text
  */
 async function transcribeAudioWithSegments(audioPath, language = 'es') {
+  // Chatterbox deja <audio>.timings.json con los mismos segmentos: no hace falta pasar Whisper
+  const sidecarPath = audioPath + '.timings.json';
+  try {
+    if (fs.existsSync(sidecarPath) && fs.statSync(sidecarPath).mtimeMs >= fs.statSync(audioPath).mtimeMs) {
+      const sidecar = JSON.parse(fs.readFileSync(sidecarPath, 'utf8'));
+      if (sidecar.success && Array.isArray(sidecar.segments)) {
+        console.log(`⏱️ Usando tiempos de Chatterbox (${sidecar.segments.length} segmentos), sin Whisper`);
+        return { segments: sidecar.segments, transcript: sidecar.transcript || '' };
+      }
+    }
+  } catch (e) {
+    console.warn(`⚠️ No se pudo leer ${sidecarPath}: ${e.message}`);
+  }
+
   return new Promise((resolve, reject) => {
     const pythonScript = `
 # -*- coding: utf-8 -*-
@@ -25779,7 +25815,7 @@ async function brollDownloadAllVideos(job, resolution) {
 async function brollDownloadAllImages(job) {
   if (!job.imageTasks || job.imageTasks.length === 0) return;
   const { spawn } = await import('child_process');
-  const concurrency = 2;
+  const concurrency = 8;  // image_search.py --batch limita por su cuenta términos y descargas simultáneas
   let index = 0;
 
   async function next() {
@@ -25873,47 +25909,98 @@ function brollDownloadSingle(videoState, resolution, spawn) {
   });
 }
 
-function brollDownloadImages(task, spawn) {
-  return new Promise(async (resolve, reject) => {
-    task.status = 'downloading';
+// Un solo proceso `image_search.py --batch` atiende todos los términos (un solo
+// arranque de Python e import de ddgs); cada línea de resultado trae el id de su
+// trabajo. Se cierra tras IMAGE_SEARCH_IDLE_MS sin trabajos pendientes.
+const IMAGE_SEARCH_IDLE_MS = 60000;
+let imageSearchBatch = null;
+
+async function startImageSearchBatch(spawn) {
+  const { cmd, args } = await detectPythonCommand();
+  const proc = spawn(cmd, [...args, path.join(process.cwd(), 'image_search.py'), '--batch']);
+  const batch = { proc, pending: new Map(), nextId: 1, closed: false, idleTimer: null };
+
+  let buffer = '';
+  let stderr = '';
+  proc.stdout.on('data', (d) => {
+    buffer += d.toString();
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      let result;
+      try {
+        result = JSON.parse(line);
+      } catch (e) {
+        console.log(`[B-Roll IMG] Parse error: ${line.slice(-100)}`);
+        continue;
+      }
+      const entry = batch.pending.get(result.id);
+      if (!entry) continue;
+      batch.pending.delete(result.id);
+      entry.resolve(result);
+      if (batch.pending.size === 0) {
+        batch.idleTimer = setTimeout(() => {
+          batch.closed = true;
+          proc.stdin.end();
+        }, IMAGE_SEARCH_IDLE_MS);
+      }
+    }
+  });
+  proc.stderr.on('data', (d) => { stderr = (stderr + d.toString()).slice(-2000); });
+  proc.stdin.on('error', () => {});  // EPIPE si el proceso murió: lo resuelve 'close'
+
+  const fail = (err) => {
+    batch.closed = true;
+    clearTimeout(batch.idleTimer);
+    for (const entry of batch.pending.values()) entry.reject(err);
+    batch.pending.clear();
+  };
+  proc.on('close', (code) => fail(new Error(stderr.slice(-200) || `python exit ${code}`)));
+  proc.on('error', fail);
+  return batch;
+}
 
-    const { cmd, args } = await detectPythonCommand();
-    const proc = spawn(cmd, [...args, path.join(process.cwd(), 'image_search.py')]);
+async function getImageSearchBatch(spawn) {
+  if (!imageSearchBatch) {
+    // Si el arranque falla (p. ej. detectPythonCommand) se reintenta en la próxima llamada
+    const starting = startImageSearchBatch(spawn).catch((err) => {
+      if (imageSearchBatch === starting) imageSearchBatch = null;
+      throw err;
+    });
+    imageSearchBatch = starting;
+  }
+  const current = imageSearchBatch;
+  const batch = await current;
+  if (!batch.closed) return batch;
+  if (imageSearchBatch === current) imageSearchBatch = null;
+  return getImageSearchBatch(spawn);
+}
 
-    const input = JSON.stringify({
+async function brollDownloadImages(task, spawn) {
+  task.status = 'downloading';
+
+  const batch = await getImageSearchBatch(spawn);
+  console.log(`[B-Roll IMG] Buscando: "${task.term}" → ${task.outputDir}`);
+  const result = await new Promise((resolve, reject) => {
+    const id = batch.nextId++;
+    clearTimeout(batch.idleTimer);
+    batch.pending.set(id, { resolve, reject });
+    batch.proc.stdin.write(JSON.stringify({
+      id,
       query: task.term,
       max_num: task.maxImages,
       output_dir: task.outputDir
-    });
-    console.log(`[B-Roll IMG] Buscando: "${task.term}" → ${task.outputDir}`);
-    proc.stdin.write(input);
-    proc.stdin.end();
-
-    let stdout = '';
-    let stderr = '';
-
-    proc.stdout.on('data', (d) => { stdout += d.toString(); });
-    proc.stderr.on('data', (d) => { stderr += d.toString(); });
-
-    proc.on('close', (code) => {
-      if (code === 0) {
-        try {
-          const result = JSON.parse(stdout.trim().split('\n').pop());
-          task.downloaded = result.downloaded || 0;
-          console.log(`[B-Roll IMG] ✓ "${task.term}" → ${task.downloaded} imágenes`);
-        } catch (e) {
-          console.log(`[B-Roll IMG] Parse error: ${stdout.slice(-100)}`);
-        }
-        task.status = 'done';
-        resolve();
-      } else {
-        console.log(`[B-Roll IMG] ✗ "${task.term}" stderr: ${stderr.slice(-200)}`);
-        reject(new Error(stderr.slice(-200) || `python exit ${code}`));
-      }
-    });
-
-    proc.on('error', (err) => reject(err));
+    }) + '\n');
   });
+
+  if (result.error) {
+    console.log(`[B-Roll IMG] ✗ "${task.term}": ${result.error.slice(-200)}`);
+    throw new Error(result.error.slice(-200));
+  }
+  task.downloaded = result.downloaded || 0;
+  console.log(`[B-Roll IMG] ✓ "${task.term}" → ${task.downloaded} imágenes`);
+  task.status = 'done';
 }
 
 // Búsqueda YouTube con validación LLM (1 sola validación por sección)
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de whisper_local.py sobre audio sintético generado localmente
+
+Uso:
+    python whisper_bench.py chunked [--minutes 10 30 60] [--model small] [--workers N]
+    python whisper_bench.py regroup [--words 200000] [--repeat 3] [--feed 40]
+    python whisper_bench.py sweep [--models tiny small medium] [--compute-types int8 int8_float32 float32]
+                                  [--beam-sizes 1 5] [--cpu-threads 4 8] [--write-profile]
+    python whisper_bench.py import [--repeat 5]
+
+El corpus se arma con frases fijas sintetizadas con edge-tts (una sola vez, se
+guardan en whisper_bench/corpus). Sin edge-tts se usan ráfagas tonales, que
+sirven para medir tiempos pero no la calidad del texto.
+"""
+
+import os
+import sys
+import json
+import time
+import wave
+import random
+import asyncio
+import argparse
+import difflib
+import itertools
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from whisper_local import WhisperLocal, SAMPLE_RATE, SETTINGS_PROFILE_PATH, host_fingerprint
+from whisper_regroup import PseudoWord, WordArray, SentenceRegrouper, regroup_words
+
+BENCH_DIR = os.path.join(os.getcwd(), "whisper_bench")
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+CORPUS_VOICE = "es-MX-DaliaNeural"
+
+# Frases fijas del corpus; el texto sirve de referencia para medir concordancia
+CORPUS_PHRASES = [
+    "Hola, esto es una prueba de transcripción local.",
+    "El rápido zorro marrón salta sobre el perro perezoso.",
+    "Hoy vamos a hablar de la historia de los barcos de vela.",
+    "La mañana estaba fría y el mar se veía muy tranquilo.",
+    "¿Sabías que los mapas antiguos tenían errores enormes?",
+    "Los marineros usaban las estrellas para orientarse de noche.",
+    "Después de tres semanas de viaje llegaron a una costa desconocida.",
+    "Nadie esperaba que la tormenta durara tanto tiempo.",
+    "El capitán ordenó recoger las velas y esperar en silencio.",
+    "Al final del día, todos celebraron con una cena sencilla.",
+    "Este es el último capítulo de nuestra historia de hoy.",
+    "Gracias por escuchar y no olvides suscribirte al canal.",
+]
+
+
+def _log(message: str) -> None:
+    print(f"[Bench] {message}", file=sys.stderr, flush=True)
+
+
+def ensure_corpus_clips() -> List[Tuple[str, str]]:
+    """Sintetiza (si faltan) las frases del corpus. Devuelve [(ruta, texto)] o [] sin edge-tts"""
+    try:
+        import edge_tts
+    except ImportError:
+        _log("edge-tts no está instalado; se usarán ráfagas tonales sin texto de referencia")
+        return []
+
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    clips = []
+    for i, text in enumerate(CORPUS_PHRASES):
+        path = os.path.join(CORPUS_DIR, f"phrase_{i:02d}.mp3")
+        if not os.path.exists(path):
+            _log(f"Sintetizando frase {i + 1}/{len(CORPUS_PHRASES)}...")
+            asyncio.run(edge_tts.Communicate(text, CORPUS_VOICE).save(path))
+        clips.append((path, text))
+    return clips
+
+
+def _tone_burst(rng: random.Random) -> np.ndarray:
+    seconds = rng.uniform(2.0, 6.0)
+    t = np.arange(int(seconds * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+    f0 = rng.uniform(110, 220)
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t))  # ~4 sílabas por segundo
+    signal = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+    return (0.2 * envelope * signal).astype(np.float32)
+
+
+def write_wav(path: str, audio: np.ndarray) -> None:
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(pcm.tobytes())
+
+
+def synth_audio(minutes: float, seed: int = 0) -> Tuple[str, str]:
+    """Genera (o reutiliza) un WAV de `minutes` minutos: frases separadas por silencios.
+    Devuelve (ruta, texto de referencia)."""
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f"synthetic_{minutes:g}min_{seed}.wav")
+    ref_path = path + ".txt"
+    if os.path.exists(path) and os.path.exists(ref_path):
+        with open(ref_path, "r", encoding="utf-8") as f:
+            return path, f.read()
+
+    from faster_whisper.audio import decode_audio
+
+    rng = random.Random(seed)
+    clips = [(decode_audio(p, sampling_rate=SAMPLE_RATE), text) for p, text in ensure_corpus_clips()]
+    target = int(minutes * 60 * SAMPLE_RATE)
+    parts: List[np.ndarray] = []
+    texts: List[str] = []
+    length = 0
+    while length < target:
+        if clips:
+            audio, text = rng.choice(clips)
+            texts.append(text)
+        else:
+            audio = _tone_burst(rng)
+        silence = np.zeros(int(rng.uniform(0.3, 1.8) * SAMPLE_RATE), dtype=np.float32)
+        parts.extend([audio, silence])
+        length += len(audio) + len(silence)
+
+    write_wav(path, np.concatenate(parts)[:target])
+    reference = " ".join(texts)
+    with open(ref_path, "w", encoding="utf-8") as f:
+        f.write(reference)
+    return path, reference
+
+
+def word_agreement(reference: str, hypothesis: str) -> Optional[float]:
+    """Concordancia por palabras (0..1) entre dos textos, ignorando mayúsculas y puntuación"""
+    def words(text: str) -> List[str]:
+        return ["".join(c for c in w.lower() if c.isalnum()) for w in text.split()]
+    ref, hyp = words(reference), words(hypothesis)
+    if not ref:
+        return None
+    return round(difflib.SequenceMatcher(None, ref, hyp, autojunk=False).ratio(), 4)
+
+
+def write_report(name: str, report: Dict[str, Any]) -> str:
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def bench_chunked(args: argparse.Namespace) -> Dict[str, Any]:
+    """Compara transcribe_audio (secuencial) contra transcribe_long (tramos en paralelo)"""
+    whisper = WhisperLocal()
+    cpu_count = os.cpu_count() or 1
+    runs = []
+    for minutes in args.minutes:
+        path, reference = synth_audio(minutes)
+        _log(f"{minutes:g} min: secuencial...")
+        whisper.load_model(args.model, num_workers=1, cpu_threads=cpu_count)
+        sequential = whisper.transcribe_audio(path, language=args.language, use_cache=False)
+        _log(f"{minutes:g} min: por tramos...")
+        chunked = whisper.transcribe_long(path, language=args.language, model_size=args.model,
+                                          workers=args.workers, chunk_seconds=args.chunk_seconds)
+        if not sequential.get("success") or not chunked.get("success"):
+            runs.append({"minutes": minutes, "error": sequential.get("error") or chunked.get("error")})
+            continue
+        seq_time = sequential["transcription_time"]
+        par_time = chunked["transcription_time"]
+        runs.append({
+            "minutes": minutes,
+            "sequential_time": round(seq_time, 3),
+            "chunked_time": round(par_time, 3),
+            "speedup": round(seq_time / par_time, 2) if par_time > 0 else None,
+            "chunks": chunked["stats"].get("chunks", 1),
+            "workers": chunked["stats"].get("workers", 1),
+            "sequential_segments": len(sequential["segments"]),
+            "chunked_segments": len(chunked["segments"]),
+            "agreement_between_paths": word_agreement(sequential["transcript"], chunked["transcript"]),
+            "sequential_vs_reference": word_agreement(reference, sequential["transcript"]),
+            "chunked_vs_reference": word_agreement(reference, chunked["transcript"]),
+        })
+        _log(f"{minutes:g} min: speedup x{runs[-1]['speedup']}")
+    return {"benchmark": "chunked", "model": args.model, "cpu_count": cpu_count, "runs": runs}
+
+
+def legacy_regroup(all_words: List[Any]) -> Tuple[str, List[Dict[str, Any]]]:
+    """Bucle por palabra que usaba transcribe_audio antes de whisper_regroup (referencia)"""
+    SILENCE_THRESHOLD = 1.2
+    MAX_SEGMENT_DURATION = 15
+    transcript_text = ""
+    detailed_segments = []
+    current_words = []
+    current_start = all_words[0].start
+
+    for wi, word in enumerate(all_words):
+        if wi > 0:
+            gap = word.start - all_words[wi - 1].end
+            if gap > SILENCE_THRESHOLD and current_words:
+                seg_text = "".join(w.word for w in current_words).strip()
+                if seg_text:
+                    detailed_segments.append({"start": current_start, "end": current_words[-1].end, "text": seg_text})
+                    transcript_text += seg_text + " "
+                current_words = []
+                current_start = word.start
+
+        current_words.append(word)
+        word_text = word.word.strip()
+        ends_sentence = word_text and word_text[-1] in '.?!。'
+        segment_too_long = (word.end - current_start) > MAX_SEGMENT_DURATION
+
+        if ends_sentence or segment_too_long:
+            seg_text = "".join(w.word for w in current_words).strip()
+            if seg_text:
+                detailed_segments.append({"start": current_start, "end": word.end, "text": seg_text})
+                transcript_text += seg_text + " "
+            current_words = []
+            if wi + 1 < len(all_words):
+                current_start = all_words[wi + 1].start
+
+    if current_words:
+        seg_text = "".join(w.word for w in current_words).strip()
+        if seg_text:
+            detailed_segments.append({"start": current_start, "end": current_words[-1].end, "text": seg_text})
+            transcript_text += seg_text + " "
+
+    return transcript_text.strip(), detailed_segments
+
+
+def synth_words(count: int, seed: int = 0) -> List[PseudoWord]:
+    """Palabras sintéticas con pausas, silencios largos, puntuación y tramos sin puntuación"""
+    rng = random.Random(seed)
+    vocabulary = ["hola", "mundo", "barco", "mar", "historia", "capitán", "noche", "costa", "", " "]
+    words = []
+    t = 0.0
+    for i in range(count):
+        t += rng.choice([0.0, 0.05, 0.1, 0.2, 0.4]) if rng.random() > 0.03 else rng.uniform(1.0, 3.0)
+        duration = round(rng.uniform(0.1, 0.6), 3)
+        text = " " + rng.choice(vocabulary)
+        if rng.random() < 0.07:
+            text += rng.choice([".", "?", "!", "。", ",", ". "])
+        words.append(PseudoWord(round(t, 3), round(t + duration, 3), text))
+        t += duration
+    return words
+
+
+def bench_regroup(args: argparse.Namespace) -> Dict[str, Any]:
+    """Microbenchmark: bucle por palabra vs whisper_regroup sobre palabras sintéticas"""
+    words = synth_words(args.words)
+
+    def best_of(fn) -> Tuple[float, Any]:
+        best, result = float("inf"), None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - start)
+        return best, result
+
+    legacy_time, (legacy_text, legacy_segments) = best_of(lambda: legacy_regroup(words))
+    array = WordArray.from_words(words)
+    vector_time, segments = best_of(lambda: regroup_words(array))
+    build_time, _ = best_of(lambda: regroup_words(words))
+
+    def streamed() -> List[Dict[str, Any]]:
+        # Como transcribe_audio/transcribe_stream: una tanda por segmento de faster-whisper
+        regrouper = SentenceRegrouper()
+        out = []
+        for i in range(0, len(words), args.feed):
+            out.extend(regrouper.feed(words[i:i + args.feed]))
+        out.extend(regrouper.flush())
+        return out
+    stream_time, stream_segments = best_of(streamed)
+    _log(f"{args.words} palabras: bucle {legacy_time:.4f} s, en bloque {build_time:.4f} s "
+         f"(sin armar el arreglo {vector_time:.4f} s), incremental de a {args.feed} {stream_time:.4f} s")
+
+    reference = json.dumps({"t": legacy_text, "s": legacy_segments}, ensure_ascii=False)
+    return {
+        "benchmark": "regroup",
+        "words": args.words,
+        "segments": len(legacy_segments),
+        "legacy_time": round(legacy_time, 4),
+        "vectorized_time": round(vector_time, 4),
+        "vectorized_with_build_time": round(build_time, 4),
+        "feed_size": args.feed,
+        "streaming_time": round(stream_time, 4),
+        "speedup": round(legacy_time / vector_time, 2) if vector_time > 0 else None,
+        "streaming_speedup": round(legacy_time / stream_time, 2) if stream_time > 0 else None,
+        "identical": reference == json.dumps({"t": " ".join(s["text"] for s in segments), "s": segments}, ensure_ascii=False),
+        "streaming_identical": reference == json.dumps({"t": " ".join(s["text"] for s in stream_segments), "s": stream_segments}, ensure_ascii=False),
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pico de memoria residente de este proceso en MB (None si no se puede medir)"""
+    try:
+        import psutil
+        peak = getattr(psutil.Process().memory_info(), "peak_wset", None)  # Solo Windows
+        if peak:
+            return round(peak / 1024 / 1024, 1)
+    except ImportError:
+        pass
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB en Linux, bytes en macOS
+        return round(rss / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+    except ImportError:
+        return None
+
+
+def run_one(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Mide una configuración; se ejecuta en un proceso aparte para aislar el pico de RSS"""
+    whisper = WhisperLocal()
+    start = time.time()
+    whisper.load_model(config["model_size"], force_device=config["device"],
+                       cpu_threads=config["cpu_threads"], compute_type=config["compute_type"])
+    load_time = time.time() - start
+    whisper.decode_options["beam_size"] = config["beam_size"]
+    result = whisper.transcribe_audio(config["audio_path"], language=config["language"], use_cache=False)
+    if not result.get("success"):
+        return {"error": result.get("error")}
+    return {
+        "load_time": round(load_time, 3),
+        "transcribe_time": round(result["transcription_time"], 3),
+        "rtf": round(result["transcription_time"] / result["duration"], 4) if result["duration"] else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "transcript": result["transcript"],
+    }
+
+
+def _measure(config: Dict[str, Any]) -> Dict[str, Any]:
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "run-one", json.dumps(config)],
+                          capture_output=True, text=True, encoding="utf-8")
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        return {"error": (proc.stderr or proc.stdout).strip()[-500:]}
+    return json.loads(lines[-1])
+
+
+def build_profile(runs: List[Dict[str, Any]], device: str, tolerance: float) -> Dict[str, Any]:
+    """Elige por modelo (y en general) la configuración más rápida cuya concordancia
+    queda a menos de `tolerance` de la mejor medida"""
+    def pick(candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        candidates = [r for r in candidates if r.get("rtf") is not None]
+        if not candidates:
+            return None
+        best = max(r.get("agreement") or 0.0 for r in candidates)
+        eligible = [r for r in candidates if (r.get("agreement") or 0.0) >= best - tolerance]
+        chosen = min(eligible, key=lambda r: r["rtf"])
+        return {k: chosen[k] for k in ("model_size", "compute_type", "beam_size", "cpu_threads", "rtf", "agreement")}
+
+    by_model = {}
+    for model_size in sorted({r["model_size"] for r in runs}):
+        choice = pick([r for r in runs if r["model_size"] == model_size])
+        if choice:
+            by_model[model_size] = choice
+    return {"default": pick(runs) or {}, "by_model": by_model}
+
+
+def bench_sweep(args: argparse.Namespace) -> Dict[str, Any]:
+    """Barrido model_size × compute_type × beam_size × cpu_threads sobre el corpus"""
+    path, reference = synth_audio(args.minutes, seed=1)
+    cpu_count = os.cpu_count() or 1
+    threads = args.cpu_threads or sorted({max(1, cpu_count // 2), cpu_count})
+    configs = [
+        {"model_size": m, "compute_type": c, "beam_size": b, "cpu_threads": t,
+         "device": args.device, "language": args.language, "audio_path": path}
+        for m, c, b, t in itertools.product(args.models, args.compute_types, args.beam_sizes, threads)
+    ]
+
+    if not reference:
+        # Sin texto de referencia (corpus tonal): usar la configuración más pesada
+        _log("Sin texto de referencia; se usa la transcripción de la configuración más pesada")
+        heaviest = dict(configs[0], model_size=args.models[-1], compute_type="float32",
+                        beam_size=max(args.beam_sizes), cpu_threads=max(threads))
+        reference = _measure(heaviest).get("transcript", "")
+
+    runs = []
+    for i, config in enumerate(configs):
+        label = f"{config['model_size']}/{config['compute_type']}/beam{config['beam_size']}/{config['cpu_threads']}t"
+        _log(f"[{i + 1}/{len(configs)}] {label}")
+        measured = _measure(config)
+        run = {k: v for k, v in config.items() if k not in ("audio_path", "language")}
+        run.update({k: v for k, v in measured.items() if k != "transcript"})
+        if "transcript" in measured:
+            run["agreement"] = word_agreement(reference, measured["transcript"])
+        runs.append(run)
+
+    report = {
+        "benchmark": "sweep",
+        "host": host_fingerprint(),
+        "device": args.device,
+        "audio_minutes": args.minutes,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": runs,
+        "profile": build_profile([r for r in runs if "error" not in r], args.device, args.tolerance),
+    }
+
+    if args.write_profile:
+        profile = {"host": report["host"], "devices": {}}
+        try:
+            with open(SETTINGS_PROFILE_PATH, "r", encoding="utf-8") as f:
+                existing = json.load(f)
+            if existing.get("host") == profile["host"]:
+                profile = existing
+        except (OSError, ValueError):
+            pass
+        profile["devices"][args.device] = dict(report["profile"], generated_at=report["generated_at"])
+        with open(SETTINGS_PROFILE_PATH, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+        _log(f"Perfil guardado en {SETTINGS_PROFILE_PATH}")
+    return report
+
+
+def bench_import(args: argparse.Namespace) -> Dict[str, Any]:
+    """Tiempo de arranque de `import whisper_local` en un proceso nuevo.
+
+    cold: sin estado cacheado (recorre site-packages/nvidia y consulta CTranslate2)
+    warm: con el estado ya escrito por la corrida anterior
+    with_torch: warm + `import torch`, equivalente al import incondicional anterior"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    state_path = os.path.join(BENCH_DIR, "import_state.json")
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    env = dict(os.environ, WHISPER_STATE_PATH=state_path,
+               PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])))
+    snippets = {
+        "python": "pass",
+        "import": "import whisper_local",
+        "import_and_detect": "import whisper_local; whisper_local.whisper_local.detect_device()",
+        "with_torch": "import whisper_local; import torch",
+    }
+
+    def timed(code: str) -> float:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, code in snippets.items():
+        cold, warm = [], []
+        for _ in range(args.repeat):
+            if os.path.exists(state_path):
+                os.remove(state_path)
+            cold.append(timed(code))
+            warm.append(timed(code))
+        results[name] = {"cold": round(min(cold), 4), "warm": round(min(warm), 4)}
+        _log(f"{name}: cold {results[name]['cold']:.3f}s, warm {results[name]['warm']:.3f}s")
+
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return {
+        "benchmark": "import",
+        "repeat": args.repeat,
+        "results": results,
+        "torch_cost": round(results["with_torch"]["warm"] - results["import"]["warm"], 4),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks de whisper_local.py")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    chunked = sub.add_parser("chunked", help="Secuencial vs tramos en paralelo sobre audio largo")
+    chunked.add_argument("--minutes", type=float, nargs="+", default=[10, 30, 60])
+    chunked.add_argument("--model", default="small")
+    chunked.add_argument("--language", default="es")
+    chunked.add_argument("--workers", type=int, default=0)
+    chunked.add_argument("--chunk-seconds", type=float, default=120)
+
+    regroup = sub.add_parser("regroup", help="Microbenchmark de la reagrupación de palabras")
+    regroup.add_argument("--words", type=int, default=200000)
+    regroup.add_argument("--repeat", type=int, default=3)
+    regroup.add_argument("--feed", type=int, default=40, help="Palabras por llamada a SentenceRegrouper.feed")
+
+    sweep = sub.add_parser("sweep", help="Barrido de ajustes de decodificación; puede escribir el perfil del host")
+    sweep.add_argument("--models", nargs="+", default=["tiny", "small", "medium"])
+    sweep.add_argument("--compute-types", nargs="+", default=["int8", "int8_float32", "float32"])
+    sweep.add_argument("--beam-sizes", type=int, nargs="+", default=[1, 5])
+    sweep.add_argument("--cpu-threads", type=int, nargs="+", default=None)
+    sweep.add_argument("--device", default="cpu")
+    sweep.add_argument("--language", default="es")
+    sweep.add_argument("--minutes", type=float, default=1)
+    sweep.add_argument("--tolerance", type=float, default=0.02, help="Pérdida de concordancia aceptable al elegir")
+    sweep.add_argument("--write-profile", action="store_true", help="Guardar el perfil para get_optimal_settings")
+
+    imports = sub.add_parser("import", help="Tiempo de arranque de whisper_local con y sin estado cacheado")
+    imports.add_argument("--repeat", type=int, default=5)
+
+    if len(sys.argv) > 2 and sys.argv[1] == "run-one":
+        print(json.dumps(run_one(json.loads(sys.argv[2])), ensure_ascii=False))
+        return
+
+    args = ap.parse_args()
+    if args.command == "chunked":
+        report = bench_chunked(args)
+    elif args.command == "regroup":
+        report = bench_regroup(args)
+    elif args.command == "sweep":
+        report = bench_sweep(args)
+    elif args.command == "import":
+        report = bench_import(args)
+    path = write_report(f"{args.command}_report.json", report)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    _log(f"Reporte guardado en {path}")
+
+
+if __name__ == "__main__":
+    main()
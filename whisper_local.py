@@ -6,50 +6,523 @@ Implementación para reemplazar la API de OpenAI con procesamiento local
 """
 
 import os
+import sys
 import json
+import gzip
+import importlib.util
+import hashlib
 import tempfile
 import shutil
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterator
+from collections import OrderedDict
+import threading
 import time
 
-# Intentar añadir las rutas de las librerías de NVIDIA al PATH si existen
-try:
+# Estado cacheado entre procesos: rutas de librerías NVIDIA y capacidades de dispositivo
+WHISPER_STATE_PATH = os.environ.get("WHISPER_STATE_PATH", os.path.join(os.getcwd(), "whisper_state.json"))
+
+
+def _read_state() -> Dict[str, Any]:
+    try:
+        with open(WHISPER_STATE_PATH, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # El estado solo vale para el mismo intérprete
+    return state if state.get("python") == sys.executable else {}
+
+
+def _write_state(state: Dict[str, Any]) -> None:
+    state["python"] = sys.executable
+    try:
+        tmp_path = f"{WHISPER_STATE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, WHISPER_STATE_PATH)
+    except OSError:
+        pass
+
+
+def _discover_nvidia_bin_paths() -> List[str]:
+    """Busca carpetas bin dentro de site-packages/nvidia (pip install nvidia-*)"""
     import site
-    site_packages = site.getsitepackages()
-    for path in site_packages:
+    paths = []
+    for path in site.getsitepackages():
         nvidia_path = os.path.join(path, 'nvidia')
         if os.path.exists(nvidia_path):
             for root, dirs, files in os.walk(nvidia_path):
                 if 'bin' in dirs:
-                    bin_path = os.path.join(root, 'bin')
-                    os.environ['PATH'] = bin_path + os.pathsep + os.environ['PATH']
-                    try:
-                        os.add_dll_directory(bin_path)
-                    except AttributeError:
-                        pass # os.add_dll_directory solo disponible en Python 3.8+ Windows
-except Exception:
-    pass
-
-FASTER_WHISPER_ERROR = None
-try:
-    from faster_whisper import WhisperModel
-    import torch
-    FASTER_WHISPER_AVAILABLE = True
-except Exception as e:
-    FASTER_WHISPER_AVAILABLE = False
-    FASTER_WHISPER_ERROR = str(e)
-    # No imprimimos nada aquí para no ensuciar la salida JSON si se importa como módulo
+                    paths.append(os.path.join(root, 'bin'))
+    return paths
+
+
+_nvidia_scan: Optional[List[str]] = None  # Rutas halladas en este proceso si hubo que recorrer site-packages
+
+
+def setup_nvidia_paths() -> List[str]:
+    """Añade las rutas de las librerías de NVIDIA al PATH si existen.
+    Usa las rutas guardadas en el estado; si no hay (o la lista está vacía, por si
+    las ruedas CUDA se instalaron después) recorre site-packages. Importar el
+    módulo no escribe el estado: la CLI lo guarda con save_nvidia_paths()."""
+    global _nvidia_scan
+    paths = _read_state().get("nvidia_bin_paths")
+    if not paths or not all(os.path.isdir(p) for p in paths):
+        paths = _nvidia_scan = _discover_nvidia_bin_paths()
+    for bin_path in paths:
+        os.environ['PATH'] = bin_path + os.pathsep + os.environ['PATH']
+        try:
+            os.add_dll_directory(bin_path)
+        except AttributeError:
+            pass # os.add_dll_directory solo disponible en Python 3.8+ Windows
+    return paths
+
+
+def save_nvidia_paths() -> None:
+    """Guarda en el estado el recorrido que hizo setup_nvidia_paths, si lo hubo"""
+    if _nvidia_scan is None:
+        return
+    state = _read_state()
+    if state.get("nvidia_bin_paths") != _nvidia_scan:
+        state["nvidia_bin_paths"] = _nvidia_scan
+        _write_state(state)
+
+
+def _ctranslate2_version() -> Optional[str]:
+    try:
+        from importlib.metadata import version
+        return version("ctranslate2")
+    except Exception:
+        return None
+
+
+def device_capabilities(refresh: bool = False) -> Dict[str, Any]:
+    """Dispositivos disponibles según CTranslate2 (cacheado en el estado).
+    torch es opcional: solo se usa, una vez, para obtener nombre y memoria de la GPU."""
+    state = _read_state()
+    caps = state.get("devices")
+    ct2_version = _ctranslate2_version()
+    if caps and not refresh and caps.get("ctranslate2") == ct2_version:
+        return caps
+
+    caps = {"ctranslate2": ct2_version, "cuda_device_count": 0, "compute_types": {}, "gpu_name": None, "gpu_memory_gb": None}
+    try:
+        import ctranslate2
+        caps["cuda_device_count"] = ctranslate2.get_cuda_device_count()
+        caps["compute_types"]["cpu"] = sorted(ctranslate2.get_supported_compute_types("cpu"))
+        if caps["cuda_device_count"] > 0:
+            caps["compute_types"]["cuda"] = sorted(ctranslate2.get_supported_compute_types("cuda"))
+    except Exception:
+        pass
+
+    if caps["cuda_device_count"] > 0:
+        try:
+            import torch
+            caps["gpu_name"] = torch.cuda.get_device_name(0)
+            caps["gpu_memory_gb"] = round(torch.cuda.get_device_properties(0).total_memory / 1024**3, 1)
+        except Exception:
+            pass
+
+    state["devices"] = caps
+    _write_state(state)
+    return caps
+
+
+setup_nvidia_paths()
+
+from whisper_regroup import SILENCE_THRESHOLD, MAX_SEGMENT_DURATION, PseudoWord, SentenceRegrouper
+
+# faster-whisper se importa al primer uso: consultar la caché o el estado no lo necesita
+FASTER_WHISPER_AVAILABLE = importlib.util.find_spec("faster_whisper") is not None
+FASTER_WHISPER_ERROR = None if FASTER_WHISPER_AVAILABLE else "No module named 'faster_whisper'"
+WhisperModel = None
+
+
+def _load_faster_whisper() -> bool:
+    """Importa faster-whisper bajo demanda. Devuelve si está disponible"""
+    global WhisperModel, FASTER_WHISPER_AVAILABLE, FASTER_WHISPER_ERROR
+    if WhisperModel is not None or not FASTER_WHISPER_AVAILABLE:
+        return FASTER_WHISPER_AVAILABLE
+    try:
+        from faster_whisper import WhisperModel as _WhisperModel
+        WhisperModel = _WhisperModel
+    except Exception as e:
+        FASTER_WHISPER_AVAILABLE = False
+        FASTER_WHISPER_ERROR = str(e)
+        # No imprimimos nada aquí para no ensuciar la salida JSON si se importa como módulo
+    return FASTER_WHISPER_AVAILABLE
+
+# Parámetros aproximados (millones) por tamaño de modelo, para estimar memoria residente
+MODEL_PARAMS_M = {
+    "tiny": 39, "tiny.en": 39,
+    "base": 74, "base.en": 74,
+    "small": 244, "small.en": 244,
+    "medium": 769, "medium.en": 769,
+    "large": 1550, "large-v1": 1550, "large-v2": 1550, "large-v3": 1550,
+    "distil-large-v3": 756, "turbo": 809, "large-v3-turbo": 809,
+}
+
+# Bytes por parámetro según compute_type de CTranslate2
+COMPUTE_TYPE_BYTES = {
+    "float32": 4.0, "float16": 2.0, "bfloat16": 2.0,
+    "int8_float32": 1.0, "int8_float16": 1.0, "int8_bfloat16": 1.0, "int8": 1.0,
+}
+
+# Presupuesto de memoria por defecto del pool de modelos (MB), configurable por entorno
+DEFAULT_POOL_MEMORY_MB = float(os.environ.get("WHISPER_POOL_MEMORY_MB", "6144"))
+
+
+def estimate_model_memory_mb(model_size: str, compute_type: str) -> float:
+    """Estima la memoria residente (MB) de un modelo cargado con CTranslate2"""
+    params_m = MODEL_PARAMS_M.get(model_size, MODEL_PARAMS_M["large-v3"])
+    bytes_per_param = COMPUTE_TYPE_BYTES.get(compute_type, 4.0)
+    # ~15% extra para buffers, vocabulario y tensores auxiliares
+    return round(params_m * bytes_per_param * 1.15, 1)
+
+
+# (model_size, device, compute_type, num_workers, cpu_threads)
+PoolKey = Tuple[str, str, str, int, int]
+
+
+class ModelPool:
+    """Pool LRU de modelos residentes con presupuesto de memoria.
+
+    Las entradas se indexan por (model_size, device, compute_type) más las
+    opciones de concurrencia de CTranslate2 (num_workers, cpu_threads). Pedir una
+    configuración ya cargada no cuesta nada; al cargar una nueva se expulsan
+    las menos usadas hasta entrar en el presupuesto (siempre queda al menos una)."""
+
+    def __init__(self, memory_budget_mb: Optional[float] = None):
+        self.memory_budget_mb = memory_budget_mb if memory_budget_mb is not None else DEFAULT_POOL_MEMORY_MB
+        self._entries: "OrderedDict[PoolKey, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: PoolKey, loader: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Devuelve (modelo, hit). Si no está residente lo carga con loader()"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["model"], True
+
+            self.misses += 1
+            start_time = time.time()
+            model = loader()
+            self._entries[key] = {
+                "model": model,
+                "memory_mb": estimate_model_memory_mb(key[0], key[2]),
+                "load_time": time.time() - start_time,
+            }
+            self._evict(keep=key)
+            return model, False
+
+    def _evict(self, keep: PoolKey) -> None:
+        while self.resident_memory_mb() > self.memory_budget_mb and len(self._entries) > 1:
+            oldest = next(k for k in self._entries if k != keep)
+            del self._entries[oldest]
+            self.evictions += 1
+            print(f"[Whisper] Pool: expulsado '{oldest[0]}' ({oldest[1]}/{oldest[2]})", file=__import__('sys').stderr)
+
+    def resident_memory_mb(self) -> float:
+        return round(sum(e["memory_mb"] for e in self._entries.values()), 1)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "memory_budget_mb": self.memory_budget_mb,
+            "resident_memory_mb": self.resident_memory_mb(),
+            "resident_models": [
+                {
+                    "model_size": key[0],
+                    "device": key[1],
+                    "compute_type": key[2],
+                    "num_workers": key[3],
+                    "cpu_threads": key[4],
+                    "memory_mb": entry["memory_mb"],
+                    "load_time": entry["load_time"],
+                }
+                for key, entry in self._entries.items()
+            ],
+        }
+
+
+# Parámetros de decodificación que se pasan a WhisperModel.transcribe
+DECODE_OPTIONS = {
+    "beam_size": 5,          # Mejor calidad
+    "best_of": 5,           # Mejor calidad
+    "temperature": 0.0,     # Determinístico
+    "condition_on_previous_text": False,  # Mejor para audio largo
+    "vad_filter": True,     # Filtro de detección de voz
+    "vad_parameters": dict(min_silence_duration_ms=400),
+    "word_timestamps": True  # Timestamps por palabra para split en silencios
+}
+
+# Audio largo: duración objetivo de cada tramo que se transcribe en paralelo
+SAMPLE_RATE = 16000
+LONG_AUDIO_CHUNK_SECONDS = float(os.environ.get("WHISPER_LONG_CHUNK_SECONDS", "120"))
+
+# Perfil de ajustes medido con `python whisper_bench.py sweep` en este host
+SETTINGS_PROFILE_PATH = os.environ.get("WHISPER_PROFILE_PATH", os.path.join(os.getcwd(), "whisper_profile.json"))
+
+# Caché de transcripciones en disco (direccionada por contenido)
+TRANSCRIPTION_CACHE_DIR = os.environ.get("WHISPER_CACHE_DIR", os.path.join(os.getcwd(), "whisper_cache"))
+TRANSCRIPTION_CACHE_MAX_MB = float(os.environ.get("WHISPER_CACHE_MAX_MB", "512"))
+
+# Caché de audio ya decodificado a PCM 16 kHz mono float32 (~230 MB por hora de audio)
+AUDIO_CACHE_DIR = os.environ.get("WHISPER_AUDIO_CACHE_DIR", os.path.join(TRANSCRIPTION_CACHE_DIR, "pcm"))
+AUDIO_CACHE_MAX_MB = float(os.environ.get("WHISPER_AUDIO_CACHE_MAX_MB", "2048"))
+
+
+def host_fingerprint() -> Dict[str, Any]:
+    """Identifica el hardware para no aplicar perfiles medidos en otra máquina"""
+    import platform
+    return {
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def load_settings_profile(path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Lee el perfil medido si existe y corresponde a este host"""
+    path = path or SETTINGS_PROFILE_PATH
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if profile.get("host") != host_fingerprint():
+        print(f"[Whisper] Perfil {os.path.basename(path)} medido en otro host, se ignora", file=__import__('sys').stderr)
+        return None
+    return profile
+
+
+_hash_memo: Dict[Tuple[str, int, int], str] = {}
+_hash_memo_lock = threading.Lock()  # transcribe_many lo consulta desde varios hilos
+
+
+def file_sha256(path: str) -> str:
+    """Hash SHA-256 del contenido de un archivo, leído por bloques.
+    Se recuerda por (ruta, mtime, tamaño) para no releer el mismo archivo en cada caché"""
+    st = os.stat(path)
+    memo_key = (os.path.realpath(path), st.st_mtime_ns, st.st_size)
+    with _hash_memo_lock:
+        cached = _hash_memo.get(memo_key)
+    if cached:
+        return cached
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    with _hash_memo_lock:
+        _hash_memo[memo_key] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """Caché en disco de resultados de transcribe_audio.
+
+    Las claves combinan el hash del contenido del audio con model_size, idioma y
+    parámetros de decodificación/reagrupación. Cada entrada es el resultado en JSON
+    comprimido con gzip; el mtime del archivo marca el último uso y se expulsan
+    las entradas más antiguas cuando el total supera el límite de tamaño."""
+
+    SUFFIX = ".json.gz"
+
+    def __init__(self, cache_dir: Optional[str] = None, max_mb: Optional[float] = None):
+        self.cache_dir = cache_dir or TRANSCRIPTION_CACHE_DIR
+        self.max_mb = max_mb if max_mb is not None else TRANSCRIPTION_CACHE_MAX_MB
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # contadores compartidos por los hilos de transcribe_many
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def make_key(self, audio_hash: str, model_size: str, language: Optional[str], params: Dict[str, Any]) -> str:
+        material = json.dumps({
+            "audio": audio_hash,
+            "model_size": model_size,
+            "language": language or "auto",
+            "params": params,
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path, None)  # Marcar como usado recientemente (LRU)
+            self._count(True)
+            return result
+        except (OSError, ValueError):
+            self._count(False)
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        self.prune()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def prune(self, max_mb: Optional[float] = None) -> Dict[str, Any]:
+        """Expulsa las entradas menos usadas hasta quedar bajo max_mb"""
+        limit = (self.max_mb if max_mb is None else max_mb) * 1024 * 1024
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        freed = 0
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            try:
+                self._remove(path)
+            except OSError:
+                continue
+            total -= size
+            freed += size
+            removed += 1
+        return {"removed": removed, "freed_mb": round(freed / 1024 / 1024, 2), "size_mb": round(total / 1024 / 1024, 2)}
+
+    def _remove(self, path: str) -> None:
+        os.remove(path)
+
+    def clear(self) -> Dict[str, Any]:
+        return self.prune(max_mb=0)
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        return {
+            "cache_dir": self.cache_dir,
+            "entries": len(entries),
+            "size_mb": round(sum(size for _, size, _ in entries) / 1024 / 1024, 2),
+            "max_mb": self.max_mb,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class DecodedAudioCache(TranscriptionCache):
+    """Caché en disco del audio decodificado y remuestreado a 16 kHz mono.
+
+    Cada entrada es un .npy float32 con el hash del archivo fuente como nombre y
+    un .json al lado con el tiempo que costó decodificarlo. get() lo abre con
+    np.load(mmap_mode='r'): el arreglo se pasa tal cual a model.transcribe sin
+    copiarlo a memoria. Mismo LRU por mtime y límite de tamaño que las transcripciones."""
+
+    SUFFIX = ".npy"
+
+    def __init__(self, cache_dir: Optional[str] = None, max_mb: Optional[float] = None):
+        super().__init__(cache_dir or AUDIO_CACHE_DIR, max_mb if max_mb is not None else AUDIO_CACHE_MAX_MB)
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Devuelve (audio mmap, segundos que costó decodificarlo) o None"""
+        import numpy as np
+        path = self._path(key)
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                decode_time = json.load(f)["decode_time"]
+            audio = np.load(path, mmap_mode="r")
+            os.utime(path, None)  # Marcar como usado recientemente (LRU)
+            self._count(True)
+            return audio, decode_time
+        except (OSError, ValueError, KeyError):
+            self._count(False)
+            return None
+
+    def put(self, key: str, audio: Any, decode_time: float) -> None:
+        import numpy as np
+        if self.max_mb <= 0:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(path + tmp_suffix, "wb") as f:
+            np.save(f, np.ascontiguousarray(audio, dtype=np.float32))
+        with open(self._meta_path(key) + tmp_suffix, "w", encoding="utf-8") as f:
+            json.dump({"decode_time": decode_time, "samples": len(audio), "sampling_rate": SAMPLE_RATE}, f)
+        # El .json va después: una entrada sin .json cuenta como fallo en get()
+        os.replace(path + tmp_suffix, path)
+        os.replace(self._meta_path(key) + tmp_suffix, self._meta_path(key))
+        self.prune()
+
+    def _remove(self, path: str) -> None:
+        os.remove(path)
+        try:
+            os.remove(path[:-len(self.SUFFIX)] + ".json")
+        except OSError:
+            pass
+
+
+def segment_words(segment, offset: float = 0.0) -> List[Any]:
+    """Palabras con timestamps de un segmento de faster-whisper, desplazadas offset segundos"""
+    words = segment.words if hasattr(segment, 'words') and segment.words else None
+    if not words:
+        # Fallback: segmento sin words, crear pseudo-word
+        if not segment.text.strip():
+            return []
+        words = [PseudoWord(segment.start, segment.end, " " + segment.text.strip())]
+    if offset:
+        words = [PseudoWord(w.start + offset, w.end + offset, w.word) for w in words]
+    return words
+
 
 class WhisperLocal:
     """Clase para manejar transcripción local con Faster-Whisper"""
     
-    def __init__(self):
+    def __init__(self, memory_budget_mb: Optional[float] = None):
         self.model = None
+        self.pool = ModelPool(memory_budget_mb)
+        self.cache = TranscriptionCache()
+        self.audio_cache = DecodedAudioCache()
+        self.decode_options = dict(DECODE_OPTIONS)
+        self._profile: Any = False  # False = aún no leído; None = sin perfil válido
         self.model_size = "medium"  # Modelo por defecto
         self.device = "auto"        # auto, cpu, cuda
         self.compute_type = "auto"  # auto, float16, int8
         self.is_loaded = False
+        self.load_time = 0.0        # Segundos que tardó la última llamada a load_model
+        self.last_load_cached = False  # True si la última carga salió del pool
         
     def detect_device(self) -> str:
         """Detecta automáticamente el mejor dispositivo disponible"""
@@ -57,10 +530,11 @@ class WhisperLocal:
             return "cpu"
             
         try:
-            if torch.cuda.is_available():
-                device_name = torch.cuda.get_device_name(0)
-                memory_gb = torch.cuda.get_device_properties(0).total_memory / 1024**3
-                print(f"[Whisper] GPU detectada: {device_name} ({memory_gb:.1f} GB)", file=__import__('sys').stderr)
+            caps = device_capabilities()
+            if caps["cuda_device_count"] > 0:
+                device_name = caps.get("gpu_name") or f"{caps['cuda_device_count']} dispositivo(s) CUDA"
+                memory = f" ({caps['gpu_memory_gb']:.1f} GB)" if caps.get("gpu_memory_gb") else ""
+                print(f"[Whisper] GPU detectada: {device_name}{memory}", file=__import__('sys').stderr)
                 return "cuda"
             else:
                 print("[Whisper] CUDA no disponible, usando CPU", file=__import__('sys').stderr)
@@ -68,65 +542,97 @@ class WhisperLocal:
         except Exception:
             return "cpu"
     
-    def get_optimal_settings(self, device: str) -> Dict[str, str]:
-        """Obtiene configuraciones óptimas según el dispositivo"""
+    def get_optimal_settings(self, device: str, model_size: Optional[str] = None) -> Dict[str, Any]:
+        """Obtiene configuraciones óptimas según el dispositivo
+        
+        Si hay un perfil medido para este host (whisper_bench.py sweep), sus valores
+        de compute_type / beam_size / cpu_threads (y el modelo por defecto)
+        reemplazan a los fijos."""
         if device == "cuda":
             # Configuraciones optimizadas para GPU
-            return {
+            settings = {
                 "device": "cuda",
                 "compute_type": "float16",  # Más rápido en GPU moderna
                 "model_size": "large-v3"    # Mejor calidad disponible
             }
         else:
             # Configuraciones optimizadas para CPU
-            return {
+            settings = {
                 "device": "cpu", 
                 "compute_type": "int8",     # Más eficiente en CPU
                 "model_size": "medium"      # Balance velocidad/calidad
             }
+        
+        if self._profile is False:
+            self._profile = load_settings_profile()
+        measured = (self._profile or {}).get("devices", {}).get(settings["device"])
+        if measured:
+            if model_size:
+                choice = measured.get("by_model", {}).get(model_size, {})
+            else:
+                choice = measured.get("default", {})
+            settings.update({k: v for k, v in choice.items()
+                             if k in ("model_size", "compute_type", "beam_size", "cpu_threads")})
+        return settings
     
-    def load_model(self, model_size: Optional[str] = None, force_device: Optional[str] = None) -> bool:
+    def load_model(self, model_size: Optional[str] = None, force_device: Optional[str] = None,
+                   num_workers: int = 1, cpu_threads: int = 0, compute_type: Optional[str] = None) -> bool:
         """
         Carga el modelo de Whisper
         
         Args:
             model_size: tiny, base, small, medium, large, large-v2, large-v3
             force_device: cuda, cpu, auto
+            num_workers: transcripciones concurrentes que admite el modelo (hilos de Python)
+            cpu_threads: hilos de CPU por worker (0 = el del perfil medido o el de CTranslate2)
+            compute_type: int8, int8_float32, float16, float32... (None = el óptimo del dispositivo)
         """
-        if not FASTER_WHISPER_AVAILABLE:
-            raise RuntimeError(f"faster-whisper no está instalado. Ejecuta: pip install faster-whisper torch. Error: {FASTER_WHISPER_ERROR}")
+        if not _load_faster_whisper():
+            raise RuntimeError(f"faster-whisper no está instalado. Ejecuta: pip install faster-whisper. Error: {FASTER_WHISPER_ERROR}")
         
         try:
             # Detectar dispositivo si no se especifica
             device = force_device if force_device and force_device != "auto" else self.detect_device()
             
             # Obtener configuraciones óptimas
-            settings = self.get_optimal_settings(device)
+            settings = self.get_optimal_settings(device, model_size)
             
             # Usar configuraciones óptimas o parámetros especificados
             final_model_size = model_size or settings["model_size"]
             final_device = force_device or settings["device"]
-            final_compute_type = settings["compute_type"]
+            final_compute_type = compute_type or settings["compute_type"]
+            cpu_threads = cpu_threads or settings.get("cpu_threads", 0)
+            # Sin entrada en el perfil vuelve al valor fijo (no hereda el del modelo anterior)
+            self.decode_options["beam_size"] = settings.get("beam_size", DECODE_OPTIONS["beam_size"])
+            
+            def loader():
+                print(f"[Whisper] Cargando '{final_model_size}' en {final_device} ({final_compute_type})...", file=__import__('sys').stderr)
+                return WhisperModel(
+                    final_model_size,
+                    device=final_device,
+                    compute_type=final_compute_type,
+                    cpu_threads=cpu_threads,
+                    num_workers=num_workers,
+                    download_root=os.path.join(os.getcwd(), "whisper_models")  # Carpeta local
+                )
             
-            print(f"[Whisper] Cargando '{final_model_size}' en {final_device} ({final_compute_type})...", file=__import__('sys').stderr)
             start_time = time.time()
             
-            # Cargar modelo
-            self.model = WhisperModel(
-                final_model_size,
-                device=final_device,
-                compute_type=final_compute_type,
-                download_root=os.path.join(os.getcwd(), "whisper_models")  # Carpeta local
-            )
+            # Reusar el modelo del pool si ya está residente
+            pool_key = (final_model_size, final_device, final_compute_type, num_workers, cpu_threads)
+            self.model, cached = self.pool.get(pool_key, loader)
             
             load_time = time.time() - start_time
-            print(f"[Whisper] Modelo cargado en {load_time:.1f}s", file=__import__('sys').stderr)
+            if not cached:
+                print(f"[Whisper] Modelo cargado en {load_time:.1f}s", file=__import__('sys').stderr)
             
             # Guardar configuración actual
             self.model_size = final_model_size
             self.device = final_device
             self.compute_type = final_compute_type
             self.is_loaded = True
+            self.load_time = load_time
+            self.last_load_cached = cached
             
             return True
             
@@ -134,18 +640,9 @@ class WhisperLocal:
             # print(f"Error cargando modelo: {e}")
             raise e # Re-lanzar para que el llamador lo maneje
     
-    def transcribe_audio(self, audio_path: str, language: Optional[str] = None) -> Dict[str, Any]:
-        """
-        Transcribe un archivo de audio
-        
-        Args:
-            audio_path: Ruta al archivo de audio
-            language: Idioma del audio (es, en, fr, etc.) o None para detección automática
-            
-        Returns:
-            Dict con transcript, language, duration, etc.
-        """
-        if not FASTER_WHISPER_AVAILABLE:
+    def _ensure_ready(self, audio_path: str) -> Optional[Dict[str, Any]]:
+        """Carga el modelo si hace falta y valida el archivo. Devuelve un dict de error o None"""
+        if not _load_faster_whisper():
              return {
                 "success": False,
                 "error": f"Faster-Whisper no disponible: {FASTER_WHISPER_ERROR}"
@@ -171,121 +668,103 @@ class WhisperLocal:
                 "error": f"Archivo no encontrado: {audio_path}"
             }
         
+        return None
+    
+    def load_audio(self, audio_path: str) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Audio a 16 kHz mono float32, desde la caché de audio decodificado si existe
+        
+        Returns:
+            (audio, stats): audio es un np.memmap de solo lectura en un acierto o el
+            arreglo recién decodificado; stats trae hit, decode_time (lo que costó
+            ahora) y decode_time_saved (lo que costó la decodificación original)
+        """
+        from faster_whisper.audio import decode_audio
+        
+        start_time = time.time()
+        key = None
         try:
-            # print(f"Transcribiendo: {os.path.basename(audio_path)}")
-            # print(f"Configuracion: {self.model_size} | {self.device} | {self.compute_type}")
+            key = file_sha256(audio_path)
+            cached = self.audio_cache.get(key)
+        except OSError:
+            cached = None
+        if cached is not None:
+            audio, original_time = cached
+            return audio, {
+                "hit": True,
+                "decode_time": time.time() - start_time,
+                "decode_time_saved": max(0.0, original_time - (time.time() - start_time))
+            }
+        
+        audio = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+        decode_time = time.time() - start_time
+        if key:
+            try:
+                self.audio_cache.put(key, audio, decode_time)
+            except OSError as e:
+                print(f"[Whisper] No se pudo guardar el audio decodificado: {e}", file=__import__('sys').stderr)
+        return audio, {"hit": False, "decode_time": decode_time, "decode_time_saved": 0.0}
+    
+    def transcribe_stream(self, audio_path: str, language: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Transcribe un archivo de audio emitiendo cada segmento en cuanto se cierra
+        
+        Args:
+            audio_path: Ruta al archivo de audio
+            language: Idioma del audio (es, en, fr, etc.) o None para detección automática
             
+        Yields:
+            {"type": "segment", "start", "end", "text", "progress"} por cada oración cerrada,
+            {"type": "progress", "progress"} al avanzar sin cerrar oraciones y un evento
+            final {"type": "done", ...} con los mismos campos que transcribe_audio salvo
+            transcript y segments (o {"type": "error", ...} si algo falla)
+        """
+        error = self._ensure_ready(audio_path)
+        if error:
+            yield {"type": "error", **error}
+            return
+        
+        try:
             start_time = time.time()
             
+            # El PCM decodificado se comparte entre trabajos sobre el mismo archivo
+            audio, decode_stats = self.load_audio(audio_path)
+            
             # Transcribir con word timestamps para detectar silencios internos
             segments, info = self.model.transcribe(
-                audio_path,
+                audio,
                 language=language,
-                beam_size=5,          # Mejor calidad
-                best_of=5,           # Mejor calidad
-                temperature=0.0,     # Determinístico
-                condition_on_previous_text=False,  # Mejor para audio largo
-                vad_filter=True,     # Filtro de detección de voz
-                vad_parameters=dict(min_silence_duration_ms=400),
-                word_timestamps=True  # Timestamps por palabra para split en silencios
+                **self.decode_options
             )
             
-            # Combinar todos los segmentos usando word timestamps
-            # Estrategia: reagrupar palabras por ORACIONES COMPLETAS (cortar en . ? !)
-            # y también forzar corte en silencios grandes entre palabras
-            SILENCE_THRESHOLD = 1.2  # segundos de silencio entre palabras para forzar corte
-            MAX_SEGMENT_DURATION = 15  # máximo de segundos por segmento
+            regrouper = SentenceRegrouper()
+            total_segments = 0
+            last_progress = -1
             
-            # Primero, recopilar TODAS las palabras de todos los segmentos
-            all_words = []
+            # Las palabras se reagrupan a medida que faster-whisper decodifica,
+            # sin acumular la transcripción completa en memoria
             for segment in segments:
-                words = segment.words if hasattr(segment, 'words') and segment.words else None
-                if words:
-                    all_words.extend(words)
-                elif segment.text.strip():
-                    # Fallback: segmento sin words, crear pseudo-word
-                    class PseudoWord:
-                        def __init__(self, start, end, word):
-                            self.start = start
-                            self.end = end
-                            self.word = word
-                    all_words.append(PseudoWord(segment.start, segment.end, " " + segment.text.strip()))
-            
-            # Ahora reagrupar por oraciones completas
-            transcript_text = ""
-            detailed_segments = []
-            
-            if not all_words:
-                # Sin palabras, usar transcript crudo
-                transcript_text = ""
-                for segment in segments:
-                    transcript_text += segment.text
-                    detailed_segments.append({
-                        "start": segment.start,
-                        "end": segment.end,
-                        "text": segment.text.strip()
-                    })
-            else:
-                current_words = []
-                current_start = all_words[0].start
-                
-                for wi, word in enumerate(all_words):
-                    # Detectar silencio grande ANTES de esta palabra
-                    if wi > 0:
-                        gap = word.start - all_words[wi - 1].end
-                        if gap > SILENCE_THRESHOLD and current_words:
-                            # Forzar corte por silencio
-                            seg_text = "".join(w.word for w in current_words).strip()
-                            if seg_text:
-                                detailed_segments.append({
-                                    "start": current_start,
-                                    "end": current_words[-1].end,
-                                    "text": seg_text
-                                })
-                                transcript_text += seg_text + " "
-                            current_words = []
-                            current_start = word.start
-                    
-                    current_words.append(word)
-                    
-                    # Verificar si esta palabra termina una oración
-                    word_text = word.word.strip()
-                    ends_sentence = word_text and word_text[-1] in '.?!。'
-                    
-                    # También cortar si el segmento es muy largo
-                    segment_too_long = (word.end - current_start) > MAX_SEGMENT_DURATION
-                    
-                    if ends_sentence or segment_too_long:
-                        seg_text = "".join(w.word for w in current_words).strip()
-                        if seg_text:
-                            detailed_segments.append({
-                                "start": current_start,
-                                "end": word.end,
-                                "text": seg_text
-                            })
-                            transcript_text += seg_text + " "
-                        current_words = []
-                        # El start del siguiente segmento será el inicio de la siguiente palabra
-                        if wi + 1 < len(all_words):
-                            current_start = all_words[wi + 1].start
+                words = segment_words(segment)
                 
-                # Cerrar último segmento si quedan palabras
-                if current_words:
-                    seg_text = "".join(w.word for w in current_words).strip()
-                    if seg_text:
-                        detailed_segments.append({
-                            "start": current_start,
-                            "end": current_words[-1].end,
-                            "text": seg_text
-                        })
-                        transcript_text += seg_text + " "
+                progress = round(min(100.0, segment.end / info.duration * 100), 1) if info.duration else 0.0
+                finished = regrouper.feed(words)
+                for seg in finished:
+                    total_segments += 1
+                    yield {"type": "segment", **seg, "progress": progress}
+                if not finished and int(progress) != last_progress:
+                    yield {"type": "progress", "progress": progress}
+                last_progress = int(progress)
+            
+            # Cerrar último segmento si quedan palabras
+            for seg in regrouper.flush():
+                total_segments += 1
+                yield {"type": "segment", **seg, "progress": 100.0}
             
             transcription_time = time.time() - start_time
             
-            # Información del resultado
-            result = {
+            yield {
+                "type": "done",
                 "success": True,
-                "transcript": transcript_text.strip(),
                 "language": info.language,
                 "language_probability": info.language_probability,
                 "duration": info.duration,
@@ -295,21 +774,292 @@ class WhisperLocal:
                     "device": self.device,
                     "compute_type": self.compute_type
                 },
-                "segments": detailed_segments,
                 "stats": {
-                    "total_segments": len(detailed_segments),
-                    "processing_speed": info.duration / transcription_time if transcription_time > 0 else 0
+                    "total_segments": total_segments,
+                    "processing_speed": info.duration / transcription_time if transcription_time > 0 else 0,
+                    "decode": decode_stats
                 }
             }
             
-            # print(f"Transcripcion completada en {transcription_time:.2f}s")
-            # print(f"Velocidad: {result['stats']['processing_speed']:.1f}x tiempo real")
-            # print(f"Idioma detectado: {info.language} ({info.language_probability:.1%})")
+        except Exception as e:
+            # print(f"Error en transcripcion: {e}")
+            yield {
+                "type": "error",
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _settings_for(self, model_size: str) -> Tuple[Dict[str, Any], str]:
+        """(decode_options, compute_type) con que se transcribiría con model_size: los
+        actuales si ese modelo está cargado, si no los que aplicaría load_model"""
+        options = dict(self.decode_options)
+        if self.is_loaded and self.model_size == model_size:
+            return options, self.compute_type
+        device = self.device if self.is_loaded else self.detect_device()
+        settings = self.get_optimal_settings(device, model_size)
+        options["beam_size"] = settings.get("beam_size", DECODE_OPTIONS["beam_size"])
+        return options, settings["compute_type"]
+
+    def _cache_key(self, audio_path: str, model_size: str, language: Optional[str],
+                   decode_options: Optional[Dict[str, Any]] = None,
+                   compute_type: Optional[str] = None) -> str:
+        params = dict(self.decode_options if decode_options is None else decode_options)
+        params["compute_type"] = compute_type or self.compute_type
+        params["silence_threshold"] = SILENCE_THRESHOLD
+        params["max_segment_duration"] = MAX_SEGMENT_DURATION
+        return self.cache.make_key(file_sha256(audio_path), model_size, language, params)
+    
+    def transcribe_audio(self, audio_path: str, language: Optional[str] = None,
+                         model_size: Optional[str] = None, use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Transcribe un archivo de audio
+        
+        Args:
+            audio_path: Ruta al archivo de audio
+            language: Idioma del audio (es, en, fr, etc.) o None para detección automática
+            model_size: Modelo a usar; si no está cargado se carga solo tras fallar la caché
+            use_cache: Consultar/guardar el resultado en la caché de transcripciones
             
+        Returns:
+            Dict con transcript, language, duration, etc.
+        """
+        cache_key = None
+        if use_cache and os.path.exists(audio_path):
+            lookup_start = time.time()
+            target_size = model_size or (self.model_size if self.is_loaded else None)
+            if target_size is None:
+                target_size = self.get_optimal_settings(self.detect_device())["model_size"]
+            try:
+                cache_key = self._cache_key(audio_path, target_size, language, *self._settings_for(target_size))
+                cached = self.cache.get(cache_key)
+            except OSError:
+                cache_key, cached = None, None
+            if cached is not None:
+                cached["stats"]["cache"] = {
+                    "hit": True,
+                    "lookup_time": time.time() - lookup_start,
+                    "hits": self.cache.hits,
+                    "misses": self.cache.misses
+                }
+                return cached
+            model_size = target_size
+        
+        if model_size and os.path.exists(audio_path) and (not self.is_loaded or self.model_size != model_size):
+            try:
+                self.load_model(model_size)
+            except Exception as e:
+                return {
+                    "success": False,
+                    "error": f"Error cargando modelo: {str(e)}"
+                }
+        
+        result = self._transcribe_uncached(audio_path, language)
+        
+        if cache_key and result.get("success"):
+            try:
+                # Clave con los ajustes con que realmente se decodificó
+                cache_key = self._cache_key(audio_path, self.model_size, language)
+                self.cache.put(cache_key, result)
+            except OSError as e:
+                print(f"[Whisper] No se pudo guardar en caché: {e}", file=__import__('sys').stderr)
+            result["stats"]["cache"] = {
+                "hit": False,
+                "hits": self.cache.hits,
+                "misses": self.cache.misses
+            }
+        return result
+    
+    def _transcribe_uncached(self, audio_path: str, language: Optional[str] = None) -> Dict[str, Any]:
+        detailed_segments = []
+        
+        for event in self.transcribe_stream(audio_path, language=language):
+            event_type = event.pop("type")
+            if event_type == "segment":
+                event.pop("progress", None)
+                detailed_segments.append(event)
+            elif event_type == "error":
+                return event
+            elif event_type == "done":
+                # Información del resultado
+                return {
+                    "success": True,
+                    "transcript": " ".join(seg["text"] for seg in detailed_segments),
+                    "language": event["language"],
+                    "language_probability": event["language_probability"],
+                    "duration": event["duration"],
+                    "transcription_time": event["transcription_time"],
+                    "model_info": event["model_info"],
+                    "segments": detailed_segments,
+                    "stats": event["stats"]
+                }
+        
+        return {
+            "success": False,
+            "error": "La transcripción terminó sin resultado"
+        }
+    
+    def transcribe_many(self, audio_paths: List[str], language: Optional[str] = None,
+                        model_size: Optional[str] = None, workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Transcribe varios archivos cargando el modelo una sola vez
+        
+        Usa un solo WhisperModel con num_workers=workers y reparte los núcleos de
+        CPU entre ellos (cpu_threads); CTranslate2 libera el GIL, así que varios
+        hilos de Python transcriben en paralelo sin duplicar los pesos en memoria.
+        
+        Args:
+            audio_paths: Rutas de los archivos de audio
+            language: Idioma del audio o None para detección automática
+            model_size: Modelo a usar (por defecto el óptimo del dispositivo)
+            workers: Transcripciones simultáneas (por defecto según núcleos disponibles)
+            
+        Yields:
+            El resultado de transcribe_audio de cada archivo en cuanto termina,
+            con "index" y "audio_path" añadidos
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        
+        cpu_count = os.cpu_count() or 1
+        if not workers or workers < 1:
+            workers = max(1, min(4, cpu_count // 4))
+        workers = min(workers, max(1, len(audio_paths)))
+        cpu_threads = max(1, cpu_count // workers)
+        
+        try:
+            self.load_model(model_size, num_workers=workers, cpu_threads=cpu_threads)
+        except Exception as e:
+            for index, audio_path in enumerate(audio_paths):
+                yield {"success": False, "error": f"Error cargando modelo: {str(e)}", "index": index, "audio_path": audio_path}
+            return
+        
+        def run(index: int, audio_path: str) -> Dict[str, Any]:
+            result = self.transcribe_audio(audio_path, language=language)
+            result["index"] = index
+            result["audio_path"] = audio_path
             return result
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run, index, audio_path) for index, audio_path in enumerate(audio_paths)]
+            for future in as_completed(futures):
+                yield future.result()
+    
+    def _split_points(self, audio, chunk_seconds: float) -> List[Tuple[int, int]]:
+        """Divide el audio (16 kHz) en tramos de ~chunk_seconds cortando en silencios del VAD"""
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        
+        total = len(audio)
+        target = int(chunk_seconds * SAMPLE_RATE)
+        vad_parameters = self.decode_options.get("vad_parameters") or {}
+        speech = get_speech_timestamps(audio, VadOptions(**vad_parameters))
+        
+        chunks = []
+        chunk_start = 0
+        for current, following in zip(speech, speech[1:]):
+            if current["end"] - chunk_start < target:
+                continue
+            # Cortar en medio del silencio entre dos tramos de voz
+            cut = (current["end"] + following["start"]) // 2
+            chunks.append((chunk_start, cut))
+            chunk_start = cut
+        chunks.append((chunk_start, total))
+        return chunks
+    
+    def transcribe_long(self, audio_path: str, language: Optional[str] = None,
+                        model_size: Optional[str] = None, workers: Optional[int] = None,
+                        chunk_seconds: float = LONG_AUDIO_CHUNK_SECONDS) -> Dict[str, Any]:
+        """
+        Transcribe un audio largo en paralelo partiéndolo en silencios
+        
+        El audio se decodifica una vez, se corta con el VAD en tramos de
+        ~chunk_seconds y cada tramo se transcribe en un worker distinto del mismo
+        modelo (num_workers). Las palabras se desplazan a tiempo absoluto y se
+        reagrupan juntas, así que los segmentos siguen las mismas reglas que el
+        camino secuencial. Audios cortos (< 2 tramos) usan transcribe_audio.
+        
+        Args:
+            audio_path: Ruta al archivo de audio
+            language: Idioma del audio o None para detección automática
+            model_size: Modelo a usar (por defecto el actual o el óptimo del dispositivo)
+            workers: Tramos simultáneos (por defecto según núcleos disponibles)
+            chunk_seconds: Duración objetivo de cada tramo
+            
+        Returns:
+            Dict con el mismo esquema que transcribe_audio y stats de los tramos
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        if not _load_faster_whisper():
+            return {"success": False, "error": f"Faster-Whisper no disponible: {FASTER_WHISPER_ERROR}"}
+        if not os.path.exists(audio_path):
+            return {"success": False, "error": f"Archivo no encontrado: {audio_path}"}
+        
+        try:
+            start_time = time.time()
+            audio, decode_stats = self.load_audio(audio_path)
+            decode_time = decode_stats["decode_time"]
+            
+            chunks = self._split_points(audio, chunk_seconds)
+            if len(chunks) < 2:
+                return self.transcribe_audio(audio_path, language=language, model_size=model_size)
+            
+            cpu_count = os.cpu_count() or 1
+            if not workers or workers < 1:
+                workers = max(1, min(4, cpu_count // 4))
+            workers = min(workers, len(chunks))
+            self.load_model(model_size or (self.model_size if self.is_loaded else None),
+                            num_workers=workers, cpu_threads=max(1, cpu_count // workers))
+            
+            transcribe_start = time.time()
+            
+            # Fijar el idioma antes de repartir, para que todos los tramos lo compartan.
+            # transcribe() detecta el idioma de inmediato y devuelve un generador perezoso.
+            _, info = self.model.transcribe(audio[chunks[0][0]:chunks[0][1]], language=language, **self.decode_options)
+            language = language or info.language
+            
+            def run(bounds: Tuple[int, int]) -> List[Any]:
+                offset = bounds[0] / SAMPLE_RATE
+                segments, _ = self.model.transcribe(audio[bounds[0]:bounds[1]], language=language, **self.decode_options)
+                words = []
+                for segment in segments:
+                    words.extend(segment_words(segment, offset))
+                return words
+            
+            regrouper = SentenceRegrouper()
+            detailed_segments = []
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # map conserva el orden de los tramos
+                for words in executor.map(run, chunks):
+                    detailed_segments.extend(regrouper.feed(words))
+            detailed_segments.extend(regrouper.flush())
+            
+            duration = len(audio) / SAMPLE_RATE
+            transcription_time = time.time() - start_time
+            
+            return {
+                "success": True,
+                "transcript": " ".join(seg["text"] for seg in detailed_segments),
+                "language": language,
+                "language_probability": info.language_probability,
+                "duration": duration,
+                "transcription_time": transcription_time,
+                "model_info": {
+                    "model_size": self.model_size,
+                    "device": self.device,
+                    "compute_type": self.compute_type
+                },
+                "segments": detailed_segments,
+                "stats": {
+                    "total_segments": len(detailed_segments),
+                    "processing_speed": duration / transcription_time if transcription_time > 0 else 0,
+                    "chunks": len(chunks),
+                    "workers": workers,
+                    "decode_time": decode_time,
+                    "decode": decode_stats,
+                    "parallel_time": time.time() - transcribe_start
+                }
+            }
             
         except Exception as e:
-            # print(f"Error en transcripcion: {e}")
             return {
                 "success": False,
                 "error": str(e)
@@ -333,14 +1083,17 @@ class WhisperLocal:
     
     def get_model_info(self) -> Dict[str, Any]:
         """Retorna información del modelo actual"""
+        caps = device_capabilities()
         return {
             "is_loaded": self.is_loaded,
             "model_size": self.model_size,
             "device": self.device,
             "compute_type": self.compute_type,
-            "gpu_available": torch.cuda.is_available(),
-            "gpu_name": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
-            "available_models": self.get_available_models()
+            "gpu_available": caps["cuda_device_count"] > 0,
+            "gpu_name": caps.get("gpu_name"),
+            "supported_compute_types": caps.get("compute_types", {}),
+            "available_models": self.get_available_models(),
+            "pool": self.pool.stats()
         }
 
 # Instancia global
@@ -362,9 +1115,12 @@ def test_whisper_local():
     
     return success
 
-def transcribe_cli():
+def transcribe_cli(stream: bool = False):
     """CLI entry point: python whisper_local.py transcribe <audio_path> [language] [model_size]
-    Outputs JSON result to stdout."""
+    Outputs JSON result to stdout.
+    
+    Con "transcribe-stream" (stream=True) emite NDJSON: una línea por segmento en
+    cuanto se cierra, líneas de progreso y una línea final "done" o "error"."""
     import sys
     import io
     # Force UTF-8 output on Windows
@@ -383,17 +1139,261 @@ def transcribe_cli():
         sys.exit(1)
     
     try:
-        whisper_local.load_model(model_size)
-        result = whisper_local.transcribe_audio(audio_path, language=language)
+        if stream:
+            whisper_local.load_model(model_size)
+            failed = False
+            for event in whisper_local.transcribe_stream(audio_path, language=language):
+                failed = failed or event["type"] == "error"
+                print(json.dumps(event, ensure_ascii=False), flush=True)
+            if failed:
+                sys.exit(1)
+            return
+        # Sin precargar: un acierto de caché no necesita cargar ningún modelo
+        result = whisper_local.transcribe_audio(audio_path, language=language, model_size=model_size)
         print(json.dumps(result, ensure_ascii=False))
     except Exception as e:
         print(json.dumps({"success": False, "error": str(e)}))
         sys.exit(1)
 
 
+def read_manifest(entries: List[str]) -> List[str]:
+    """Expande la lista de entradas de transcribe-batch a rutas de audio.
+    
+    Cada entrada puede ser un archivo de audio, un manifiesto .json (lista de
+    rutas o de objetos con "audio_path"), un manifiesto de texto (.txt/.lst,
+    una ruta por línea) o "-" para leer el manifiesto de texto desde stdin."""
+    import sys
+    paths: List[str] = []
+    for entry in entries:
+        if entry == "-":
+            lines = sys.stdin.read().splitlines()
+        elif entry.lower().endswith(".json"):
+            with open(entry, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for item in data:
+                paths.append(item["audio_path"] if isinstance(item, dict) else str(item))
+            continue
+        elif entry.lower().endswith((".txt", ".lst")):
+            with open(entry, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        else:
+            paths.append(entry)
+            continue
+        paths.extend(line.strip() for line in lines if line.strip() and not line.strip().startswith("#"))
+    return paths
+
+def transcribe_batch_cli():
+    """CLI entry point: python whisper_local.py transcribe-batch <audio|manifest>... [--language es] [--model large-v3] [--workers N]
+    Outputs one JSON line per file as soon as it finishes, then a final summary line."""
+    import sys
+    import io
+    import argparse
+    # Force UTF-8 output on Windows
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    
+    ap = argparse.ArgumentParser(prog="whisper_local.py transcribe-batch")
+    ap.add_argument("inputs", nargs="+", help="Archivos de audio o manifiestos (.json/.txt, '-' = stdin)")
+    ap.add_argument("--language", default="auto")
+    ap.add_argument("--model", default="large-v3")
+    ap.add_argument("--workers", type=int, default=0)
+    args = ap.parse_args(sys.argv[2:])
+    
+    language = None if args.language == "auto" else args.language
+    
+    try:
+        audio_paths = read_manifest(args.inputs)
+    except Exception as e:
+        print(json.dumps({"success": False, "error": f"Manifiesto inválido: {e}"}))
+        sys.exit(1)
+    
+    start_time = time.time()
+    succeeded = 0
+    for result in whisper_local.transcribe_many(audio_paths, language=language, model_size=args.model, workers=args.workers):
+        if result.get("success"):
+            succeeded += 1
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+    
+    print(json.dumps({
+        "event": "done",
+        "total": len(audio_paths),
+        "succeeded": succeeded,
+        "failed": len(audio_paths) - succeeded,
+        "elapsed": time.time() - start_time
+    }), flush=True)
+
+def transcribe_long_cli():
+    """CLI entry point: python whisper_local.py transcribe-long <audio_path> [--language es] [--model large-v3] [--workers N] [--chunk-seconds S]
+    Outputs JSON result to stdout."""
+    import sys
+    import io
+    import argparse
+    # Force UTF-8 output on Windows
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    
+    ap = argparse.ArgumentParser(prog="whisper_local.py transcribe-long")
+    ap.add_argument("audio_path")
+    ap.add_argument("--language", default="auto")
+    ap.add_argument("--model", default="large-v3")
+    ap.add_argument("--workers", type=int, default=0)
+    ap.add_argument("--chunk-seconds", type=float, default=LONG_AUDIO_CHUNK_SECONDS)
+    args = ap.parse_args(sys.argv[2:])
+    
+    language = None if args.language == "auto" else args.language
+    result = whisper_local.transcribe_long(args.audio_path, language=language, model_size=args.model,
+                                           workers=args.workers, chunk_seconds=args.chunk_seconds)
+    print(json.dumps(result, ensure_ascii=False))
+    if not result.get("success"):
+        sys.exit(1)
+
+def cache_cli():
+    """CLI entry point: python whisper_local.py cache [stats|prune|clear] [--max-mb N]
+    Inspecciona o poda la caché de transcripciones y la de audio decodificado
+    (bajo "audio"). Outputs JSON to stdout."""
+    import sys
+    import argparse
+    
+    ap = argparse.ArgumentParser(prog="whisper_local.py cache")
+    ap.add_argument("action", nargs="?", default="stats", choices=["stats", "prune", "clear"])
+    ap.add_argument("--max-mb", type=float, default=None, help="Límite para prune (por defecto WHISPER_CACHE_MAX_MB)")
+    args = ap.parse_args(sys.argv[2:])
+    
+    cache = whisper_local.cache
+    audio_cache = whisper_local.audio_cache
+    if args.action == "prune":
+        result = {"success": True, **cache.prune(args.max_mb), "audio": audio_cache.prune(args.max_mb)}
+    elif args.action == "clear":
+        result = {"success": True, **cache.clear(), "audio": audio_cache.clear()}
+    else:
+        result = {"success": True, **cache.stats(), "audio": audio_cache.stats()}
+    print(json.dumps(result, ensure_ascii=False))
+
+def devices_cli():
+    """CLI entry point: python whisper_local.py devices [--refresh]
+    Muestra las capacidades de dispositivo cacheadas en WHISPER_STATE_PATH.
+    --refresh las vuelve a consultar (p. ej. tras cambiar de GPU o drivers)."""
+    import sys
+    import argparse
+    
+    ap = argparse.ArgumentParser(prog="whisper_local.py devices")
+    ap.add_argument("--refresh", action="store_true", help="Ignora el estado cacheado y vuelve a detectar")
+    args = ap.parse_args(sys.argv[2:])
+    
+    if args.refresh:
+        state = _read_state()
+        state["nvidia_bin_paths"] = _discover_nvidia_bin_paths()
+        _write_state(state)
+    result = {
+        "success": True,
+        "state_path": WHISPER_STATE_PATH,
+        "nvidia_bin_paths": _read_state().get("nvidia_bin_paths", []),
+        **device_capabilities(refresh=args.refresh)
+    }
+    print(json.dumps(result, ensure_ascii=False))
+
+def serve_cli():
+    """CLI entry point: python whisper_local.py serve [model_size]
+    Servidor persistente por stdin/stdout con protocolo JSON-lines.
+
+    Cada línea de stdin es un trabajo JSON:
+        {"id": "1", "action": "transcribe", "audio_path": "...", "language": "es", "model_size": "large-v3"}
+        {"id": "2", "action": "load", "model_size": "tiny"}
+        {"id": "3", "action": "info"}
+        {"id": "4", "action": "shutdown"}
+
+    Cada respuesta es una línea JSON en stdout con el mismo "id". Las respuestas
+    de "transcribe" usan el mismo esquema que WhisperLocal.transcribe_audio más un
+    bloque "timings" con load_time / transcribe_time / total_time por separado.
+    Los modelos quedan residentes entre trabajos en el pool LRU de whisper_local."""
+    import sys
+    import io
+    # Force UTF-8 output on Windows
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    stdin = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+
+    default_model = sys.argv[2] if len(sys.argv) > 2 else "large-v3"
+
+    def emit(obj: Dict[str, Any]) -> None:
+        print(json.dumps(obj, ensure_ascii=False), flush=True)
+
+    emit({"event": "ready", "pid": os.getpid(), "default_model": default_model})
+
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        job_id = None
+        try:
+            job = json.loads(line)
+            job_id = job.get("id")
+            action = job.get("action", "transcribe")
+
+            if action == "shutdown":
+                emit({"id": job_id, "success": True, "event": "shutdown"})
+                break
+
+            if action == "info":
+                emit({"id": job_id, "success": True, **whisper_local.get_model_info()})
+                continue
+
+            model_size = job.get("model_size") or default_model
+            total_start = time.time()
+
+            if action == "load":
+                whisper_local.load_model(model_size)
+                emit({
+                    "id": job_id,
+                    "success": True,
+                    "model_size": model_size,
+                    "timings": {"load_time": whisper_local.load_time, "cached": whisper_local.last_load_cached}
+                })
+                continue
+
+            if action != "transcribe":
+                emit({"id": job_id, "success": False, "error": f"Acción desconocida: {action}"})
+                continue
+
+            language = job.get("language")
+            if language == "auto":
+                language = None
+
+            # Las cargas ocurren dentro de transcribe_audio (y no ocurren si hay acierto de caché)
+            loads_before = whisper_local.pool.misses
+            transcribe_start = time.time()
+            result = whisper_local.transcribe_audio(job.get("audio_path", ""), language=language, model_size=model_size)
+            already_loaded = whisper_local.pool.misses == loads_before
+            load_time = 0.0 if already_loaded else whisper_local.load_time
+            transcribe_time = time.time() - transcribe_start - load_time
+
+            result["id"] = job_id
+            result["timings"] = {
+                "load_time": load_time,
+                "transcribe_time": transcribe_time,
+                "total_time": time.time() - total_start,
+                "model_cached": already_loaded
+            }
+            emit(result)
+
+        except Exception as e:
+            emit({"id": job_id, "success": False, "error": str(e)})
+
+
 if __name__ == "__main__":
     import sys
+    save_nvidia_paths()
     if len(sys.argv) > 1 and sys.argv[1] == "transcribe":
         transcribe_cli()
+    elif len(sys.argv) > 1 and sys.argv[1] == "transcribe-stream":
+        transcribe_cli(stream=True)
+    elif len(sys.argv) > 1 and sys.argv[1] == "transcribe-batch":
+        transcribe_batch_cli()
+    elif len(sys.argv) > 1 and sys.argv[1] == "transcribe-long":
+        transcribe_long_cli()
+    elif len(sys.argv) > 1 and sys.argv[1] == "cache":
+        cache_cli()
+    elif len(sys.argv) > 1 and sys.argv[1] == "devices":
+        devices_cli()
+    elif len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve_cli()
     else:
         test_whisper_local()
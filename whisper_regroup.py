@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reagrupación de palabras de Whisper en segmentos por oraciones completas
+
+Reglas (las mismas que usaba transcribe_audio):
+- cortar cuando una palabra termina en . ? ! 。
+- cortar antes de una palabra precedida por un silencio > SILENCE_THRESHOLD
+- cortar cuando el segmento supera MAX_SEGMENT_DURATION segundos
+
+Las palabras se guardan en arreglos (starts/ends en NumPy y el texto concatenado
+con sus desplazamientos); huecos, puntuación y límites se calculan en bloque y
+solo los tramos que superan la duración máxima se recorren palabra por palabra.
+
+SentenceRegrouper (el camino de transcribe_audio/transcribe_stream) recibe pocas
+palabras por llamada: ahí armar arreglos cuesta más que el bucle, así que las
+tandas chicas se recorren palabra por palabra sobre el segmento abierto y solo
+las de VECTOR_MIN_WORDS o más pasan por segment_bounds.
+"""
+
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+SILENCE_THRESHOLD = 1.2  # segundos de silencio entre palabras para forzar corte
+MAX_SEGMENT_DURATION = 15  # máximo de segundos por segmento
+SENTENCE_END_CHARS = '.?!。'
+VECTOR_MIN_WORDS = 1024  # tandas menores en SentenceRegrouper.feed van por el bucle escalar
+
+# Tablas por código de carácter: espacios que quita str.strip() y fin de oración.
+# Todos los espacios Unicode y SENTENCE_END_CHARS están por debajo de U+3003, así
+# que los códigos mayores se consultan en la última entrada (False en ambas)
+_TABLE_SIZE = 0x3004
+_WHITESPACE_TABLE = np.array([chr(c).isspace() for c in range(_TABLE_SIZE)], dtype=bool)
+_SENTENCE_END_TABLE = np.array([chr(c) in SENTENCE_END_CHARS for c in range(_TABLE_SIZE)], dtype=bool)
+
+
+class PseudoWord:
+    """Palabra sintética para segmentos que faster-whisper devuelve sin words"""
+    __slots__ = ("start", "end", "word")
+
+    def __init__(self, start, end, word):
+        self.start = start
+        self.end = end
+        self.word = word
+
+
+class WordArray:
+    """Palabras en almacenamiento columnar.
+
+    starts/ends son float64; los textos se guardan concatenados en `text` y
+    `offsets[i]:offsets[i + 1]` delimita la palabra i."""
+
+    __slots__ = ("starts", "ends", "text", "offsets")
+
+    def __init__(self, starts: Sequence[float], ends: Sequence[float], texts: Sequence[str]):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.text = "".join(texts)
+        self.offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)), out=self.offsets[1:])
+
+    @classmethod
+    def from_words(cls, words: Iterable[Any]) -> "WordArray":
+        """Construye el arreglo desde objetos con .start, .end y .word"""
+        words = words if isinstance(words, (list, tuple)) else list(words)
+        return cls([w.start for w in words], [w.end for w in words], [w.word for w in words])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def texts(self, first: int = 0, last: int = -1) -> List[str]:
+        """Textos de las palabras [first, last] (inclusive; por defecto todas)"""
+        last = len(self) - 1 if last < 0 else last
+        bounds = self.offsets[first:last + 2].tolist()
+        return [self.text[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def sentence_end_mask(words: WordArray) -> np.ndarray:
+    """True donde la palabra (sin espacios) termina en puntuación de fin de oración"""
+    n = len(words)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    codes = np.minimum(np.frombuffer(words.text.encode("utf-32-le"), dtype=np.uint32), _TABLE_SIZE - 1)
+    # Última posición no-espacio hasta cada carácter (-1 si no hay ninguna)
+    positions = np.where(_WHITESPACE_TABLE[codes], -1, np.arange(len(codes)))
+    last_visible = np.maximum.accumulate(positions) if len(codes) else positions
+    ends = words.offsets[1:]
+    starts = words.offsets[:-1]
+    non_empty = ends > starts
+    last_char = np.full(n, -1, dtype=np.int64)
+    last_char[non_empty] = last_visible[ends[non_empty] - 1]
+    # La palabra cuenta solo si ese carácter visible cae dentro de ella
+    inside = last_char >= starts
+    mask = np.zeros(n, dtype=bool)
+    mask[inside] = _SENTENCE_END_TABLE[codes[last_char[inside]]]
+    return mask
+
+
+def segment_bounds(words: WordArray,
+                   silence_threshold: float = SILENCE_THRESHOLD,
+                   max_segment_duration: float = MAX_SEGMENT_DURATION) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """
+    Calcula los límites de segmento sobre un WordArray
+
+    Returns:
+        (firsts, lasts, tail_open): índices inclusivos de primera y última palabra
+        de cada segmento. tail_open indica que el último segmento llegó al final de
+        las palabras sin un corte propio (un silencio posterior aún podría cerrarlo).
+    """
+    n = len(words)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, False
+    starts, ends = words.starts, words.ends
+
+    # Cortes que no dependen del inicio del segmento: fin de oración en j, o
+    # silencio grande entre j y j+1
+    static_cut = sentence_end_mask(words)
+    static_cut[:-1] |= (starts[1:] - ends[:-1]) > silence_threshold
+    tail_open = not static_cut[-1]
+    static_cut[-1] = True
+    lasts = static_cut.nonzero()[0]
+    firsts = np.empty_like(lasts)
+    firsts[0] = 0
+    firsts[1:] = lasts[:-1] + 1
+
+    # Corte por duración: solo hace falta en los tramos cuyo end máximo se pasa del
+    # límite respecto a su inicio (misma resta que el bucle original). El resto de
+    # tramos queda resuelto sin recorrer palabra por palabra.
+    too_long = (np.maximum.reduceat(ends, firsts) - starts[firsts] > max_segment_duration).nonzero()[0]
+    if not too_long.size:
+        return firsts, lasts, tail_open
+
+    start_list = starts.tolist()
+    end_list = ends.tolist()
+    new_firsts: List[int] = []
+    new_lasts: List[int] = []
+    closes_tail = False
+    for index in too_long.tolist():
+        first, last = int(firsts[index]), int(lasts[index])
+        seg_start = start_list[first]
+        for j in range(first, last + 1):
+            if end_list[j] - seg_start > max_segment_duration:
+                new_firsts.append(first)
+                new_lasts.append(j)
+                first = j + 1
+                if first <= last:
+                    seg_start = start_list[first]
+        if first <= last:
+            new_firsts.append(first)
+            new_lasts.append(last)
+        elif last == n - 1:
+            closes_tail = True  # el corte por duración cerró también el último tramo
+
+    keep = np.ones(len(firsts), dtype=bool)
+    keep[too_long] = False
+    firsts = np.concatenate([firsts[keep], np.asarray(new_firsts, dtype=np.int64)])
+    lasts = np.concatenate([lasts[keep], np.asarray(new_lasts, dtype=np.int64)])
+    order = np.argsort(firsts, kind="stable")
+    return firsts[order], lasts[order], tail_open and not closes_tail
+
+
+def _segments(words: WordArray, firsts: np.ndarray, lasts: np.ndarray) -> List[Dict[str, Any]]:
+    """Arma los segmentos {start, end, text}; los que quedan sin texto se descartan"""
+    text = words.text
+    segments = []
+    for start, end, a, b in zip(words.starts[firsts].tolist(), words.ends[lasts].tolist(),
+                                words.offsets[firsts].tolist(), words.offsets[lasts + 1].tolist()):
+        seg_text = text[a:b].strip()
+        if seg_text:
+            segments.append({
+                "start": start,
+                "end": end,
+                "text": seg_text
+            })
+    return segments
+
+
+def regroup_words(words: Any,
+                  silence_threshold: float = SILENCE_THRESHOLD,
+                  max_segment_duration: float = MAX_SEGMENT_DURATION) -> List[Dict[str, Any]]:
+    """Reagrupa todas las palabras (WordArray o iterable de palabras) en segmentos {start, end, text}"""
+    if not isinstance(words, WordArray):
+        words = WordArray.from_words(words)
+    firsts, lasts, _ = segment_bounds(words, silence_threshold, max_segment_duration)
+    return _segments(words, firsts, lasts)
+
+
+class SentenceRegrouper:
+    """Reagrupador incremental.
+
+    feed() recibe las palabras a medida que llegan y devuelve los segmentos que ya
+    quedaron cerrados; solo se conserva el segmento abierto, así que cada palabra
+    se revisa una sola vez. flush() lo cierra."""
+
+    def __init__(self, silence_threshold: float = SILENCE_THRESHOLD,
+                 max_segment_duration: float = MAX_SEGMENT_DURATION):
+        self.silence_threshold = silence_threshold
+        self.max_segment_duration = max_segment_duration
+        self._starts: List[float] = []
+        self._ends: List[float] = []
+        self._texts: List[str] = []
+
+    def feed(self, words: Iterable[Any]) -> List[Dict[str, Any]]:
+        words = words if isinstance(words, (list, tuple)) else list(words)
+        if len(words) < VECTOR_MIN_WORDS:
+            return self._feed_scalar(words)
+        self._starts += [w.start for w in words]
+        self._ends += [w.end for w in words]
+        self._texts += [w.word for w in words]
+        if not self._texts:
+            return []
+
+        pending = WordArray(self._starts, self._ends, self._texts)
+        firsts, lasts, tail_open = segment_bounds(pending, self.silence_threshold, self.max_segment_duration)
+        keep_from = len(pending)
+        if tail_open:
+            keep_from = int(firsts[-1])
+            firsts, lasts = firsts[:-1], lasts[:-1]
+        out = _segments(pending, firsts, lasts)
+
+        self._starts = self._starts[keep_from:]
+        self._ends = self._ends[keep_from:]
+        self._texts = self._texts[keep_from:]
+        return out
+
+    def _feed_scalar(self, words: Sequence[Any]) -> List[Dict[str, Any]]:
+        """Mismas reglas que segment_bounds, palabra por palabra sobre el segmento abierto"""
+        out: List[Dict[str, Any]] = []
+        starts, ends, texts = self._starts, self._ends, self._texts
+        for w in words:
+            if texts and w.start - ends[-1] > self.silence_threshold:
+                self._close(out)
+            starts.append(w.start)
+            ends.append(w.end)
+            texts.append(w.word)
+            stripped = w.word.strip()
+            if (stripped and stripped[-1] in SENTENCE_END_CHARS) or w.end - starts[0] > self.max_segment_duration:
+                self._close(out)
+        return out
+
+    def _close(self, out: List[Dict[str, Any]]) -> None:
+        seg_text = "".join(self._texts).strip()
+        if seg_text:
+            out.append({"start": float(self._starts[0]), "end": float(self._ends[-1]), "text": seg_text})
+        self._starts.clear()
+        self._ends.clear()
+        self._texts.clear()
+
+    def flush(self) -> List[Dict[str, Any]]:
+        out = regroup_words(WordArray(self._starts, self._ends, self._texts),
+                            self.silence_threshold, self.max_segment_duration)
+        self._starts, self._ends, self._texts = [], [], []
+        return out
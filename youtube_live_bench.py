@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de youtube_live_reader.py reproduciendo chats grabados (sin conexión)
+
+Uso:
+    python youtube_live_bench.py synth [--minutes 5]
+    python youtube_live_bench.py record <video_id> [--minutes 5] [--name mi_live]
+    python youtube_live_bench.py replay [--fixtures a.ndjson b.ndjson] [--speed 10]
+    python youtube_live_bench.py filter [--fixtures a.ndjson] [--rate 2] [--speed 10]
+
+Los fixtures son NDJSON en el formato de ReplayChat y se guardan en
+youtube_live_bench/fixtures. `synth` genera tres chats sintéticos (tranquilo,
+normal y con ráfagas); `record` graba un live real con pytchat usando la hora
+de publicación de cada mensaje.
+
+`replay` mide, por fixture y modo, la latencia desde que se publica un mensaje
+hasta que se escribe en stdout (en segundos de la grabación), las escrituras
+a stdout por comentario (una escritura con flush = una llamada al sistema) y
+las consultas al chat. Modos:
+    legacy    sync_items + time.sleep(1) + una escritura por comentario (lo anterior)
+    adaptive  consulta adaptativa, una escritura por comentario
+    batched   consulta adaptativa + lotes (--max-batch, --max-delay)
+
+`filter` pasa los fixtures por CommentGate (repetidos, emotes, token bucket y
+cola por prioridad) y cuenta qué se descartó y por qué, cuántos superchats
+salieron, el máximo de comentarios emitidos en un segundo y la espera.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from typing import Any, Dict
+
+import youtube_live_reader as reader
+
+BENCH_DIR = os.path.join(os.getcwd(), "youtube_live_bench")
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+
+# Mensajes por minuto de cada fixture sintético y si tiene ráfagas
+SYNTH_PROFILES = {
+    "quiet": {"rate": 4, "bursts": False},
+    "normal": {"rate": 60, "bursts": False},
+    "busy": {"rate": 300, "bursts": True},
+}
+SYNTH_TEXTS = ["hola!", "saludos desde México", "jajaja", "JAJAJAJA", "que buen stream", "Qué buen stream 🔥",
+               "primero", "❤️❤️❤️", ":face-blue-smiling::face-blue-smiling:", "cuándo sale el próximo video?",
+               "gg", "like si lo ves en 2024", "buenas noches a todos"]
+
+
+def _log(message: str) -> None:
+    print(f"[Bench] {message}", file=sys.stderr, flush=True)
+
+
+def write_report(name: str, report: Dict[str, Any]) -> str:
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def synth_fixture(name: str, minutes: float, rate: float, bursts: bool, seed: int = 0) -> str:
+    """Chat sintético: llegadas de Poisson a `rate` mensajes/min; con ráfagas x8 de 10 s"""
+    rng = random.Random(seed)
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    path = os.path.join(FIXTURES_DIR, f"{name}.ndjson")
+    duration = minutes * 60
+    t = 0.0
+    n = 0
+    with open(path, "w", encoding="utf-8") as f:
+        # YouTube pide consultar más seguido cuanto más activo está el chat
+        f.write(json.dumps({"t": 0.0, "timeoutMs": 10000 if rate < 10 else 5000 if rate < 120 else 2000}) + "\n")
+        while True:
+            burst = bursts and int(t) % 60 < 10
+            t += rng.expovariate(rate * (8 if burst else 1) / 60.0)
+            if t >= duration:
+                break
+            n += 1
+            paid = rng.random() < 0.01
+            f.write(json.dumps({
+                "t": round(t, 3),
+                "id": f"{name}-{n}",
+                "author": f"usuario{rng.randint(1, 500)}",
+                "text": rng.choice(SYNTH_TEXTS),
+                "amountValue": 5.0 if paid else 0,
+                "amountString": "$5.00" if paid else "",
+            }, ensure_ascii=False) + "\n")
+    return path
+
+
+def record_fixture(video_id: str, minutes: float, name: str) -> str:
+    """Graba un live real en formato ReplayChat (t = hora de publicación del mensaje)"""
+    from pytchat import create
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    path = os.path.join(FIXTURES_DIR, f"{name}.ndjson")
+    chat = create(video_id=video_id)
+    start = time.time()
+    last_timeout = None
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while chat.is_alive() and time.time() - start < minutes * 60:
+            data = chat.get()
+            now = time.time() - start
+            if getattr(data, "interval", None) and data.interval != last_timeout:
+                last_timeout = data.interval
+                f.write(json.dumps({"t": round(now, 3), "timeoutMs": int(data.interval * 1000)}) + "\n")
+            for message in data.items:
+                posted = getattr(message, "timestamp", None)
+                t = (posted / 1000.0 - start) if posted else now
+                f.write(json.dumps({
+                    "t": round(max(0.0, t), 3),
+                    "id": message.id,
+                    "author": message.author.name,
+                    "text": message.message,
+                    "amountValue": getattr(message, "amountValue", 0),
+                    "amountString": getattr(message, "amountString", ""),
+                }, ensure_ascii=False) + "\n")
+                count += 1
+            time.sleep(max(0.5, getattr(data, "interval", 1) or 1))
+    chat.terminate()
+    _log(f"{count} mensajes grabados en {path}")
+    return path
+
+
+class CountingOut:
+    """stdout simulado: cuenta escrituras y anota cuándo se escribió cada comentario"""
+
+    def __init__(self):
+        self.writes = 0
+        self.flushes = 0
+        self.written = {}  # id -> time.time() de la escritura
+        self._buffer = ""
+
+    def write(self, data):
+        self.writes += 1
+        self._buffer += data
+
+    def flush(self):
+        self.flushes += 1
+        now = time.time()
+        for line in self._buffer.splitlines():
+            payload = line.split("---", 2)[-1] if line.startswith("---") else line
+            try:
+                record = json.loads(payload)
+            except ValueError:
+                continue
+            if record.get("id"):
+                self.written[record["id"]] = now
+        self._buffer = ""
+
+
+def _legacy_loop(chat, handle, stopping, speed):
+    """El bucle anterior: sync_items reparte los mensajes en el intervalo y luego duerme 1 s"""
+    while chat.is_alive() and not stopping.is_set():
+        data = chat.get()
+        for message in data.items:
+            time.sleep(data.interval / len(data.items))
+            handle([message])
+        time.sleep(1.0 / speed)
+
+
+def replay(path: str, mode: str, speed: float, max_batch: int, max_delay: float) -> Dict[str, Any]:
+    out = CountingOut()
+    batched = mode == "batched"
+    emitter = reader.Emitter(out, max_batch=max_batch if batched else 1, max_delay=max_delay / speed)
+    chat = reader.ReplayChat(path, speed)
+    stream = reader.LiveStream(os.path.basename(path), emitter)
+    stopping = threading.Event()
+    start = time.perf_counter()
+    if mode == "legacy":
+        _legacy_loop(chat, stream.handle, stopping, speed)
+    else:
+        poller = reader.AdaptivePoller(reader.MIN_POLL / speed, reader.MAX_POLL / speed)
+        reader.poll_chat(chat, stream.handle, stopping, poller)
+    emitter.close()
+    wall = time.perf_counter() - start
+
+    posted = {m.id: m.posted for m in chat.messages}
+    latencies = sorted((t - chat.start) * speed - posted[i] for i, t in out.written.items() if i in posted)
+    comments = len(latencies)
+    recording_minutes = wall * speed / 60
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3) if latencies else None
+    return {
+        "mode": mode,
+        "comments": comments,
+        "latency_mean": round(sum(latencies) / comments, 3) if comments else None,
+        "latency_p50": pick(0.5),
+        "latency_p95": pick(0.95),
+        "latency_max": round(latencies[-1], 3) if latencies else None,
+        "writes": out.flushes,
+        "writes_per_comment": round(out.flushes / comments, 3) if comments else None,
+        "polls": chat.requests,
+        "polls_per_minute": round(chat.requests / recording_minutes, 2) if recording_minutes else None,
+        "polls_per_comment": round(chat.requests / comments, 3) if comments else None,
+    }
+
+
+def filter_fixture(path: str, rate: float, speed: float, dedupe: bool) -> Dict[str, Any]:
+    """Reproduce un fixture pasando los comentarios por CommentGate"""
+    out = CountingOut()
+    emitter = reader.Emitter(out, max_batch=1)
+    # El bucket se acelera con la reproducción; la ráfaga (en comentarios) no
+    gate = {"rate": rate * speed, "burst": max(1.0, rate * 2), "dedupe": dedupe, "max_age": reader.MAX_AGE / speed}
+    chat = reader.ReplayChat(path, speed)
+    stream = reader.LiveStream(os.path.basename(path), emitter, gate=gate)
+    if stream.gate.filter:
+        stream.gate.filter.seconds = reader.DEDUPE_SECONDS / speed
+    poller = reader.AdaptivePoller(reader.MIN_POLL / speed, reader.MAX_POLL / speed)
+    reader.poll_chat(chat, stream.handle, threading.Event(), poller)
+    # Dejar que la cola termine de salir (o de vencer)
+    deadline = time.time() + reader.MAX_AGE / speed + 1
+    while stream.gate.pending() and time.time() < deadline:
+        time.sleep(0.05)
+    stream.gate.close()
+    emitter.close()
+
+    posted = {m.id: m.posted for m in chat.messages}
+    superchats = {m.id for m in chat.messages if m.amountValue > 0}
+    emitted = {i: (t - chat.start) * speed for i, t in out.written.items() if i in posted}
+    per_second = {}
+    for t in emitted.values():
+        per_second[int(t)] = per_second.get(int(t), 0) + 1
+    delays = [t - posted[i] for i, t in emitted.items()]
+    stats = stream.gate.stats()
+    return {
+        "fixture": os.path.basename(path),
+        "rate": rate,
+        "dedupe": dedupe,
+        "input": len(chat.messages),
+        "output": len(emitted),
+        "dropped": stats["dropped"],
+        "superchats_in": len(superchats),
+        "superchats_out": len(superchats & set(emitted)),
+        "max_per_second": max(per_second.values(), default=0),
+        "delay_mean": round(sum(delays) / len(delays), 3) if delays else None,
+        "delay_max": round(max(delays), 3) if delays else None,
+    }
+
+
+def bench_filter(args: argparse.Namespace) -> Dict[str, Any]:
+    fixtures = args.fixtures or [_synth_path("busy", args.minutes)]
+    results = []
+    for path in fixtures:
+        for dedupe in (False, True):
+            result = filter_fixture(path, args.rate, args.speed, dedupe)
+            results.append(result)
+            _log(f"{result['fixture']} dedupe={dedupe}: {result['input']} -> {result['output']} "
+                 f"(descartes {result['dropped']}), superchats {result['superchats_out']}/{result['superchats_in']}, "
+                 f"máx {result['max_per_second']}/s")
+    return {"benchmark": "filter", "speed": args.speed, "rate": args.rate, "results": results}
+
+
+def _synth_path(name: str, minutes: float) -> str:
+    path = os.path.join(FIXTURES_DIR, f"{name}.ndjson")
+    if not os.path.exists(path):
+        synth_fixture(name, minutes, **SYNTH_PROFILES[name])
+    return path
+
+
+def bench_replay(args: argparse.Namespace) -> Dict[str, Any]:
+    fixtures = args.fixtures or [_synth_path(name, args.minutes) for name in SYNTH_PROFILES]
+    results = []
+    for path in fixtures:
+        for mode in args.modes:
+            result = {"fixture": os.path.basename(path), **replay(path, mode, args.speed, args.max_batch, args.max_delay)}
+            results.append(result)
+            _log(f"{result['fixture']} {mode}: latencia media {result['latency_mean']}s, "
+                 f"{result['writes_per_comment']} escrituras/comentario, {result['polls']} consultas")
+    return {
+        "benchmark": "replay",
+        "speed": args.speed,
+        "max_batch": args.max_batch,
+        "max_delay": args.max_delay,
+        "results": results,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks de youtube_live_reader.py")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    synth = sub.add_parser("synth", help="Generar los fixtures sintéticos")
+    synth.add_argument("--minutes", type=float, default=5)
+
+    record = sub.add_parser("record", help="Grabar un live real como fixture")
+    record.add_argument("video_id")
+    record.add_argument("--minutes", type=float, default=5)
+    record.add_argument("--name", default=None)
+
+    rep = sub.add_parser("replay", help="Latencia y escrituras por comentario reproduciendo fixtures")
+    rep.add_argument("--fixtures", nargs="+", default=None, help="Por defecto los sintéticos (se generan si faltan)")
+    rep.add_argument("--modes", nargs="+", default=["legacy", "adaptive", "batched"],
+                     choices=["legacy", "adaptive", "batched"])
+    rep.add_argument("--speed", type=float, default=10, help="Velocidad de reproducción")
+    rep.add_argument("--minutes", type=float, default=5, help="Duración de los fixtures sintéticos")
+    rep.add_argument("--max-batch", type=int, default=reader.MAX_BATCH)
+    rep.add_argument("--max-delay", type=float, default=reader.MAX_DELAY)
+
+    filt = sub.add_parser("filter", help="Repetidos, emotes y límite de salida sobre fixtures")
+    filt.add_argument("--fixtures", nargs="+", default=None, help="Por defecto el sintético busy")
+    filt.add_argument("--rate", type=float, default=2, help="Comentarios por segundo de salida")
+    filt.add_argument("--speed", type=float, default=10, help="Velocidad de reproducción")
+    filt.add_argument("--minutes", type=float, default=5, help="Duración del fixture sintético")
+
+    args = ap.parse_args()
+    if args.command == "synth":
+        paths = [synth_fixture(name, args.minutes, **profile) for name, profile in SYNTH_PROFILES.items()]
+        report = {"benchmark": "synth", "fixtures": paths}
+    elif args.command == "record":
+        report = {"benchmark": "record", "fixture": record_fixture(args.video_id, args.minutes, args.name or args.video_id)}
+    elif args.command == "replay":
+        report = bench_replay(args)
+    elif args.command == "filter":
+        report = bench_filter(args)
+    path = write_report(f"{args.command}_report.json", report)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    _log(f"Reporte guardado en {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,92 +2,527 @@
 # -*- coding: utf-8 -*-
 """
 Script para leer comentarios en tiempo real de YouTube Live usando pytchat
+
+Modo normal: un video, hasta max_comments o timeout, y un JSON final.
+Modo daemon (--daemon): sigue varios lives a la vez (un hilo por live) y recibe
+comandos por stdin, uno por línea (JSON o texto):
+
+    {"cmd": "add", "video_id": "..."}      o   add <video_id>
+    {"cmd": "remove", "video_id": "..."}   o   remove <video_id>
+    {"cmd": "list"}                        o   list
+    {"cmd": "recent", "video_id": "...", "n": 20}
+    {"cmd": "quit"}                        (o cerrar stdin)
+
+Los comentarios salen como ---COMMENT---{json} (con videoId) y el resto de
+avisos como ---EVENT---{json}; con --ndjson, una línea JSON por evento con su
+"type". De cada live solo se guardan los últimos --buffer comentarios, así la
+memoria no crece con las horas de transmisión.
+
+El chat se consulta al ritmo que pide YouTube (el timeout de la continuación),
+más seguido si llegan muchos mensajes y con backoff si no llega ninguno. Los
+comentarios se escriben en lotes de hasta --max-batch líneas o cada
+--max-delay segundos, en una sola escritura a stdout.
+
+Con --filter se descartan mensajes repetidos (misma forma normalizada en la
+ventana reciente) y los que son solo emotes; con --rate N la salida se limita a
+N comentarios por segundo (token bucket) y lo que espera se atiende por
+prioridad (dueño/moderador, miembro, resto) y se descarta si envejece. Los
+superchats pasan siempre, sin filtro ni espera.
+
+En lugar de un video_id se puede pasar un archivo .ndjson grabado (ver
+ReplayChat) para reproducir un chat sin conexión.
 """
 
+import os
+import re
 import sys
 import json
 import time
+import heapq
+import hashlib
+import threading
+import unicodedata
+from collections import deque
 from datetime import datetime
 
-def read_youtube_live_comments(video_id, max_comments=50, timeout=30):
+DEFAULT_BUFFER = 200  # comentarios recientes que se guardan por live en modo daemon
+
+# Consulta adaptativa del chat (segundos)
+MIN_POLL = 0.25
+MAX_POLL = 10.0
+BUSY_ITEMS = 20  # mensajes por consulta a partir de los cuales se consulta antes
+
+# Emisión por lotes: se escribe al juntar MAX_BATCH comentarios o a los MAX_DELAY segundos
+MAX_BATCH = 20
+MAX_DELAY = 0.2
+
+# Filtro de repetidos: se compara contra los últimos DEDUPE_WINDOW mensajes de DEDUPE_SECONDS
+DEDUPE_WINDOW = 300
+DEDUPE_SECONDS = 60.0
+# Cola por prioridad delante del límite de salida
+MAX_QUEUE = 100
+MAX_AGE = 30.0  # segundos que un comentario puede esperar antes de descartarse
+
+_EMOTE_RE = re.compile(r":[\w-]+:")           # emotes de YouTube (:face-blue-smiling:)
+_REPEAT_RE = re.compile(r"(\w{1,3}?)\1{2,}")   # jajajaja, holaaaa
+_SYMBOL_RE = re.compile(r"[^\w\s]|_")
+
+
+def message_to_comment(message):
+    """Convierte un mensaje de pytchat en el dict de comentario que recibe Node.js"""
+    return {
+        "id": getattr(message, 'id', None),
+        "author": message.author.name or "Anónimo",
+        "text": message.message or "",
+        "timestamp": datetime.now().strftime("%H:%M:%S"),
+        "superchat": getattr(message, 'amountString', False) if getattr(message, 'amountValue', 0) > 0 else False
+    }
+
+
+def message_priority(message):
+    """0 superchat, 1 dueño o moderador, 2 miembro, 3 el resto (menor = antes)"""
+    if getattr(message, 'amountValue', 0) > 0:
+        return 0
+    author = message.author
+    if getattr(author, 'isChatOwner', False) or getattr(author, 'isChatModerator', False):
+        return 1
+    if getattr(author, 'isChatSponsor', False):
+        return 2
+    return 3
+
+
+def normalize_text(text):
+    """Forma canónica para comparar mensajes: sin emotes, emoji, acentos, signos ni repeticiones"""
+    text = _EMOTE_RE.sub(" ", text.lower())
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    text = _REPEAT_RE.sub(r"\1", _SYMBOL_RE.sub(" ", text))
+    words = []
+    for word in text.split():
+        if not words or words[-1] != word:
+            words.append(word)
+    return " ".join(words)
+
+
+class CommentFilter:
+    """
+    Descarta repetidos y spam de emotes con una ventana deslizante de hashes
+
+    Dos mensajes son el mismo si su normalize_text coincide; la ventana guarda
+    el hash de los últimos `window` mensajes de los últimos `seconds` segundos.
+    """
+
+    def __init__(self, window=DEDUPE_WINDOW, seconds=DEDUPE_SECONDS):
+        self.window = window
+        self.seconds = seconds
+        self._recent = deque()  # (hora, hash)
+        self._counts = {}
+
+    def check(self, text, now=None):
+        """None si el mensaje pasa; si no, el motivo: 'emote' o 'duplicate'"""
+        now = time.time() if now is None else now
+        normalized = normalize_text(text)
+        if not normalized:
+            return "emote"
+        while self._recent and (len(self._recent) >= self.window or now - self._recent[0][0] > self.seconds):
+            _, old = self._recent.popleft()
+            self._counts[old] -= 1
+            if not self._counts[old]:
+                del self._counts[old]
+        key = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+        seen = key in self._counts
+        self._recent.append((now, key))
+        self._counts[key] = self._counts.get(key, 0) + 1
+        return "duplicate" if seen else None
+
+
+class TokenBucket:
+    """Hasta `rate` salidas por segundo con ráfagas de hasta `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate * 2)
+        self.tokens = self.burst
+        self.last = time.time()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def wait_time(self, now):
+        """Segundos hasta que haya un token (0 si ya hay)"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        """Gasta un token aunque no haya (los superchats dejan el saldo en negativo)"""
+        self._refill(now)
+        self.tokens -= 1
+
+
+class CommentGate:
+    """
+    Etapa entre el chat y la salida: filtra, prioriza y limita el ritmo
+
+    Los superchats salen al momento. El resto pasa por CommentFilter (si dedupe)
+    y, con rate > 0, por una cola de prioridad de hasta max_queue comentarios que
+    se vacía al ritmo del TokenBucket; si la cola se llena se descarta el más
+    viejo de menor prioridad, y lo que esperó más de max_age no se emite.
+    close() termina de vaciar la cola al mismo ritmo (o la descarta con drain=False).
+    """
+
+    def __init__(self, emit, rate=0.0, burst=None, dedupe=True, max_queue=MAX_QUEUE, max_age=MAX_AGE):
+        self.emit = emit
+        self.filter = CommentFilter() if dedupe else None
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.max_queue = max_queue
+        self.max_age = max_age
+        self.passed = 0
+        self.dropped = {"emote": 0, "duplicate": 0, "overflow": 0, "stale": 0, "closed": 0}
+        self._heap = []  # (prioridad, orden de llegada, hora, comentario)
+        self._seq = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+        if self.bucket:
+            self._thread = threading.Thread(target=self._run, name="comment-gate", daemon=True)
+            self._thread.start()
+
+    def put(self, comment, priority=3, now=None):
+        now = time.time() if now is None else now
+        if priority > 0 and self.filter:
+            reason = self.filter.check(comment.get("text", ""), now)
+            if reason:
+                self.dropped[reason] += 1
+                return
+        if priority == 0 or self.bucket is None:
+            if self.bucket:
+                with self._cond:
+                    self.bucket.take(now)
+            self.passed += 1
+            self.emit(comment)
+            return
+        with self._cond:
+            heapq.heappush(self._heap, (priority, self._seq, now, comment))
+            self._seq += 1
+            if len(self._heap) > self.max_queue:
+                worst = max(range(len(self._heap)), key=lambda i: (self._heap[i][0], -self._heap[i][1]))
+                self._heap[worst] = self._heap[-1]
+                self._heap.pop()
+                heapq.heapify(self._heap)
+                self.dropped["overflow"] += 1
+            self._cond.notify()
+
+    def pending(self):
+        return len(self._heap)
+
+    def close(self, drain=True):
+        """Deja de aceptar comentarios. Con drain espera a que la cola salga al ritmo
+        del bucket (lo que vence por max_age se descarta igual, así que tarda como
+        mucho max_age); sin drain lo que quedaba se cuenta como descartado ('closed')"""
+        with self._cond:
+            self._closed = True
+            if not drain:
+                self.dropped["closed"] += len(self._heap)
+                self._heap.clear()
+            self._cond.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def stats(self):
+        return {"passed": self.passed, "dropped": dict(self.dropped), "queued": self.pending()}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if not self._heap:
+                    return
+                now = time.time()
+                wait = self.bucket.wait_time(now)
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                _, _, queued_at, comment = heapq.heappop(self._heap)
+                if now - queued_at > self.max_age:
+                    self.dropped["stale"] += 1
+                    continue
+                self.bucket.take(now)
+                self.passed += 1
+            self.emit(comment)
+
+
+class AdaptivePoller:
+    """
+    Decide cuánto esperar antes de la siguiente consulta al chat
+
+    Parte del timeout de continuación que devuelve YouTube (Chatdata.interval en
+    pytchat); si la consulta trajo BUSY_ITEMS mensajes o más espera la mitad, y si
+    no trajo ninguno alarga la espera (x1.5 por consulta vacía, hasta 4 veces).
+    """
+
+    def __init__(self, min_delay=MIN_POLL, max_delay=MAX_POLL, busy_items=BUSY_ITEMS):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.busy_items = busy_items
+        self.delay = 1.0
+        self.idle = 0
+
+    def next_delay(self, count, timeout=None):
+        base = timeout if timeout else self.delay
+        if count == 0:
+            self.idle = min(self.idle + 1, 4)
+            delay = base * 1.5 ** self.idle
+        else:
+            self.idle = 0
+            delay = base * 0.5 if count >= self.busy_items else base
+        self.delay = min(self.max_delay, max(self.min_delay, delay))
+        return self.delay
+
+
+class FixedPoller:
+    """Espera siempre lo mismo entre consultas (el comportamiento anterior: 1 segundo)"""
+
+    def __init__(self, delay=1.0):
+        self.delay = delay
+
+    def next_delay(self, count, timeout=None):
+        return self.delay
+
+
+def poll_chat(chat, handle, stopping, poller, deadline=None):
+    """
+    Consulta el chat hasta que termine, se pida parar o venza deadline
+
+    Los mensajes de cada consulta se pasan juntos a handle(items) en cuanto
+    llegan (sin sync_items, que los reparte con pausas a lo largo del intervalo).
+    """
+    while chat.is_alive() and not stopping.is_set():
+        if deadline is not None and time.time() >= deadline:
+            break
+        data = chat.get()
+        items = list(getattr(data, 'items', None) or [])
+        handle(items)
+        delay = poller.next_delay(len(items), getattr(data, 'interval', None))
+        if deadline is not None:
+            delay = min(delay, max(0.0, deadline - time.time()))
+        stopping.wait(delay)
+
+
+class _ReplayAuthor:
+    def __init__(self, name):
+        self.name = name
+
+
+class _ReplayMessage:
+    def __init__(self, record):
+        self.id = record.get("id")
+        self.author = _ReplayAuthor(record.get("author"))
+        self.message = record.get("text", "")
+        self.amountValue = record.get("amountValue", 0)
+        self.amountString = record.get("amountString", "")
+        self.posted = record["t"]  # segundos desde el inicio de la grabación
+
+
+class _ReplayData:
+    def __init__(self, items, interval):
+        self.items = items
+        self.interval = interval
+
+
+class ReplayChat:
+    """
+    Reproduce un chat grabado con la misma interfaz que pytchat (is_alive/get/terminate)
+
+    El archivo es NDJSON: una línea por mensaje {"t", "author", "text", "id",
+    "amountValue", "amountString"} y líneas {"t", "timeoutMs"} cuando cambia el
+    timeout de continuación. get() devuelve lo publicado hasta ahora que aún no
+    se entregó, como haría YouTube. speed > 1 reproduce más rápido.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.messages = []
+        self.timeouts = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "timeoutMs" in record:
+                    self.timeouts.append((record["t"], record["timeoutMs"] / 1000.0))
+                else:
+                    self.messages.append(_ReplayMessage(record))
+        self.messages.sort(key=lambda m: m.posted)
+        self.speed = speed
+        self.start = time.time()
+        self.position = 0
+        self.requests = 0
+        self.alive = True
+
+    def elapsed(self):
+        """Segundos de la grabación transcurridos"""
+        return (time.time() - self.start) * self.speed
+
+    def is_alive(self):
+        return self.alive and self.position < len(self.messages)
+
+    def get(self):
+        self.requests += 1
+        now = self.elapsed()
+        end = self.position
+        while end < len(self.messages) and self.messages[end].posted <= now:
+            end += 1
+        items = self.messages[self.position:end]
+        self.position = end
+        timeout = next((value for t, value in reversed(self.timeouts) if t <= now), 5.0)
+        return _ReplayData(items, timeout / self.speed)
+
+    def terminate(self):
+        self.alive = False
+
+
+def open_chat(video_id, interruptable=True):
+    """Chat de pytchat, o ReplayChat si video_id es un archivo grabado"""
+    if os.path.isfile(video_id):
+        return ReplayChat(video_id, float(os.environ.get("YT_REPLAY_SPEED", "1")))
+    from pytchat import create
+    return create(video_id=video_id, interruptable=interruptable)
+
+
+class Emitter:
+    """
+    Escribe los eventos para Node.js en stdout; los hilos de cada live lo comparten
+
+    Los comentarios se juntan hasta max_batch líneas o max_delay segundos y se
+    escriben de una vez; los demás eventos vacían lo pendiente y salen al momento.
+    """
+
+    def __init__(self, out=None, max_batch=MAX_BATCH, max_delay=MAX_DELAY, ndjson=False):
+        self.out = out or sys.stdout
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.ndjson = ndjson
+        self.writes = 0
+        self._pending = []
+        self._oldest = 0.0
+        self._closed = False
+        self._cond = threading.Condition()
+        if self.max_batch > 1:
+            threading.Thread(target=self._run, name="emitter", daemon=True).start()
+
+    def comment(self, comment):
+        line = f"{json.dumps({'type': 'comment', **comment})}\n" if self.ndjson else f"---COMMENT---{json.dumps(comment)}\n"
+        with self._cond:
+            self._pending.append(line)
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif len(self._pending) == 1:
+                self._oldest = time.monotonic()
+                self._cond.notify()
+
+    def event(self, kind, **data):
+        data = {"type": kind, **data}
+        line = f"{json.dumps(data)}\n" if self.ndjson else f"---EVENT---{json.dumps(data)}\n"
+        with self._cond:
+            self._pending.append(line)
+            self._flush()
+
+    def close(self):
+        with self._cond:
+            self._flush()
+            self._closed = True
+            self._cond.notify()
+
+    def _flush(self):
+        """Requiere _cond"""
+        if not self._pending:
+            return
+        self.out.write("".join(self._pending))
+        self.out.flush()
+        self.writes += 1
+        self._pending = []
+
+    def _run(self):
+        with self._cond:
+            while not self._closed:
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                remaining = self._oldest + self.max_delay - time.monotonic()
+                if remaining <= 0:
+                    self._flush()
+                else:
+                    self._cond.wait(remaining)
+
+
+def read_youtube_live_comments(video_id, max_comments=50, timeout=30, emitter=None, poller=None):
     """
     Lee comentarios en vivo de YouTube usando pytchat
-    
+
     Args:
         video_id (str): ID del video de YouTube
         max_comments (int): Máximo número de comentarios a leer
         timeout (int): Tiempo máximo en segundos para leer comentarios
-        
+        emitter (Emitter): Salida de los ---COMMENT--- (por defecto stdout, por lotes)
+        poller: AdaptivePoller (por defecto) o FixedPoller
+
     Returns:
         dict: Resultado con comentarios encontrados
     """
+    emitter = emitter or Emitter()
     try:
-        from pytchat import create
-
         print(f"🎬 Conectando a pytchat para video: {video_id}", file=sys.stderr)
 
         # Crear instancia de Chat
-        chat = create(video_id=video_id)
+        chat = open_chat(video_id)
         comments = []
-        comment_count = 0
-        start_time = time.time()
-        
-        print(f"📺 Leyendo comentarios del live...", file=sys.stderr)
+        stopping = threading.Event()
 
-        while chat.is_alive():
-            # Verificar timeout
-            if time.time() - start_time > timeout:
-                print(f"⏱️ Timeout alcanzado ({timeout}s)", file=sys.stderr)
-                break
+        print(f"📺 Leyendo comentarios del live...", file=sys.stderr)
 
-            # Verificar límite de comentarios
-            if comment_count >= max_comments:
-                print(f"📊 Límite de comentarios alcanzado ({max_comments})", file=sys.stderr)
-                break
-                
-            for message in chat.get().sync_items():
-                if comment_count >= max_comments:
+        def handle(items):
+            for message in items:
+                # Verificar límite de comentarios
+                if len(comments) >= max_comments:
+                    print(f"📊 Límite de comentarios alcanzado ({max_comments})", file=sys.stderr)
+                    stopping.set()
                     break
 
                 try:
-                    author = message.author.name or "Anónimo"
-                    text = message.message or ""
-                    timestamp = datetime.now().strftime("%H:%M:%S")
-
-                    comment = {
-                        "author": author,
-                        "text": text,
-                        "timestamp": timestamp,
-                        "superchat": getattr(message, 'amountString', False) if getattr(message, 'amountValue', 0) > 0 else False
-                    }
+                    comment = message_to_comment(message)
+                    author, text, timestamp = comment["author"], comment["text"], comment["timestamp"]
 
                     comments.append(comment)
-                    comment_count += 1
-                    
+
                     # Emitir JSON por stdout para que Node.js lo mande al WebSocket
                     ws_msg = {
                         "type": "comment",
+                        "id": comment["id"],
                         "author": author,
                         "text": text,
                         "timestamp": timestamp
                     }
-                    import json
-                    print(f"---COMMENT---{json.dumps(ws_msg)}", flush=True)
+                    emitter.comment(ws_msg)
 
                     print(f"💬 [{timestamp}] {author}: {text[:50]}...", file=sys.stderr)
 
                 except Exception as e:
                     print(f"⚠️ Error procesando mensaje: {str(e)}", file=sys.stderr)
                     continue
+            if len(comments) >= max_comments:
+                stopping.set()
 
-            time.sleep(1) # Pequeña pausa para no saturar CPU en el loop
+        deadline = time.time() + timeout
+        poll_chat(chat, handle, stopping, poller or AdaptivePoller(), deadline)
+        if time.time() >= deadline:
+            print(f"⏱️ Timeout alcanzado ({timeout}s)", file=sys.stderr)
 
         # Cerrar chat
         try:
             chat.terminate()
         except:
             pass
-        
+
         result = {
             "success": True,
             "videoId": video_id,
@@ -95,9 +530,9 @@ def read_youtube_live_comments(video_id, max_comments=50, timeout=30):
             "comments": comments,
             "timestamp": datetime.now().isoformat()
         }
-        
+
         return result
-        
+
     except ImportError:
         print("❌ Error: pytchat no está instalado", file=sys.stderr)
         return {
@@ -110,19 +545,245 @@ def read_youtube_live_comments(video_id, max_comments=50, timeout=30):
             "success": False,
             "error": str(e)
         }
+    finally:
+        emitter.close()
+
+
+class LiveStream(threading.Thread):
+    """Lee un live en su propio hilo y guarda solo los últimos buffer_size comentarios"""
+
+    def __init__(self, video_id, emitter, buffer_size=DEFAULT_BUFFER, poller=None, gate=None):
+        super().__init__(name=f"live-{video_id}", daemon=True)
+        self.video_id = video_id
+        self.emitter = emitter
+        self.poller = poller or AdaptivePoller()
+        # gate: opciones de CommentGate (None = se emite todo)
+        self.gate = CommentGate(emitter.comment, **gate) if gate is not None else None
+        self.recent = deque(maxlen=buffer_size)
+        self.total = 0
+        self.started_at = time.time()
+        self.stopping = threading.Event()
+
+    def stop(self):
+        self.stopping.set()
+
+    def info(self):
+        return {
+            "videoId": self.video_id,
+            "alive": self.is_alive(),
+            "comments": self.total,
+            "buffered": len(self.recent),
+            "uptime": round(time.time() - self.started_at, 1),
+            "pollDelay": round(self.poller.delay, 2),
+            **({"gate": self.gate.stats()} if self.gate else {})
+        }
+
+    def handle(self, items):
+        for message in items:
+            try:
+                comment = message_to_comment(message)
+            except Exception as e:
+                print(f"⚠️ Error procesando mensaje: {str(e)}", file=sys.stderr)
+                continue
+            comment["videoId"] = self.video_id
+            self.recent.append(comment)
+            self.total += 1
+            if self.gate:
+                self.gate.put(comment, message_priority(message))
+            else:
+                self.emitter.comment(comment)
+
+    def run(self):
+        try:
+            # interruptable=False: pytchat no puede instalar su manejador de señales fuera del hilo principal
+            chat = open_chat(self.video_id, interruptable=False)
+        except ImportError:
+            self.emitter.event("error", videoId=self.video_id, error="pytchat no está instalado. Ejecuta: pip install pytchat")
+            return
+        except Exception as e:
+            self.emitter.event("error", videoId=self.video_id, error=str(e))
+            return
+
+        print(f"📺 Siguiendo live {self.video_id}", file=sys.stderr)
+        self.emitter.event("started", videoId=self.video_id)
+        reason = "finished"
+        try:
+            poll_chat(chat, self.handle, self.stopping, self.poller)
+        except Exception as e:
+            reason = "error"
+            self.emitter.event("error", videoId=self.video_id, error=str(e))
+        finally:
+            try:
+                chat.terminate()
+            except Exception:
+                pass
+        if self.gate:
+            # Si el live terminó solo, lo que quedó en cola sale igual; si se quitó, se descarta
+            self.gate.close(drain=not self.stopping.is_set())
+        if self.stopping.is_set():
+            reason = "removed"
+        print(f"🛑 Live {self.video_id} terminado ({reason})", file=sys.stderr)
+        self.emitter.event("ended", videoId=self.video_id, reason=reason, comments=self.total,
+                           **({"gate": self.gate.stats()} if self.gate else {}))
+
+
+def parse_command(line):
+    """Comando de control: JSON ({"cmd": ..., ...}) o texto ("add <video_id>")"""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        return json.loads(line)
+    parts = line.split()
+    command = {"cmd": parts[0].lower()}
+    if len(parts) > 1:
+        command["video_id"] = parts[1]
+    if len(parts) > 2:
+        command["n"] = int(parts[2])
+    return command
+
+
+def run_daemon(video_ids=(), buffer_size=DEFAULT_BUFFER, control=None, emitter=None, gate=None):
+    """
+    Sigue varios lives a la vez hasta recibir quit o que se cierre el canal de control
+
+    Args:
+        video_ids: Lives con los que arrancar
+        buffer_size (int): Comentarios recientes que se guardan por live
+        control: Iterable de líneas de comando (por defecto stdin)
+        emitter (Emitter): Salida de eventos (por defecto stdout)
+        gate (dict): Opciones de CommentGate para cada live (None = sin filtro ni límite)
+    """
+    emitter = emitter or Emitter()
+    streams = {}
+
+    def add(video_id):
+        current = streams.get(video_id)
+        if current is not None and current.is_alive():
+            emitter.event("exists", videoId=video_id)
+            return
+        stream = streams[video_id] = LiveStream(video_id, emitter, buffer_size, gate=gate)
+        stream.start()
+
+    for video_id in video_ids:
+        add(video_id)
+    emitter.event("ready", streams=list(streams))
+
+    def dispatch(command):
+        """Ejecuta un comando; devuelve False con quit"""
+        cmd = command.get("cmd")
+        video_id = command.get("video_id")
+        if cmd in ("add", "remove", "recent") and not video_id:
+            emitter.event("error", error=f"{cmd} requiere video_id")
+        elif cmd == "add":
+            add(video_id)
+        elif cmd == "remove":
+            stream = streams.pop(video_id, None)
+            if stream is None:
+                emitter.event("error", videoId=video_id, error="live no encontrado")
+            else:
+                stream.stop()
+        elif cmd == "list":
+            # Los lives que ya terminaron se informan una última vez y se olvidan
+            emitter.event("list", streams=[s.info() for s in streams.values()])
+            for key in [k for k, s in streams.items() if not s.is_alive()]:
+                del streams[key]
+        elif cmd == "recent":
+            stream = streams.get(video_id)
+            try:
+                n = int(command.get("n", buffer_size))
+            except (TypeError, ValueError):
+                n = 0
+            if n <= 0:
+                emitter.event("error", videoId=video_id, error=f"n inválido: {command.get('n')!r} (entero mayor que 0)")
+                return True
+            comments = list(stream.recent)[-n:] if stream else []
+            emitter.event("recent", videoId=video_id, comments=comments)
+        elif cmd == "quit":
+            return False
+        else:
+            emitter.event("error", error=f"comando desconocido: {cmd}")
+        return True
+
+    for line in (control if control is not None else sys.stdin):
+        try:
+            command = parse_command(line)
+        except ValueError as e:
+            emitter.event("error", error=f"comando inválido: {e}")
+            continue
+        if command is None:
+            continue
+        # Un comando mal formado ({"video_id": [..]}, etc.) no debe tumbar los demás lives
+        try:
+            if not isinstance(command, dict):
+                raise ValueError("se esperaba un objeto JSON")
+            if not dispatch(command):
+                break
+        except (TypeError, ValueError) as e:
+            emitter.event("error", error=f"comando inválido: {e}")
+
+    for stream in streams.values():
+        stream.stop()
+    for stream in streams.values():
+        stream.join(timeout=5)
+    emitter.event("stopped")
+    emitter.close()
+
+
+def _pop_option(args, name, default, cast):
+    """Saca --name valor de args (lista de argv) y lo devuelve convertido"""
+    if name not in args:
+        return default
+    index = args.index(name)
+    value = cast(args[index + 1])
+    del args[index:index + 2]
+    return value
+
 
 def main():
     """Función principal para CLI"""
     if len(sys.argv) < 2:
         print("Uso: python youtube_live_reader.py <video_id> [max_comments] [timeout]")
+        print("     python youtube_live_reader.py --daemon [--buffer N] [--max-batch N] [--max-delay S] [--ndjson]")
+        print("                                   [--filter] [--rate N] [--burst N] [--max-queue N] [--max-age S] [video_id ...]")
         sys.exit(1)
-    
-    video_id = sys.argv[1]
-    max_comments = int(sys.argv[2]) if len(sys.argv) > 2 else 50
-    timeout = int(sys.argv[3]) if len(sys.argv) > 3 else 30
-    
-    result = read_youtube_live_comments(video_id, max_comments, timeout)
-    
+
+    args = sys.argv[1:]
+    max_batch = _pop_option(args, "--max-batch", MAX_BATCH, int)
+    max_delay = _pop_option(args, "--max-delay", MAX_DELAY, float)
+    ndjson = "--ndjson" in args
+    if ndjson:
+        args.remove("--ndjson")
+    emitter = Emitter(max_batch=max_batch, max_delay=max_delay, ndjson=ndjson)
+    gate_flags = [a for a in args if a in ("--filter", "--rate", "--burst", "--max-queue", "--max-age")]
+    gate = {
+        "rate": _pop_option(args, "--rate", 0.0, float),
+        "burst": _pop_option(args, "--burst", None, float),
+        "max_queue": _pop_option(args, "--max-queue", MAX_QUEUE, int),
+        "max_age": _pop_option(args, "--max-age", MAX_AGE, float),
+        "dedupe": "--filter" in args,
+    }
+    if gate["dedupe"]:
+        args.remove("--filter")
+
+    if args and args[0] == "--daemon":
+        args = args[1:]
+        buffer_size = _pop_option(args, "--buffer", DEFAULT_BUFFER, int)
+        run_daemon(args, buffer_size, emitter=emitter, gate=gate if gate["dedupe"] or gate["rate"] > 0 else None)
+        return
+
+    if gate_flags or not args:
+        if gate_flags:
+            print(f"❌ {' '.join(gate_flags)}: el filtro y el límite de salida solo funcionan con --daemon", file=sys.stderr)
+        print("Uso: python youtube_live_reader.py <video_id> [max_comments] [timeout]", file=sys.stderr)
+        sys.exit(1)
+
+    video_id = args[0]
+    max_comments = int(args[1]) if len(args) > 1 else 50
+    timeout = int(args[2]) if len(args) > 2 else 30
+
+    result = read_youtube_live_comments(video_id, max_comments, timeout, emitter)
+
     # Imprimir resultado como JSON en stdout
     print("---JSON_START---")
     print(json.dumps(result, ensure_ascii=False))